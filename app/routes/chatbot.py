@@ -1,77 +1,63 @@
-from flask import Blueprint, request, jsonify, render_template
-from chatbot.bedrock_client import get_bedrock_client
-from chatbot.claude_utils import prompt_claude_v3
-from chatbot.db_utils import get_schema_info
-import pandas as pd, json, os, re, asyncio, time
-from sqlalchemy import create_engine
-import psycopg2.pool
+from flask import Blueprint, Response, current_app, request, jsonify, render_template
+from flask.cli import AppGroup
+from chatbot.explanations import template_explanation
+from chatbot.intents import TEMPLATE_ROWS, intent_stats, match_intent
+from chatbot.metrics import Trace, registry
+from chatbot.pipeline import PipelineUnavailable, iter_sync, pipeline, run_sync
+from chatbot.question_cache import question_cache, question_key
+from chatbot.result_cache import PREVIEW_ROWS, result_cache
+from chatbot.schema_cache import schema_cache
+from chatbot.sql_guard import QueryTooExpensive
+from db_pool import pool_manager
+from app.services.dimension_catalog import get_dimension_catalog
+import json, re
 from datetime import datetime
-from botocore.exceptions import ClientError
+import click, time
 
 chatbot_bp = Blueprint('chatbot', __name__)
 
-# === Initialize AWS Bedrock client ===
-client = get_bedrock_client()
-
-# === PostgreSQL connection pool (use DATABASE_URI only) ===
-DATABASE_URI = os.getenv("DATABASE_URI")
-
-if not DATABASE_URI:
-    raise RuntimeError("DATABASE_URI is not set in the environment")
-
-pg_pool = psycopg2.pool.SimpleConnectionPool(
-    1, 5, dsn=DATABASE_URI
-)
-
-def get_sqlalchemy_engine():
-    """Return SQLAlchemy engine using DATABASE_URI."""
-    return create_engine(DATABASE_URI)
+# === Database access: the app's shared pool, within the chatbot's quota ===
+pg_pool = pool_manager.subsystem("chatbot")
 
 def extract_sql_only(text: str) -> str:
     match = re.search(r"(SELECT|UPDATE|DELETE|INSERT|WITH)\s.+", text, re.IGNORECASE | re.DOTALL)
     return match.group(0).strip() if match else ""
 
-def load_full_schema_text(path="schema.json"):
-    with open(path, "r") as f:
-        return json.dumps(json.load(f), indent=2)
-
-def prompt_with_retry(user_prompt: str, retries=3, backoff=2):
-    """Wrapper to call Claude with retry on ThrottlingException."""
-    for attempt in range(retries):
-        try:
-            return prompt_claude_v3(client, user_prompt)
-        except ClientError as e:
-            if e.response["Error"]["Code"] == "ThrottlingException" and attempt < retries - 1:
-                wait_time = backoff * (2 ** attempt)
-                print(f"⏳ Throttled by Bedrock, retrying in {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                raise
-        except Exception as e:
-            if attempt < retries - 1:
-                wait_time = backoff * (2 ** attempt)
-                print(f"⚠️ Error {e}, retrying in {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                raise
-
-# === UI Route ===
-@chatbot_bp.route("/chatbot", methods=["GET"])
-def chatbot_ui():
-    return render_template('chatbot.html')
-
-# === API Route (RAG flow) ===
-@chatbot_bp.route("/api/chatbot", methods=["POST"])
-def chatbot_endpoint():
-    user_q = request.json.get("message")
+# Columns whose allowed values are spelled out in the SQL prompt
+PROMPT_VALUE_DIMENSIONS = (
+    "lighting", "weather", "traffic_control_device", "device_condition",
+    "first_crash_type", "trafficway_type", "alignment",
+    "roadway_surface_cond", "road_defect", "crash_type",
+)
 
-    # Ensure schema.json exists
-    asyncio.run(get_schema_info(pg_pool))
+def prompt_vocabularies():
+    """{column: values} of the categorical columns, for matching questions to columns."""
+    catalog = get_dimension_catalog()
+    return {catalog.column_name(dim): catalog.options(dim) for dim in PROMPT_VALUE_DIMENSIONS}
 
-    # Load full schema text
-    schema_text = load_full_schema_text()
+def categorical_value_rules(columns=None):
+    """
+    Prompt lines listing the values each categorical column currently holds,
+    limited to `columns` (column names) when given.
+    """
+    catalog = get_dimension_catalog()
+    lines = []
+    for dim in PROMPT_VALUE_DIMENSIONS:
+        if columns is not None and catalog.column_name(dim) not in columns:
+            continue
+        values = [f'"{v}"' for v in catalog.options(dim)]
+        if not values:
+            continue
+        if len(values) <= 2:
+            listed = " and ".join(values)
+        else:
+            listed = ", ".join(values[:-1]) + f", and {values[-1]}"
+        lines.append(f'- When referring to the column "{catalog.column_name(dim)}", the possible values include {listed}.')
+    return "\n".join(lines)
 
-    # === Step 1: Ask Claude to generate SQL ===
+def build_sql_prompt(user_q, schema):
+    """SQL-generation prompt with only the schema columns (and value rules) this question needs."""
+    schema_text, columns = schema.prompt_for(user_q, prompt_vocabularies())
     sql_prompt = f"""
 You are an expert SQL assistant for a chatbot that answers traffic-related questions using PostgreSQL.
 
@@ -93,19 +79,10 @@ IMPORTANT RULES:
 ADDITIONAL RULES:
 - Use EXTRACT(YEAR FROM "CRASH_DATE") = 2024 when filtering by year.
 - Do not include explanations or markdown. Only return a valid SQL query starting with SELECT or WITH.
-- When referring to column "LIGHTING_CONDITION" the possible values include "DAWN", "DARKNESS", "DAYLIGHT", "DUSK", "UNKNOWN", "DARKNESS, LIGHTED ROAD".
-- When referring to the column "WEATHER_CONDITION", the possible values include "SEVERE CROSS WIND GATE", "OTHER", "UNKNOWN", "FREEZING RAIN/DRIZZLE", "SLEET/HAIL", "CLOUDY/OVERCAST", "BLOWING SNOW", "SNOW", "FOG/SMOKE/HAZE", "CLEAR", "BLOWING SAND, SOIL, DIRT", and "RAIN".
-- When referring to the column "TRAFFIC_CONTROL_DEVICE", the possible values include "YIELD", "FLASHING CONTROL SIGNAL", "DELINEATORS", "BICYCLE CROSSING SIGN", "POLICE/FLAGMAN", "OTHER REG. SIGN", "RR CROSSING SIGN", "OTHER RAILROAD CROSSING", "PEDESTRIAN CROSSING SIGN", "OTHER", "TRAFFIC SIGNAL", "NO CONTROLS", "NO PASSING", "RAILROAD CROSSING GATE", "OTHER WARNING SIGN", "STOP SIGN/FLASHER", "UNKNOWN", and "SCHOOL ZONE".
-- When referring to the column "DEVICE_CONDITION", the possible values include "NOT FUNCTIONING", "FUNCTIONING IMPROPERLY", "FUNCTIONING PROPERLY", "OTHER", "UNKNOWN", "MISSING", "WORN REFLECTIVE MATERIAL", and "NO CONTROLS".
-- When referring to the column "FIRST_CRASH_TYPE", the possible values include "PEDESTRIAN", "REAR END", "SIDESWIPE OPPOSITE DIRECTION", "ANIMAL", "OTHER OBJECT", "TRAIN", "PARKED MOTOR VEHICLE", "HEAD ON", "TURNING", "SIDESWIPE SAME DIRECTION", "OTHER NONCOLLISION", "REAR TO SIDE", "FIXED OBJECT", "REAR TO REAR", "REAR TO FRONT", "PEDALCYCLIST", "OVERTURNED", and "ANGLE".
-- When referring to the column "TRAFFICWAY_TYPE", the possible values include "CENTER TURN LANE", "FIVE POINT, OR MORE", "NOT DIVIDED", "PARKING LOT", "NOT REPORTED", "DRIVEWAY", "RAMP", "DIVIDED - W/MEDIAN (NOT RAISED)", "ALLEY", "UNKNOWN INTERSECTION TYPE", "OTHER", "ONE-WAY", "T-INTERSECTION", "FOUR WAY", "L-INTERSECTION", "Y-INTERSECTION", "TRAFFIC ROUTE", "UNKNOWN", "DIVIDED - W/MEDIAN BARRIER", and "ROUNDABOUT".
-- When referring to the column "ALIGNMENT", the possible values include "CURVE ON GRADE", "STRAIGHT ON HILLCREST", "STRAIGHT AND LEVEL", "CURVE ON HILLCREST", "CURVE, LEVEL", and "STRAIGHT ON GRADE".
-- When referring to the column "ROADWAY_SURFACE_COND", the possible values include "SNOW OR SLUSH", "OTHER", "UNKNOWN", "SAND, MUD, DIRT", "DRY", "ICE", and "WET".
-- When referring to the column "ROAD_DEFECT", the possible values include "SHOULDER DEFECT", "WORN SURFACE", "OTHER", "UNKNOWN", "NO DEFECTS", "DEBRIS ON ROADWAY", and "RUT, HOLES".
-- When referring to the column "CRASH_TYPE", the possible values include "NO INJURY / DRIVE AWAY" and "INJURY AND / OR TOW DUE TO CRASH".
-
-
-== FULL DATABASE SCHEMA ==
+{categorical_value_rules(columns)}
+
+
+== DATABASE SCHEMA (relevant columns) ==
 {schema_text}
 
 Now write a valid SQL query to answer:
@@ -113,34 +90,213 @@ Now write a valid SQL query to answer:
 
 Only return the SQL query. No explanation.
 """
+    return sql_prompt
+
+# === CLI: schema cache ===
+chatbot_cli = AppGroup("chatbot", help="Chatbot maintenance commands.")
+
+@chatbot_cli.command("schema")
+@click.option("--refresh", is_flag=True, help="Drop the cached schema and re-read it from the database.")
+@click.option("--question", help="Print the schema prompt this question would get.")
+def schema_command(refresh, question):
+    """Show the cached schema (and its per-question prompt)."""
+    schema_cache.invalidate(refresh=refresh)
+    schema = schema_cache.get(pg_pool)
+    full = schema.render()
+    click.echo(f"version {schema.version}: {len(schema.tables)} tables, "
+               f"{sum(map(len, schema.tables.values()))} columns, {len(full):,} chars")
+    if question:
+        text, _ = schema.prompt_for(question, prompt_vocabularies())
+        click.echo(f"{len(text):,} chars for this question:\n{text}")
+
+@chatbot_cli.command("intent")
+@click.argument("question")
+def intent_command(question):
+    """Show which SQL template (if any) answers QUESTION without the model."""
+    intent = match_intent(question, prompt_vocabularies())
+    if intent is None:
+        click.echo("no template matches; the question goes to the model")
+    else:
+        name, sql = intent
+        click.echo(f"{name}:\n{sql}")
+
+# === UI Route ===
+@chatbot_bp.route("/chatbot", methods=["GET"])
+def chatbot_ui():
+    return render_template('chatbot.html')
+
+# === API Route (RAG flow) ===
+BUSY_REPLY = "⏳ The assistant is busy right now. Please try again in a moment."
+TIMEOUT_REPLY = "⏳ That took too long to answer. Please try again in a moment."
+TOO_EXPENSIVE_REPLY = "That question needs more of the database than I can scan at once. Try narrowing it down, for example to one year or one category."
 
+def prepare_question(user_q):
+    """
+    (cache_key, SQL or None, SQL prompt or None, template intent or None). Runs
+    in the request, where the dimension catalog (app context) is available
+    for template matching and the prompt.
+    """
+    # Common question shapes are answered from a vetted template without the model
+    intent = match_intent(user_q, prompt_vocabularies())
+    intent_stats.record_match(intent is not None)
+    if intent is not None:
+        name, sql = intent
+        return None, sql, None, name
+
+    # Schema is loaded once per process; only the columns this question needs go in the prompt
+    schema = schema_cache.get(pg_pool)
+    cache_key = question_key(user_q, schema.version)
+    cached_sql = question_cache.get(cache_key)
+    sql_prompt = build_sql_prompt(user_q, schema) if cached_sql is None else None
+    return cache_key, cached_sql, sql_prompt, None
+
+def sql_source(cached_sql, intent):
+    """Which path produced the SQL, for the latency split."""
+    if intent is not None:
+        return "template"
+    return "cache" if cached_sql is not None else "model"
+
+@chatbot_bp.route("/api/chatbot", methods=["POST"])
+def chatbot_endpoint():
+    user_q = request.json.get("message")
+    started = time.perf_counter()
+    trace = Trace(user_q)
+    cache_key, cached_sql, sql_prompt, intent = prepare_question(user_q)
+    trace.set(path="/api/chatbot", sql_source=sql_source(cached_sql, intent), template=intent)
+
+    # The model and database steps run on the pipeline's event loop
     try:
-        raw_sql = prompt_with_retry(sql_prompt).strip()
-        generated_sql = extract_sql_only(raw_sql)
-    except Exception as e:
-        return jsonify({"reply": f"❌ Claude error (SQL generation): {e}"})
+        body = run_sync(answer_question(user_q, cache_key, cached_sql, sql_prompt, intent, trace),
+                        timeout=current_app.config["CHATBOT_REQUEST_TIMEOUT"])
+    except PipelineUnavailable as e:
+        print(f"⏳ Chatbot unavailable: {e}")
+        trace.finish(status="busy")
+        return jsonify({"reply": BUSY_REPLY}), 503
+    except TimeoutError:
+        trace.finish(status="timeout")
+        return jsonify({"reply": TIMEOUT_REPLY}), 504
+    intent_stats.record_latency(sql_source(cached_sql, intent), time.perf_counter() - started)
+    trace.finish()
+    return jsonify(body)
+
+@chatbot_bp.route("/api/chatbot/stream", methods=["POST"])
+def chatbot_stream():
+    """
+    Same answer as /api/chatbot as Server-Sent Events, sent as each stage
+    finishes: sql, preview, token (explanation text as it is generated),
+    then reply with the full body.
+    """
+    user_q = request.json.get("message")
+    started = time.perf_counter()
+    trace = Trace(user_q)
+    cache_key, cached_sql, sql_prompt, intent = prepare_question(user_q)
+    trace.set(path="/api/chatbot/stream", sql_source=sql_source(cached_sql, intent), template=intent)
+    timeout = current_app.config["CHATBOT_REQUEST_TIMEOUT"]
+    events = answer_events(user_q, cache_key, cached_sql, sql_prompt, intent, stream=True, trace=trace)
+
+    def generate():
+        try:
+            for event, data in iter_sync(events, timeout=timeout):
+                yield sse(event, data)
+            intent_stats.record_latency(sql_source(cached_sql, intent), time.perf_counter() - started)
+            trace.finish()
+        except PipelineUnavailable as e:
+            print(f"⏳ Chatbot unavailable: {e}")
+            trace.finish(status="busy")
+            yield sse("reply", {"reply": BUSY_REPLY})
+        except TimeoutError:
+            trace.finish(status="timeout")
+            yield sse("reply", {"reply": TIMEOUT_REPLY})
+        except Exception as e:
+            trace.finish(status="error", error=str(e))
+            yield sse("reply", {"reply": f"❌ Chatbot error: {e}"})
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def sample_note(sample_percent):
+    """Line for the explanation prompt when the preview came from a TABLESAMPLE."""
+    if sample_percent is None:
+        return ""
+    return (f"\nNote: the query was too expensive to run in full, so this result comes from a "
+            f"{sample_percent:g}% random sample of the data. Say that counts and totals are approximate.\n")
 
-    if not generated_sql:
-        return jsonify({"reply": "Claude could not generate a valid SQL query."})
+async def answer_question(user_q, cache_key, generated_sql, sql_prompt, intent=None, trace=None):
+    """Generate SQL (unless cached or templated), run it and explain the result; returns the reply body."""
+    async for event, data in answer_events(user_q, cache_key, generated_sql, sql_prompt, intent, trace=trace):
+        if event == "reply":
+            return data
 
-    if "limit" not in generated_sql.lower():
-        generated_sql = generated_sql.rstrip(";") + " LIMIT 100"
+async def answer_events(user_q, cache_key, generated_sql, sql_prompt, intent=None, stream=False, trace=None):
+    """
+    Yield (event, data) as each stage finishes: ("sql", ...), ("preview", ...),
+    ("token", ...) chunks of the explanation when stream=True, and finally
+    ("reply", body). A failing stage ends with a ("reply", {"reply": message}).
+    Stage timings and the outcome go to trace, when given.
+    """
+    async for event, data in _answer_events(user_q, cache_key, generated_sql, sql_prompt, intent, stream, trace):
+        if event == "reply" and trace is not None:
+            trace.set(status="ok" if "question" in data else "failed", explained_by=data.get("explained_by"),
+                      result_cached=data.get("result_cached"), sample_percent=data.get("sample_percent"))
+        yield event, data
+
+async def _answer_events(user_q, cache_key, generated_sql, sql_prompt, intent, stream, trace):
+    # === Step 1: Ask Claude to generate SQL (unless a template or the cache has it) ===
+    sql_cached = generated_sql is not None and intent is None
+    if generated_sql is None:
+        try:
+            raw_sql = (await pipeline.prompt_with_retry(sql_prompt, "generate", trace)).strip()
+            generated_sql = extract_sql_only(raw_sql)
+        except PipelineUnavailable:
+            raise
+        except Exception as e:
+            yield "reply", {"reply": f"❌ Claude error (SQL generation): {e}"}
+            return
+
+        if not generated_sql:
+            yield "reply", {"reply": "Claude could not generate a valid SQL query."}
+            return
+        question_cache.set(cache_key, generated_sql)
+
+    yield "sql", {"sql": generated_sql, "cached": sql_cached, "template": intent}
 
     # === Step 2: Execute SQL ===
     try:
-        df_result = pd.read_sql(generated_sql, get_sqlalchemy_engine())
+        # template answers are short and shown whole; model SQL only as a preview
+        rows = TEMPLATE_ROWS if intent is not None else PREVIEW_ROWS
+        df_result, result_cached = await pipeline.run_sql(generated_sql, trace, rows)
         if df_result.empty:
-            return jsonify({"reply": "I couldn't find any data matching your question. Please try asking it in a different way."})
-        result_preview = df_result.head(5).to_markdown(index=False)
+            yield "reply", {"reply": "I couldn't find any data matching your question. Please try asking it in a different way."}
+            return
+        result_preview = df_result.to_markdown(index=False)
+        sample_percent = df_result.attrs.get("sample_percent")
 
+    except QueryTooExpensive:
+        question_cache.discard(cache_key)
+        yield "reply", {"reply": TOO_EXPENSIVE_REPLY}
+        return
     except Exception as e:
         print(f"❌ SQL Execution Error: {e}")  
-        return jsonify({
+        question_cache.discard(cache_key)   # don't serve SQL that fails
+        yield "reply", {
             "reply": "I couldn't generate a valid answer for this question yet. Try rephrasing or asking something simpler."
-        })
+        }
+        return
+    yield "preview", {"sql_result_preview": result_preview, "cached": result_cached,
+                      "sample_percent": sample_percent}
 
-    # === Step 3: Ask Claude to explain the result ===
-    explanation_prompt = f"""
+    # === Step 3: Explain the result (simple shapes from a template, the rest by Claude) ===
+    final_answer = template_explanation(df_result)
+    explained_by = "model" if final_answer is None else "template"
+    intent_stats.record_explanation(explained_by)
+    if final_answer is not None:
+        if stream:
+            yield "token", {"text": final_answer}
+    else:
+        explanation_prompt = f"""
 You are a traffic analyst AI.
 
 User asked:
@@ -148,17 +304,55 @@ User asked:
 
 Here is the SQL result preview:
 {result_preview}
-
+{sample_note(sample_percent)}
 Explain the result clearly in 2–3 sentences. Do not assume more than what the result shows. If month related instead of numbers use actual month name.
 """
-    try:
-        final_answer = prompt_with_retry(explanation_prompt)
-    except Exception as e:
-        return jsonify({"reply": f"❌ Claude error (explanation): {e}"})
+        try:
+            if stream:
+                parts = []
+                async for text in pipeline.stream_with_retry(explanation_prompt, "explain", trace):
+                    parts.append(text)
+                    yield "token", {"text": text}
+                final_answer = "".join(parts)
+            else:
+                final_answer = await pipeline.prompt_with_retry(explanation_prompt, "explain", trace)
+        except PipelineUnavailable:
+            raise
+        except Exception as e:
+            yield "reply", {"reply": f"❌ Claude error (explanation): {e}"}
+            return
 
-    return jsonify({
+    yield "reply", {
         "question": user_q,
         "sql": generated_sql,
         "sql_result_preview": result_preview,
+        "sql_cached": sql_cached,
+        "template": intent,
+        "result_cached": result_cached,
+        "sample_percent": sample_percent,
+        "explained_by": explained_by,
         "reply": final_answer
-    })
+    }
+
+@chatbot_bp.route("/api/chatbot/pipeline", methods=["GET"])
+def chatbot_pipeline_stats():
+    return jsonify(pipeline.stats())
+
+@chatbot_bp.route("/api/chatbot/metrics", methods=["GET"])
+def chatbot_metrics():
+    """Stage latencies, model calls, tokens, queue waits and caches in the Prometheus text format."""
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+@chatbot_bp.route("/api/chatbot/intents", methods=["GET"])
+def chatbot_intent_stats():
+    """Template hit rate and latency per SQL source (template, cache, model)."""
+    return jsonify(intent_stats.stats())
+
+# === Chatbot cache admin ===
+@chatbot_bp.route("/api/chatbot/cache", methods=["GET"])
+def chatbot_cache_stats():
+    return jsonify({"questions": question_cache.stats(), "results": result_cache.stats()})
+
+@chatbot_bp.route("/api/chatbot/cache/purge", methods=["POST"])
+def chatbot_cache_purge():
+    return jsonify({"questions": question_cache.purge(), "results": result_cache.purge()})
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, jsonify, request
-from app.models.models import db, Crash
+from app.services.dimension_catalog import get_dimension_catalog
+from app.services.impact_stats import get_impact_aggregates
 from datetime import datetime
 
 
@@ -9,26 +10,13 @@ impact_bp = Blueprint('impact', __name__)
 def impact():
     selected_crash_type = request.args.get('crash_type', 'All')
 
-    query = db.session.query(Crash)
-    if selected_crash_type != "All":
-        query = query.filter(Crash.crash_type == selected_crash_type)
+    stats = get_impact_aggregates()
 
-    crash_data = (
-        db.session.query(Crash.crash_type, db.func.count(Crash.crash_record_id))
-        .group_by(Crash.crash_type)
-        .order_by(db.func.count(Crash.crash_record_id).desc())
-        .all()
-    )
+    crash_data = stats.crash_types()
     labels = [row[0] if row[0] else 'Unknown' for row in crash_data]
     values = [row[1] for row in crash_data]
 
-    hour_data = (
-        query
-        .with_entities(Crash.crash_hour, db.func.count(Crash.crash_record_id))
-        .group_by(Crash.crash_hour)
-        .order_by(Crash.crash_hour)
-        .all()
-    )
+    hour_data = stats.hours(selected_crash_type)
     hour_labels = [row[0] for row in hour_data]
     hour_counts = [row[1] for row in hour_data]
 
@@ -47,20 +35,14 @@ def impact():
             "top_hours": top_hours
         }
 
-    injury_data = (
-        query
-        .with_entities(Crash.most_severe_injury, db.func.count(Crash.crash_record_id))
-        .group_by(Crash.most_severe_injury)
-        .order_by(db.func.count(Crash.crash_record_id).desc())
-        .all()
-    )
+    injury_data = stats.injuries(selected_crash_type)
     injury_labels = [row[0] if row[0] else 'Unknown' for row in injury_data]
     injury_values = [row[1] for row in injury_data]
     injury_breakdown = dict(zip(injury_labels, injury_values))
 
-    crash_type_options = sorted(set(row[0] for row in db.session.query(Crash.crash_type).distinct() if row[0]))
+    crash_type_options = get_dimension_catalog().options('crash_type')
 
-    total_crashes = query.count()
+    total_crashes = stats.total(selected_crash_type)
     total_injuries = sum(injury_values)
 
     
@@ -85,14 +67,7 @@ def impact():
 # ✅ JSON API route for filtered injury stats
 @impact_bp.route('/api/filter/<crash_type>')
 def filter_crash(crash_type):
-    query = db.session.query(Crash).filter(Crash.crash_type == crash_type) if crash_type != "All" else db.session.query(Crash)
-
-    injury_data = (
-        query.with_entities(Crash.most_severe_injury, db.func.count(Crash.crash_record_id))
-        .group_by(Crash.most_severe_injury)
-        .order_by(db.func.count(Crash.crash_record_id).desc())
-        .all()
-    )
+    injury_data = get_impact_aggregates().injuries(crash_type)
     injury_labels = [row[0] if row[0] else 'Unknown' for row in injury_data]
     injury_values = [row[1] for row in injury_data]
     injury_map = dict(zip(injury_labels, injury_values))
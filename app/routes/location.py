@@ -3,6 +3,9 @@
 from flask import Blueprint, render_template, jsonify, request
 from sqlalchemy import func
 from app.models.models import db, Crash
+from app.services.rollups import landing_stats
+from app.services.street_index import get_street_index, refresh_street_index
+from app.services.spatial_index import get_spatial_index
 import calendar
 
 location_bp = Blueprint("location", __name__, url_prefix="/location")
@@ -12,15 +15,29 @@ location_bp = Blueprint("location", __name__, url_prefix="/location")
 # --------------------------------
 @location_bp.route("")
 def location_landing():
+    stats = landing_stats() or live_landing_stats()
+
+    return render_template(
+        "landing.html",
+        stats={
+            "total_crashes": stats["total_crashes"],
+            "top_month": month_name(stats["top_month"]) if stats["total_crashes"] else "N/A",
+            "top_weather": stats["top_weather"] or "N/A",
+            "top_crash_type": stats["top_crash_type"] or "N/A",
+        },
+    )
+
+
+def live_landing_stats():
+    """Landing card values straight from traffic_crashes (rollups missing or stale)."""
     total_crashes = db.session.query(func.count(Crash.crash_record_id)).scalar()
 
-    top_month_num = (
+    top_month = (
         db.session.query(Crash.crash_month, func.count().label("count"))
         .group_by(Crash.crash_month)
         .order_by(func.count().desc())
         .first()
     )
-    top_month = month_name(top_month_num[0]) if top_month_num else "N/A"
 
     top_weather = (
         db.session.query(Crash.weather_condition, func.count().label("count"))
@@ -30,7 +47,6 @@ def location_landing():
         .order_by(func.count().desc())
         .first()
     )
-    top_weather = top_weather[0] if top_weather else "N/A"
 
     top_crash_type = (
         db.session.query(Crash.prim_contributory_cause, func.count().label("count"))
@@ -40,17 +56,13 @@ def location_landing():
         .order_by(func.count().desc())
         .first()
     )
-    top_crash_type = top_crash_type[0] if top_crash_type else "N/A"
 
-    return render_template(
-        "landing.html",
-        stats={
-            "total_crashes": total_crashes,
-            "top_month": top_month,
-            "top_weather": top_weather,
-            "top_crash_type": top_crash_type,
-        },
-    )
+    return {
+        "total_crashes": total_crashes,
+        "top_month": top_month[0] if top_month else None,
+        "top_weather": top_weather[0] if top_weather else None,
+        "top_crash_type": top_crash_type[0] if top_crash_type else None,
+    }
 
 
 def month_name(num):
@@ -69,36 +81,80 @@ def search_streets():
     if not query:
         return jsonify([])
 
-    # Determine which metric to sum
-    if metric == "injuries":
-        value_column = func.sum(Crash.injuries_total).label("value")
-    elif metric == "vehicles":
-        value_column = func.sum(Crash.num_units).label("value")
-    else:
-        value_column = func.count().label("value")
-
-    streets = (
-        db.session.query(
-            Crash.street_name,
-            func.avg(Crash.latitude).label("lat"),
-            func.avg(Crash.longitude).label("lng"),
-            value_column
-        )
-        .filter(Crash.street_name.ilike(f"%{query}%"))
-        .filter(Crash.latitude.isnot(None), Crash.longitude.isnot(None))
-        .group_by(Crash.street_name)
-        .order_by(value_column.desc())
-        .limit(10)
-        .all()
-    )
+    streets = get_street_index().search(query, metric, limit=10)
 
     result = [
         {
             "name": name.title(),
             "coords": [lat, lng],
-            "crash_count": int(value)
+            "crash_count": int(value or 0)
         }
         for name, lat, lng, value in streets if lat and lng
     ]
 
-    return jsonify(result)
\ No newline at end of file
+    return jsonify(result)
+
+
+@location_bp.route("/api/streets/index", methods=["GET", "POST"])
+def street_index_stats():
+    """Index size and memory; POST rebuilds it from traffic_crashes first."""
+    index = refresh_street_index() if request.method == "POST" else get_street_index()
+    return jsonify(index.stats())
+
+
+# --------------------------------
+# Spatial queries (radius / viewport)
+# --------------------------------
+MAX_RADIUS_M = 20000
+MAX_POINTS = 5000
+
+
+def _float_args(*names):
+    try:
+        return [float(request.args[name]) for name in names]
+    except (KeyError, ValueError):
+        return None
+
+
+def _points_args():
+    """(include_points, limit), or None when limit is negative; limit is capped at MAX_POINTS."""
+    include_points = request.args.get("points", "false").lower() in ("1", "true", "yes")
+    limit = request.args.get("limit", 500, type=int)
+    if limit < 0:
+        return None
+    return include_points, min(limit, MAX_POINTS)
+
+
+@location_bp.route("/api/nearby")
+def nearby_crashes():
+    """Crashes within `radius` meters (default 500) of lat/lng."""
+    coords = _float_args("lat", "lng")
+    if coords is None:
+        return jsonify({"error": "lat and lng are required numbers"}), 400
+    radius = request.args.get("radius", 500, type=float)
+    if not 0 < radius <= MAX_RADIUS_M:
+        return jsonify({"error": f"radius must be between 0 and {MAX_RADIUS_M} meters"}), 400
+
+    points_args = _points_args()
+    if points_args is None:
+        return jsonify({"error": "limit must be 0 or more"}), 400
+    include_points, limit = points_args
+    result = get_spatial_index().within_radius(*coords, radius, include_points, limit)
+    return jsonify({"center": coords, "radius": radius, **result})
+
+
+@location_bp.route("/api/within")
+def crashes_within_bbox():
+    """Crashes inside the south/west/north/east bounding box (e.g. the map viewport)."""
+    bbox = _float_args("south", "west", "north", "east")
+    if bbox is None:
+        return jsonify({"error": "south, west, north and east are required numbers"}), 400
+    if bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        return jsonify({"error": "south/west must not exceed north/east"}), 400
+
+    points_args = _points_args()
+    if points_args is None:
+        return jsonify({"error": "limit must be 0 or more"}), 400
+    include_points, limit = points_args
+    result = get_spatial_index().within_bbox(*bbox, include_points, limit)
+    return jsonify({"bbox": bbox, **result})
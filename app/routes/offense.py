@@ -1,19 +1,45 @@
 # app/routes/offense.py
 
-from flask import Blueprint, render_template, request, jsonify, current_app
+from flask import Blueprint, Response, render_template, request, jsonify
 from sqlalchemy import func
 from app.models.models import db, Crash
-import os, json
+from app.services.beat_geometry import get_beat_geometry
+from app.services.bootstrap import bootstrap_response
+from app.services.crash_cube import cube_enabled, get_crash_cube
+from app.services.dimension_catalog import get_dimension_catalog
+from app.services.point_clusters import get_hit_and_run_index
+from app.services.rollups import offense_counts
 
 
 offense_bp = Blueprint('offense', __name__, url_prefix='/offense')
 
+def parse_beat(beat='all'):
+    """Beat filter as an int, or None for 'all' (unparseable beats are ignored, as in SQL)."""
+    try:
+        return int(beat) if beat != 'all' else None
+    except ValueError:
+        return None
+
+def cube_filter_mask(cube, beat='all', cause=None, severity=None):
+    """Crash cube mask for the offense page filters."""
+    return cube.mask(beat=parse_beat(beat), cause=cause or None, severity=severity or None)
+
 def get_primary_cause_distribution(beat='all', cause=None, severity=None):
     """
     Returns a list of dicts:
       [{ 'cause': <PRIM_CONTRIBUTORY_CAUSE>, 'count': <int> }, …]
     filtered by beat_of_occurrence when beat!='all'.
     """
+    if cube_enabled():
+        cube = get_crash_cube()
+        counts = cube.counts('cause', cube_filter_mask(cube, beat, cause, severity))
+        return [{'cause': c or 'Unknown', 'count': cnt} for c, cnt in counts[:10]]
+
+    counts = offense_counts(['cause'], limit=10, beat=parse_beat(beat),
+                            cause=cause or None, severity=severity or None)
+    if counts is not None:
+        return [{'cause': c or 'Unknown', 'count': cnt} for c, cnt in counts]
+
     q = db.session.query(
         Crash.prim_contributory_cause.label('cause'),
         func.count(Crash.crash_record_id).label('count')
@@ -44,56 +70,10 @@ def get_primary_cause_distribution(beat='all', cause=None, severity=None):
         for c, cnt in q
     ]
 
-def get_hit_and_run_features(beat='all', cause=None, severity=None):
-    """
-    Returns a list of GeoJSON Feature dicts for hit-and-run crashes,
-    filtered by beat_of_occurrence if beat!='all'.
-    """
-    q = db.session.query(
-        Crash.latitude.label('lat'),
-        Crash.longitude.label('lng'),
-        Crash.crash_date.label('date'),
-        Crash.prim_contributory_cause.label('cause'),
-        Crash.most_severe_injury.label('severity')
-    ).filter(Crash.hit_and_run_i == 'Y')
-
-    if beat != 'all':
-        try:
-            b = int(beat)
-            q = q.filter(Crash.beat_of_occurrence == b)
-        except ValueError:
-            pass
-        
-    if cause:
-        q = q.filter(Crash.prim_contributory_cause == cause)
-    if severity:
-        q = q.filter(Crash.most_severe_injury == severity)
-
-    features = []
-    for row in q:
-        features.append({
-            "type": "Feature",
-            "properties": {
-                "date": row.date,
-                "cause": row.cause or 'Unknown'
-            },
-            "geometry": {
-                "type": "Point",
-                "coordinates": [row.lng, row.lat]
-            }
-        })
-    return features
-
 @offense_bp.route('/')
 def offense_page():
     # distinct beats for dropdown
-    beats_q = (
-        db.session.query(Crash.beat_of_occurrence)
-        .distinct()
-        .order_by(Crash.beat_of_occurrence)
-        .all()
-    )
-    beats = [b[0] for b in beats_q if b[0] is not None]
+    beats = get_dimension_catalog().options('beat')
 
     # initial chart data (all beats)
     initial_data = get_primary_cause_distribution()
@@ -115,40 +95,91 @@ def primary_cause_api():
     data = get_primary_cause_distribution(beat, cause, severity)
     return jsonify(data)
 
+def bbox_arg():
+    """(west, south, east, north) from ?bbox=, whole map when absent; ValueError when malformed."""
+    try:
+        west, south, east, north = [float(v) for v in request.args.get('bbox', '-180,-90,180,90').split(',')]
+    except ValueError:
+        raise ValueError("bbox must be west,south,east,north numbers")
+    if south > north or west > east:
+        raise ValueError("bbox south/west must not exceed north/east")
+    return west, south, east, north
+
+def get_hit_and_run_clusters(bbox, zoom, beat='all', cause=None, severity=None):
+    result = get_hit_and_run_index(beat, cause, severity).clusters(*bbox, zoom)
+    return {"type": "FeatureCollection", **result}
+
 @offense_bp.route('/api/hit-and-run')
 def hit_and_run_api():
+    """
+    Hit-and-run crashes clustered for the map viewport:
+    bbox=west,south,east,north (default: whole map) and zoom (default 11).
+    """
     beat     = request.args.get('beat', 'all')
     cause    = request.args.get('cause', None)
     severity = request.args.get('severity', None)
-    features = get_hit_and_run_features(beat, cause, severity)
-    return jsonify({"type": "FeatureCollection", "features": features})
+    zoom     = request.args.get('zoom', 11, type=int)
+    try:
+        bbox = bbox_arg()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-@offense_bp.route('/api/beat-choropleth')
-def beat_choropleth_api():
-    # 1) Count hit-and-run per beat
-    rows = db.session.query(
-        Crash.beat_of_occurrence.label('beat'),
-        func.count(Crash.crash_record_id).label('count')
-    ).filter(Crash.hit_and_run_i=='Y').group_by(Crash.beat_of_occurrence).all()
-    counts = {b: c for b, c in rows}
+    return jsonify(get_hit_and_run_clusters(bbox, zoom, beat, cause, severity))
+
+def hit_and_run_counts_by_beat():
+    """[(beat, count)] of hit-and-run crashes, most first (NULL beat included)."""
+    if cube_enabled():
+        cube = get_crash_cube()
+        return cube.counts('beat', cube.mask(hit_and_run='Y'))
+
+    counts = offense_counts(['beat'], hit_and_run='Y')
+    if counts is not None:
+        return counts
 
-    # 2) Load static GeoJSON
-    geo_path = os.path.join(current_app.root_path, 'static', 'data', 'beat_polygons.geojson')
-    with open(geo_path) as f:
-        geo = json.load(f)
+    rows = (
+        db.session.query(
+            Crash.beat_of_occurrence.label('beat'),
+            func.count(Crash.crash_record_id).label('count')
+        )
+        .filter(Crash.hit_and_run_i == 'Y')
+        .group_by(Crash.beat_of_occurrence)
+        .order_by(func.count(Crash.crash_record_id).desc())
+        .all()
+    )
+    return [(b, c) for b, c in rows]
 
-    # 3) Annotate properties
-    for feat in geo['features']:
-        beat_id = feat['properties'].get('beat_id')
-        feat['properties']['hit_and_run_count'] = counts.get(int(beat_id), 0)
+@offense_bp.route('/api/beat-choropleth')
+def beat_choropleth_api():
+    """Beat polygons (simplified for `zoom` when given) with hit-and-run counts"""
+    geometry = get_beat_geometry()
+    if geometry is None:
+        return jsonify({"error": "beat polygons are not available"}), 503
 
-    return jsonify(geo)
+    # 1) Count hit-and-run per beat
+    counts = dict(hit_and_run_counts_by_beat())
+
+    # 2) Merge the counts into the pre-serialized polygons
+    zoom = request.args.get('zoom', None, type=int)
+    return Response(geometry.choropleth_json(counts, zoom), mimetype='application/json')
+
+def get_cause_severity(beat='all', cause=None, severity=None):
+    """[{'cause', 'severity', 'count'}] for the sankey chart."""
+    if cube_enabled():
+        cube = get_crash_cube()
+        pairs = cube.counts2('cause', 'severity', cube_filter_mask(cube, beat, cause, severity))
+        return [
+            {'cause': c or 'Unknown', 'severity': s or 'Unknown', 'count': cnt}
+            for c, s, cnt in pairs
+        ]
+
+    pairs = offense_counts(['cause', 'severity'], beat=parse_beat(beat),
+                           cause=cause or None, severity=severity or None)
+    if pairs is not None:
+        return [
+            {'cause': c or 'Unknown', 'severity': s or 'Unknown', 'count': cnt}
+            for c, s, cnt in pairs
+        ]
 
-@offense_bp.route('/api/cause-severity')
-def cause_severity_api():
-    beat = request.args.get('beat', 'all')
-    cause    = request.args.get('cause', None)
-    severity = request.args.get('severity', None)
     q = db.session.query(
         Crash.prim_contributory_cause.label('cause'),
         Crash.most_severe_injury.label('severity'),
@@ -166,29 +197,54 @@ def cause_severity_api():
         q = q.filter(Crash.most_severe_injury == severity)
 
     q = q.group_by(Crash.prim_contributory_cause, Crash.most_severe_injury)
-    data = [
+    return [
         {'cause': c or 'Unknown',
          'severity': s or 'Unknown',
          'count': cnt}
         for c, s, cnt in q
     ]
-    return jsonify(data)
 
-@offense_bp.route('/api/most-hit-and-run-beat')
-def summary_top_hit_and_run_beat():
-    row = (
-        db.session.query(
-            Crash.beat_of_occurrence.label('beat'),
-            func.count(Crash.crash_record_id).label('count')
-        )
-        .filter(Crash.hit_and_run_i == 'Y')
-        .group_by(Crash.beat_of_occurrence)
-        .order_by(func.count(Crash.crash_record_id).desc())
-        .first()
-    )
-    if row:
-        beat, cnt = row.beat, row.count
+@offense_bp.route('/api/cause-severity')
+def cause_severity_api():
+    beat = request.args.get('beat', 'all')
+    cause    = request.args.get('cause', None)
+    severity = request.args.get('severity', None)
+    return jsonify(get_cause_severity(beat, cause, severity))
+
+def get_top_hit_and_run_beat():
+    rows = hit_and_run_counts_by_beat()
+    if rows:
+        beat, cnt = rows[0]
     else:
         beat, cnt = None, 0
+    return {'beat': beat, 'count': cnt}
+
+@offense_bp.route('/api/most-hit-and-run-beat')
+def summary_top_hit_and_run_beat():
+    return jsonify(get_top_hit_and_run_beat())
+
+@offense_bp.route('/api/bootstrap')
+def offense_bootstrap():
+    """
+    Every offense panel in one request, run concurrently. Takes the panel
+    filters (beat, cause, severity); the hit-and-run map panel is included
+    when bbox (and zoom) are given. ?stream=1 streams panels as NDJSON.
+    """
+    beat     = request.args.get('beat', 'all')
+    cause    = request.args.get('cause', None)
+    severity = request.args.get('severity', None)
+    zoom     = request.args.get('zoom', 11, type=int)
+
+    panels = {
+        'primary_cause': lambda: get_primary_cause_distribution(beat, cause, severity),
+        'cause_severity': lambda: get_cause_severity(beat, cause, severity),
+        'top_hit_and_run_beat': get_top_hit_and_run_beat,
+    }
+    if 'bbox' in request.args:
+        try:
+            bbox = bbox_arg()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        panels['hit_and_run'] = lambda: get_hit_and_run_clusters(bbox, zoom, beat, cause, severity)
 
-    return jsonify({'beat': beat, 'count': cnt})
\ No newline at end of file
+    return bootstrap_response(panels)
@@ -0,0 +1,219 @@
+# app/services/beat_assignment.py
+
+from flask.cli import AppGroup
+from sqlalchemy import column, insert, select, table, text
+from app.models.models import db, Crash
+from app.services.beat_geometry import get_beat_geometry
+import numpy as np
+import pandas as pd
+import click, time
+
+# --------------------------------
+# Batch point-in-polygon beat assignment
+# --------------------------------
+# Works out which police beat polygon every crash coordinate falls in, so
+# BEAT_OF_OCCURRENCE can be audited or backfilled. Points are sorted by
+# longitude once; each beat takes the slice inside its bounding box with two
+# binary searches and tests only those points. Inside a beat the edges are
+# bucketed into horizontal slabs, and each point runs the even-odd crossing
+# test against the edges of its slab only, vectorized over all points of the
+# slab at once.
+
+SLABS = 32
+MAX_CELLS = 4_000_000   # points x edges per vectorized crossing test
+
+
+def _polygon_edges(geometry):
+    """(x1, y1, x2, y2) of every ring edge; holes and parts combine under even-odd."""
+    if geometry["type"] == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        polygons = []
+    edges = []
+    for rings in polygons:
+        for ring in rings:
+            points = np.asarray(ring, dtype=np.float64)[:, :2]
+            if len(points) < 3:
+                continue
+            if not np.array_equal(points[0], points[-1]):
+                points = np.vstack([points, points[:1]])
+            edges.append(np.hstack([points[:-1], points[1:]]))
+    return np.vstack(edges) if edges else np.empty((0, 4))
+
+
+class _Beat:
+    def __init__(self, beat_id, edges, slabs):
+        self.beat_id = beat_id
+        xs, ys = edges[:, [0, 2]], edges[:, [1, 3]]
+        self.west, self.east = xs.min(), xs.max()
+        self.south, self.north = ys.min(), ys.max()
+        self.slab_height = (self.north - self.south) / slabs or 1.0
+        self.slabs = []
+        low, high = ys.min(axis=1), ys.max(axis=1)
+        for s in range(slabs):
+            bottom = self.south + s * self.slab_height
+            top = bottom + self.slab_height
+            in_slab = (high >= bottom) & (low <= top) & (low != high)  # horizontal edges never cross
+            self.slabs.append(edges[in_slab].T.copy())
+
+    def contains(self, x, y):
+        """Even-odd test for points already known to lie in this beat's bounding box."""
+        inside = np.zeros(len(x), dtype=bool)
+        slab = np.clip(((y - self.south) / self.slab_height).astype(np.int64), 0, len(self.slabs) - 1)
+        for s in np.unique(slab):
+            members = np.flatnonzero(slab == s)
+            x1, y1, x2, y2 = self.slabs[s]
+            if not len(x1):
+                continue
+            step = max(1, MAX_CELLS // len(x1))
+            for start in range(0, len(members), step):
+                idx = members[start:start + step]
+                px, py = x[idx, None], y[idx, None]
+                spans = (y1 > py) != (y2 > py)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    cross_x = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+                crossings = np.count_nonzero(spans & (px < cross_x), axis=1)
+                inside[idx] = crossings % 2 == 1
+        return inside
+
+
+class BeatLocator:
+    def __init__(self, geometries, beat_ids, slabs=SLABS):
+        self.beats = []
+        for geometry, beat_id in zip(geometries, beat_ids):
+            edges = _polygon_edges(geometry)
+            if beat_id is not None and len(edges):
+                self.beats.append(_Beat(beat_id, edges, slabs))
+
+    @classmethod
+    def from_geometry(cls, beat_geometry, slabs=SLABS):
+        return cls(beat_geometry.geometries, beat_geometry.beat_ids, slabs)
+
+    def __len__(self):
+        return len(self.beats)
+
+    def assign(self, lat, lng):
+        """
+        Beat id for every point (int64), -1 where the point lies in no beat
+        or has no coordinates. Where polygons overlap the first beat wins.
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        result = np.full(len(lat), -1, dtype=np.int64)
+        valid = np.flatnonzero(np.isfinite(lat) & np.isfinite(lng))
+        order = valid[np.argsort(lng[valid], kind="stable")]
+        sorted_lng = lng[order]
+
+        for beat in self.beats:
+            lo = np.searchsorted(sorted_lng, beat.west, side="left")
+            hi = np.searchsorted(sorted_lng, beat.east, side="right")
+            candidates = order[lo:hi]
+            y = lat[candidates]
+            candidates = candidates[(y >= beat.south) & (y <= beat.north) & (result[candidates] == -1)]
+            if not len(candidates):
+                continue
+            hits = beat.contains(lng[candidates], lat[candidates])
+            result[candidates[hits]] = beat.beat_id
+        return result
+
+
+# --------------------------------
+# Auditing / backfilling BEAT_OF_OCCURRENCE
+# --------------------------------
+CHUNK_ROWS = 200_000
+
+
+def iter_assignments(locator, chunk_rows=CHUNK_ROWS):
+    """Yield DataFrames of (id, recorded, assigned) for every crash, chunk by chunk."""
+    stmt = select(
+        Crash.crash_record_id.label("id"),
+        Crash.beat_of_occurrence.label("recorded"),
+        Crash.latitude.label("lat"),
+        Crash.longitude.label("lng"),
+    )
+    with db.engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql_query(stmt, conn, chunksize=chunk_rows):
+            lat = chunk["lat"].to_numpy(float)
+            lng = chunk["lng"].to_numpy(float)
+            located = (lat != 0) & (lng != 0)  # 0/0 is the dataset's "no location"
+            assigned = np.where(located, locator.assign(lat, lng), -1)
+            yield pd.DataFrame({"id": chunk["id"], "recorded": chunk["recorded"], "assigned": assigned})
+
+
+def summarize_assignments(frame):
+    """Counts for one assignment chunk (see iter_assignments)."""
+    recorded = frame["recorded"]
+    assigned = frame["assigned"]
+    located = assigned != -1
+    return {
+        "rows": len(frame),
+        "unlocated": int((~located).sum()),
+        "null_recorded": int(recorded.isna().sum()),
+        "fillable": int((recorded.isna() & located).sum()),
+        "matches": int((located & (recorded == assigned)).sum()),
+        "mismatches": int((located & recorded.notna() & (recorded != assigned)).sum()),
+    }
+
+
+def _locator_or_fail():
+    beat_geometry = get_beat_geometry()
+    if beat_geometry is None:
+        raise click.ClickException("Beat polygons are not loaded (see BEAT_POLYGONS_PATH).")
+    return BeatLocator.from_geometry(beat_geometry)
+
+
+beats_cli = AppGroup("beats", help="Audit or backfill BEAT_OF_OCCURRENCE from the beat polygons.")
+
+
+@beats_cli.command("audit")
+def audit_command():
+    """Compare every recorded beat with the polygon its coordinates fall in."""
+    locator = _locator_or_fail()
+    totals, start = {}, time.perf_counter()
+    for frame in iter_assignments(locator):
+        for key, value in summarize_assignments(frame).items():
+            totals[key] = totals.get(key, 0) + value
+    elapsed = time.perf_counter() - start
+
+    if not totals:
+        click.echo("No crashes to audit.")
+        return
+    for key in ("rows", "matches", "mismatches", "null_recorded", "fillable", "unlocated"):
+        click.echo(f"{key + ':':<15} {totals[key]:>10,}")
+    click.echo(f"{'throughput:':<15} {totals['rows'] / elapsed:>10,.0f} rows/s (including the database read)")
+
+
+@beats_cli.command("backfill")
+@click.option("--fix-mismatches", is_flag=True, help="Also overwrite recorded beats that disagree with the coordinates.")
+@click.option("--dry-run", is_flag=True, help="Only report how many rows would change.")
+def backfill_command(fix_mismatches, dry_run):
+    """Fill NULL beats (and optionally wrong ones) from the crash coordinates."""
+    locator = _locator_or_fail()
+    fixes_table = table("beat_fixes", column("rid"), column("beat"))
+
+    changed = 0
+    for frame in iter_assignments(locator):
+        wrong = frame["recorded"].isna()
+        if fix_mismatches:
+            wrong |= frame["recorded"] != frame["assigned"]
+        fixes = frame[wrong & (frame["assigned"] != -1)]
+        changed += len(fixes)
+        if dry_run or fixes.empty:
+            continue
+        # stage the chunk's fixes, then apply them with a single UPDATE ... FROM
+        with db.engine.begin() as conn:
+            conn.execute(text("CREATE TEMP TABLE beat_fixes (rid text, beat bigint) ON COMMIT DROP"))
+            conn.execute(insert(fixes_table), [
+                {"rid": rid, "beat": int(beat)} for rid, beat in zip(fixes["id"], fixes["assigned"])
+            ])
+            conn.execute(text("""
+                UPDATE traffic_crashes t
+                SET "BEAT_OF_OCCURRENCE" = f.beat
+                FROM beat_fixes f
+                WHERE t."CRASH_RECORD_ID" = f.rid
+            """))
+
+    verb = "would be updated" if dry_run else "updated"
+    click.echo(f"✅ {changed:,} crashes {verb}.")
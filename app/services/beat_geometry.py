@@ -0,0 +1,172 @@
+# app/services/beat_geometry.py
+
+from flask import current_app
+import numpy as np
+import json, os
+
+# --------------------------------
+# Police beat polygons, loaded once per process
+# --------------------------------
+# The beat GeoJSON is parsed at startup and every polygon is simplified with
+# Douglas-Peucker once per zoom level (tolerance ~TOLERANCE_PX screen pixels
+# at that zoom). Each feature is kept as a pre-serialized JSON string per
+# level, so a choropleth response is the join of those strings plus one
+# count per beat; nothing per request depends on the vertex count.
+
+ZOOM_LEVELS = (9, 11, 13)   # anything finer is served at full resolution
+TOLERANCE_PX = 1.0
+TILE_PX = 256
+COORD_DECIMALS = 6
+
+
+def tolerance_for(zoom):
+    """Simplification tolerance in degrees for `zoom`."""
+    return 360.0 / (TILE_PX * 2 ** zoom) * TOLERANCE_PX
+
+
+def douglas_peucker(points, tolerance):
+    """Indices of the vertices of an open polyline kept at `tolerance` (endpoints always kept)."""
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end]
+        inner = points[start + 1:end]
+        ab = b - a
+        length = np.hypot(*ab)
+        if length == 0:
+            dist = np.hypot(*(inner - a).T)
+        else:
+            dist = np.abs(ab[0] * (inner[:, 1] - a[1]) - ab[1] * (inner[:, 0] - a[0])) / length
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            mid = start + 1 + i
+            keep[mid] = True
+            stack.append((start, mid))
+            stack.append((mid, end))
+    return np.flatnonzero(keep)
+
+
+def simplify_ring(ring, tolerance):
+    """Simplify a closed ring; rings that would collapse below a triangle are kept as-is."""
+    points = np.asarray(ring, dtype=np.float64)
+    if len(points) <= 4:
+        return points
+    # split the ring at the vertex farthest from its start so neither half is closed
+    far = int(np.argmax(np.hypot(*(points - points[0]).T)))
+    first = douglas_peucker(points[:far + 1], tolerance)
+    second = douglas_peucker(points[far:], tolerance) + far
+    simplified = points[np.concatenate([first, second[1:]])]
+    return simplified if len(simplified) >= 4 else points
+
+
+def simplify_geometry(geometry, tolerance):
+    """Polygon / MultiPolygon geometry with every ring simplified."""
+    def polygon(rings):
+        return [simplify_ring(ring, tolerance) for ring in rings]
+
+    if geometry["type"] == "Polygon":
+        return {"type": "Polygon", "coordinates": polygon(geometry["coordinates"])}
+    if geometry["type"] == "MultiPolygon":
+        return {"type": "MultiPolygon", "coordinates": [polygon(p) for p in geometry["coordinates"]]}
+    return geometry
+
+
+def _serialize_geometry(geometry):
+    def ring(points):
+        return np.round(np.asarray(points, dtype=np.float64), COORD_DECIMALS).tolist()
+
+    if geometry["type"] == "Polygon":
+        coordinates = [ring(r) for r in geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        coordinates = [[ring(r) for r in p] for p in geometry["coordinates"]]
+    else:
+        coordinates = geometry["coordinates"]
+    return json.dumps({"type": geometry["type"], "coordinates": coordinates}, separators=(",", ":"))
+
+
+def _vertex_count(geometry):
+    if geometry["type"] == "Polygon":
+        return sum(len(r) for r in geometry["coordinates"])
+    if geometry["type"] == "MultiPolygon":
+        return sum(len(r) for p in geometry["coordinates"] for r in p)
+    return 0
+
+
+class BeatGeometry:
+    def __init__(self, geojson):
+        self.beat_ids = []
+        self.geometries = []
+        self.levels = {zoom: [] for zoom in ZOOM_LEVELS + (None,)}
+        self.vertices = {zoom: 0 for zoom in self.levels}
+
+        for feature in geojson["features"]:
+            properties = dict(feature.get("properties") or {})
+            properties.pop("hit_and_run_count", None)
+            beat_id = properties.get("beat_id")
+            self.beat_ids.append(int(beat_id) if beat_id not in (None, "") else None)
+            self.geometries.append(feature["geometry"])
+
+            # everything up to the properties' closing brace; the count goes in per request
+            props = json.dumps(properties, separators=(",", ":"))[:-1]
+            props += "," if properties else ""
+            for zoom in self.levels:
+                geometry = feature["geometry"]
+                if zoom is not None:
+                    geometry = simplify_geometry(geometry, tolerance_for(zoom))
+                self.vertices[zoom] += _vertex_count(geometry)
+                self.levels[zoom].append(
+                    '{"type":"Feature","geometry":' + _serialize_geometry(geometry) +
+                    ',"properties":' + props + '"hit_and_run_count":'
+                )
+
+    def __len__(self):
+        return len(self.beat_ids)
+
+    @staticmethod
+    def level_for(zoom):
+        """Finest simplified level not finer than `zoom`; None (full detail) past the last one."""
+        if zoom is None or zoom > ZOOM_LEVELS[-1]:
+            return None
+        candidates = [z for z in ZOOM_LEVELS if z <= zoom]
+        return candidates[-1] if candidates else ZOOM_LEVELS[0]
+
+    def choropleth_json(self, counts, zoom=None):
+        """FeatureCollection JSON with hit_and_run_count set from a {beat_id: count} map."""
+        features = self.levels[self.level_for(zoom)]
+        parts = [
+            prefix + str(counts.get(beat_id, 0) if beat_id is not None else 0) + "}}"
+            for prefix, beat_id in zip(features, self.beat_ids)
+        ]
+        return '{"type":"FeatureCollection","features":[' + ",".join(parts) + "]}"
+
+    def stats(self):
+        return {
+            "beats": len(self),
+            "vertices": {("full" if z is None else z): n for z, n in self.vertices.items()},
+            "bytes": {("full" if z is None else z): sum(map(len, f)) for z, f in self.levels.items()},
+        }
+
+
+def load_beat_geometry(path):
+    with open(path) as f:
+        return BeatGeometry(json.load(f))
+
+
+def init_app(app):
+    """Parse and simplify the beat polygons once; missing file leaves the store empty."""
+    path = app.config.get("BEAT_POLYGONS_PATH") or \
+        os.path.join(app.static_folder, "data", "beat_polygons.geojson")
+    try:
+        app.extensions["beat_geometry"] = load_beat_geometry(path)
+    except FileNotFoundError:
+        app.logger.warning("Beat polygons not found at %s; beat maps are disabled", path)
+        app.extensions["beat_geometry"] = None
+
+
+def get_beat_geometry():
+    return current_app.extensions.get("beat_geometry")
@@ -0,0 +1,90 @@
+# app/services/bootstrap.py
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Response, current_app, jsonify, request
+from app.models.models import db
+import json, threading, time
+
+# --------------------------------
+# Page bootstrap: every panel of a dashboard in one request
+# --------------------------------
+# A dashboard registers its panels as plain functions returning JSON-able
+# data. They run concurrently on a process-wide pool of BOOTSTRAP_WORKERS
+# threads, each inside its own app context and therefore with its own
+# session and pooled connection, so the page waits for the slowest panel
+# rather than the sum of all of them. A failing panel is logged and reported
+# in place (without the exception text, which can hold database details)
+# instead of failing the whole page. With ?stream=1 each panel is sent as one
+# NDJSON line the moment it finishes.
+
+PANEL_ERROR = "This panel could not be loaded."
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(app):
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=app.config.get("BOOTSTRAP_WORKERS", 4),
+                    thread_name_prefix="bootstrap",
+                )
+    return _executor
+
+
+def _run_panel(app, name, func):
+    start = time.perf_counter()
+    with app.app_context():
+        try:
+            result = {"panel": name, "data": func()}
+        except Exception:
+            app.logger.exception("Bootstrap panel %s failed", name)
+            result = {"panel": name, "error": PANEL_ERROR}
+        finally:
+            db.session.remove()
+    result["ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def submit_panels(panels):
+    """Start every {name: func} panel; returns the futures in submission order."""
+    app = current_app._get_current_object()
+    executor = _get_executor(app)
+    return [executor.submit(_run_panel, app, name, func) for name, func in panels.items()]
+
+
+def selected_panels(panels):
+    """Restrict to ?panels=a,b when given (unknown names are ignored)."""
+    wanted = request.args.get("panels")
+    if not wanted:
+        return panels
+    names = {name.strip() for name in wanted.split(",")}
+    return {name: func for name, func in panels.items() if name in names}
+
+
+def bootstrap_response(panels):
+    """
+    One response holding every panel:
+    {"panels": {name: data}, "errors": {name: message}, "timings_ms": {name: ms}}
+    or, with ?stream=1, one NDJSON line per panel in completion order.
+    """
+    futures = submit_panels(selected_panels(panels))
+
+    if request.args.get("stream", "").lower() in ("1", "true", "yes"):
+        def generate():
+            for future in as_completed(futures):
+                yield json.dumps(future.result(), default=str) + "\n"
+        return Response(generate(), mimetype="application/x-ndjson")
+
+    body = {"panels": {}, "errors": {}, "timings_ms": {}}
+    for future in as_completed(futures):
+        result = future.result()
+        if "error" in result:
+            body["errors"][result["panel"]] = result["error"]
+        else:
+            body["panels"][result["panel"]] = result["data"]
+        body["timings_ms"][result["panel"]] = result["ms"]
+    return jsonify(body)
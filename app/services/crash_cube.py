@@ -0,0 +1,262 @@
+# app/services/crash_cube.py
+
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func, or_, select
+from app.models.models import db, Crash
+from app.services import crash_events
+import numpy as np
+import pandas as pd
+import click, threading, time
+
+# --------------------------------
+# In-memory columnar crash cube
+# --------------------------------
+# Every dimension the dashboards filter or group on is dictionary-encoded
+# into a small unsigned NumPy array (one code per crash). Filterable
+# dimensions also keep one packed bitmap per distinct value, so any filter
+# combination is a handful of byte-wise ANDs, and every chart is a bincount
+# over the matching codes. Enabled with CRASH_CUBE_ENABLED; when it is off
+# the endpoints keep querying Postgres.
+
+# name -> (Crash column, python type of the values)
+DIMENSIONS = {
+    "month": (Crash.crash_month, int),
+    "weather": (Crash.weather_condition, str),
+    "speed": (Crash.posted_speed_limit, int),
+    "lighting": (Crash.lighting_condition, str),
+    "crash_type": (Crash.crash_type, str),
+    "beat": (Crash.beat_of_occurrence, int),
+    "cause": (Crash.prim_contributory_cause, str),
+    "severity": (Crash.most_severe_injury, str),
+    "hit_and_run": (Crash.hit_and_run_i, str),
+    "hour": (Crash.crash_hour, int),
+    "street": (Crash.street_name, str),
+}
+
+# Dimensions that get per-value bitmaps (the rest are only grouped on)
+FILTER_DIMENSIONS = (
+    "month", "weather", "speed", "lighting", "crash_type",
+    "beat", "cause", "severity", "hit_and_run",
+)
+
+CHUNK_ROWS = 200_000
+
+
+def _code_dtype(n_values):
+    if n_values <= np.iinfo(np.uint8).max:
+        return np.uint8
+    if n_values <= np.iinfo(np.uint16).max:
+        return np.uint16
+    return np.uint32
+
+
+class _Encoder:
+    """Grows a value dictionary while encoding a column chunk by chunk."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.values = []
+        self.lookup = {}
+
+    def _code(self, value):
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            value = None
+        else:
+            value = self.kind(value)
+        if value not in self.lookup:
+            self.lookup[value] = len(self.values)
+            self.values.append(value)
+        return self.lookup[value]
+
+    def encode(self, series):
+        local, uniques = pd.factorize(series, use_na_sentinel=True)
+        mapping = np.array([self._code(u) for u in uniques] + [self._code(None)], dtype=np.int64)
+        return mapping[local]  # -1 (NULL) picks the trailing None code
+
+
+class CrashCube:
+    def __init__(self, columns, values, severe):
+        """
+        columns: dim -> integer code array (all the same length)
+        values:  dim -> list of decoded values, position == code
+        severe:  bool array, crash had a fatal or incapacitating injury
+        """
+        self.values = values
+        self.lookup = {dim: {v: i for i, v in enumerate(vals)} for dim, vals in values.items()}
+        self.columns = {dim: codes.astype(_code_dtype(len(values[dim]))) for dim, codes in columns.items()}
+        self.severe = np.asarray(severe, dtype=bool)
+        self.n = len(self.severe)
+        self.bitmaps = {
+            dim: [np.packbits(self.columns[dim] == code) for code in range(len(values[dim]))]
+            for dim in FILTER_DIMENSIONS
+        }
+        self.built_at = time.time()
+        self.version = None
+
+    # ---------- filtering ----------
+    def mask(self, **filters):
+        """
+        Boolean mask of crashes matching every non-None filter (dim=value),
+        or None when no filter applies. Unknown values match nothing.
+        """
+        packed = None
+        for dim, value in filters.items():
+            if value is None:
+                continue
+            code = self.lookup[dim].get(value)
+            if code is None:
+                return np.zeros(self.n, dtype=bool)
+            bitmap = self.bitmaps[dim][code]
+            packed = bitmap if packed is None else np.bitwise_and(packed, bitmap)
+        if packed is None:
+            return None
+        return np.unpackbits(packed, count=self.n).view(bool)
+
+    def count(self, mask=None):
+        return self.n if mask is None else int(np.count_nonzero(mask))
+
+    def count_severe(self, mask=None):
+        return int(np.count_nonzero(self.severe if mask is None else self.severe & mask))
+
+    # ---------- grouping ----------
+    def _codes(self, dim, mask):
+        codes = self.columns[dim]
+        return codes if mask is None else codes[mask]
+
+    def counts(self, dim, mask=None):
+        """[(value, count)] for every value with at least one crash, most common first."""
+        totals = np.bincount(self._codes(dim, mask), minlength=len(self.values[dim]))
+        order = np.argsort(-totals, kind="stable")
+        return [(self.values[dim][i], int(totals[i])) for i in order if totals[i]]
+
+    def counts2(self, dim_a, dim_b, mask=None):
+        """[(value_a, value_b, count)] for every non-empty pair, most common first."""
+        width = len(self.values[dim_b])
+        pairs = self._codes(dim_a, mask).astype(np.int64) * width + self._codes(dim_b, mask)
+        totals = np.bincount(pairs, minlength=len(self.values[dim_a]) * width)
+        order = np.argsort(-totals, kind="stable")
+        return [
+            (self.values[dim_a][i // width], self.values[dim_b][i % width], int(totals[i]))
+            for i in order if totals[i]
+        ]
+
+    # ---------- footprint ----------
+    def memory_usage(self):
+        columns = sum(codes.nbytes for codes in self.columns.values()) + self.severe.nbytes
+        bitmaps = sum(b.nbytes for maps in self.bitmaps.values() for b in maps)
+        return {"columns": columns, "bitmaps": bitmaps, "total": columns + bitmaps}
+
+    def stats(self):
+        memory = self.memory_usage()
+        per_million = memory["total"] / self.n * 1_000_000 if self.n else 0
+        return {
+            "rows": self.n,
+            "distinct_values": {dim: len(vals) for dim, vals in self.values.items()},
+            "memory_bytes": memory,
+            "bytes_per_million_rows": int(per_million),
+            "built_at": self.built_at,
+        }
+
+
+def load_crash_cube():
+    """Stream the dimension columns out of traffic_crashes and encode them chunk by chunk."""
+    stmt = select(
+        *[column.label(dim) for dim, (column, _) in DIMENSIONS.items()],
+        func.coalesce(or_(Crash.injuries_fatal > 0, Crash.injuries_incapacitating > 0), False).label("severe"),
+    )
+    encoders = {dim: _Encoder(kind) for dim, (_, kind) in DIMENSIONS.items()}
+    parts = {dim: [] for dim in DIMENSIONS}
+    severe = []
+    with db.engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql_query(stmt, conn, chunksize=CHUNK_ROWS):
+            for dim, encoder in encoders.items():
+                parts[dim].append(encoder.encode(chunk[dim]))
+            severe.append(chunk["severe"].to_numpy(dtype=bool))
+
+    def join(arrays, dtype):
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+
+    return CrashCube(
+        {dim: join(parts[dim], np.int64) for dim in DIMENSIONS},
+        {dim: encoder.values for dim, encoder in encoders.items()},
+        join(severe, bool),
+    )
+
+
+# --------------------------------
+# Process-wide cube
+# --------------------------------
+_cube = None
+_stale = False
+_checked_at = 0.0
+_build_lock = threading.Lock()
+
+
+def cube_enabled():
+    return current_app.config.get("CRASH_CUBE_ENABLED", False)
+
+
+def refresh_crash_cube():
+    global _cube, _stale, _checked_at
+    version = crash_events.table_version()
+    cube = load_crash_cube()
+    cube.version = version
+    _cube, _stale, _checked_at = cube, False, time.time()
+    return cube
+
+
+def _is_current(cube):
+    """
+    Still valid? Rebuilt after CRASH_CUBE_TTL, after an ORM commit in this
+    process, or when the table's change counter moved (checked at most every
+    CRASH_CUBE_CHECK_INTERVAL seconds).
+    """
+    global _checked_at
+    if cube is None or _stale:
+        return False
+    now = time.time()
+    if now - cube.built_at > current_app.config.get("CRASH_CUBE_TTL", 3600):
+        return False
+    if now - _checked_at > current_app.config.get("CRASH_CUBE_CHECK_INTERVAL", 30):
+        _checked_at = now
+        return crash_events.table_version() == cube.version
+    return True
+
+
+def get_crash_cube():
+    cube = _cube
+    if not _is_current(cube):
+        with _build_lock:
+            cube = _cube
+            if not _is_current(cube):
+                cube = refresh_crash_cube()
+    return cube
+
+
+@crash_events.subscribe
+def _on_crashes_committed(inserted, changed):
+    global _stale
+    _stale = True
+
+
+# --------------------------------
+# CLI: flask cube ...
+# --------------------------------
+cube_cli = AppGroup("cube", help="Inspect the in-memory crash cube.")
+
+
+@cube_cli.command("stats")
+def stats_command():
+    """Build the cube once and report its size and memory per million rows."""
+    start = time.perf_counter()
+    cube = refresh_crash_cube()
+    elapsed = time.perf_counter() - start
+    stats = cube.stats()
+    click.echo(f"rows:                   {stats['rows']:,}")
+    click.echo(f"build time:             {elapsed:.1f}s")
+    click.echo(f"columns:                {stats['memory_bytes']['columns'] / 2**20:.1f} MiB")
+    click.echo(f"bitmaps:                {stats['memory_bytes']['bitmaps'] / 2**20:.1f} MiB")
+    click.echo(f"per million rows:       {stats['bytes_per_million_rows'] / 2**20:.1f} MiB")
+    for dim, n in stats["distinct_values"].items():
+        click.echo(f"  {dim:<12} {n:>6} values")
@@ -0,0 +1,79 @@
+# app/services/crash_events.py
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from app.models.models import db, Crash
+import threading
+
+# --------------------------------
+# In-process change notifications for Crash rows
+# --------------------------------
+# In-memory indexes subscribe here to hear about rows committed through the
+# ORM in this process. Rows loaded by external ETL jobs never pass through
+# here, so every index also expires on its own TTL or polls table_version().
+
+_subscribers = []
+_version = 0
+_lock = threading.Lock()
+
+CRASH_ATTRS = [attr.key for attr in inspect(Crash).column_attrs]
+
+
+def subscribe(callback):
+    """
+    Register callback(inserted, changed) to run after every commit that
+    touched Crash rows. `inserted` is a list of plain dicts keyed by Crash
+    attribute name; `changed` is True when rows were updated or deleted.
+    """
+    _subscribers.append(callback)
+    return callback
+
+
+def data_version():
+    """Counter bumped on every commit that touched Crash rows in this process."""
+    return _version
+
+
+def table_version():
+    """
+    Cumulative insert/update/delete counter for traffic_crashes from the
+    statistics collector. Cheap to read and it also moves when rows are
+    loaded outside this process, so caches can poll it to detect ETL loads.
+    """
+    return db.session.execute(text("""
+        SELECT n_tup_ins + n_tup_upd + n_tup_del
+        FROM pg_stat_user_tables
+        WHERE relname = 'traffic_crashes'
+    """)).scalar()
+
+
+def _snapshot(crash):
+    return {key: getattr(crash, key) for key in CRASH_ATTRS}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    inserted = [_snapshot(obj) for obj in session.new if isinstance(obj, Crash)]
+    changed = any(isinstance(obj, Crash) for obj in list(session.dirty) + list(session.deleted))
+    if not inserted and not changed:
+        return
+    pending = session.info.setdefault("crash_changes", {"inserted": [], "changed": False})
+    pending["inserted"].extend(inserted)
+    pending["changed"] = pending["changed"] or changed
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session):
+    global _version
+    pending = session.info.pop("crash_changes", None)
+    if not pending:
+        return
+    with _lock:
+        _version += 1
+    for callback in _subscribers:
+        callback(pending["inserted"], pending["changed"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("crash_changes", None)
@@ -0,0 +1,128 @@
+# app/services/dimension_catalog.py
+
+from flask import current_app
+from sqlalchemy import func
+from app.models.models import db, Crash
+from app.services import crash_events
+import threading, time
+
+# --------------------------------
+# Distinct values of every categorical Crash column
+# --------------------------------
+# The dropdowns on the environment, impact and offense pages and the value
+# lists in the chatbot prompt all come from here. One GROUPING SETS scan
+# counts every value of every dimension at once; the result is kept in
+# memory, bumped in place for rows inserted through the ORM and rebuilt after
+# updates/deletes or DIMENSION_CATALOG_TTL seconds.
+
+# name -> Crash attribute (names shared with the crash cube where they overlap)
+DIMENSIONS = {
+    "month": Crash.crash_month,
+    "weather": Crash.weather_condition,
+    "speed": Crash.posted_speed_limit,
+    "lighting": Crash.lighting_condition,
+    "crash_type": Crash.crash_type,
+    "beat": Crash.beat_of_occurrence,
+    "cause": Crash.prim_contributory_cause,
+    "severity": Crash.most_severe_injury,
+    "hit_and_run": Crash.hit_and_run_i,
+    "traffic_control_device": Crash.traffic_control_device,
+    "device_condition": Crash.device_condition,
+    "first_crash_type": Crash.first_crash_type,
+    "trafficway_type": Crash.trafficway_type,
+    "alignment": Crash.alignment,
+    "roadway_surface_cond": Crash.roadway_surface_cond,
+    "road_defect": Crash.road_defect,
+}
+
+
+class DimensionCatalog:
+    def __init__(self, rows):
+        """rows: (dimension, value, count), one per distinct value (NULL included)"""
+        self.value_counts = {dim: {} for dim in DIMENSIONS}
+        for dim, value, count in rows:
+            self.value_counts[dim][value] = count
+        self.built_at = time.time()
+        # add_crash runs in the after-commit listener while requests read the counts
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def column_name(dim):
+        """Database column behind a dimension, e.g. "WEATHER_CONDITION"."""
+        return DIMENSIONS[dim].expression.name
+
+    def _items(self, dim):
+        with self._lock:
+            return list(self.value_counts[dim].items())
+
+    def counts(self, dim):
+        """[(value, count)], most common first (NULL included)."""
+        return sorted(self._items(dim), key=lambda kv: kv[1], reverse=True)
+
+    def options(self, dim):
+        """Sorted dropdown values: every non-empty value seen at least once."""
+        return sorted(v for v, n in self._items(dim) if v and n > 0)
+
+    def add_crash(self, row):
+        """Count a newly inserted crash (a dict keyed by Crash attribute name)."""
+        with self._lock:
+            for dim, column in DIMENSIONS.items():
+                value = row.get(column.key)
+                counts = self.value_counts[dim]
+                counts[value] = counts.get(value, 0) + 1
+
+
+def load_dimension_rows():
+    """One scan of traffic_crashes: (dimension, value, count) for every dimension."""
+    columns = list(DIMENSIONS.values())
+    rows = (
+        db.session.query(*columns, *[func.grouping(c) for c in columns], func.count())
+        .group_by(func.grouping_sets(*columns))
+        .all()
+    )
+    names = list(DIMENSIONS)
+    n = len(names)
+    result = []
+    for row in rows:
+        i = list(row[n:2 * n]).index(0)  # the one column this row is grouped by
+        result.append((names[i], row[i], row[-1]))
+    return result
+
+
+# --------------------------------
+# Process-wide catalog
+# --------------------------------
+_catalog = None
+_stale = False
+_build_lock = threading.Lock()
+
+
+def refresh_dimension_catalog():
+    global _catalog, _stale
+    catalog = DimensionCatalog(load_dimension_rows())
+    _catalog, _stale = catalog, False
+    return catalog
+
+
+def get_dimension_catalog():
+    """Current catalog, rebuilt when missing, invalidated or older than DIMENSION_CATALOG_TTL."""
+    catalog = _catalog
+    ttl = current_app.config.get("DIMENSION_CATALOG_TTL", 3600)
+    if catalog is None or _stale or time.time() - catalog.built_at > ttl:
+        with _build_lock:
+            catalog = _catalog
+            if catalog is None or _stale or time.time() - catalog.built_at > ttl:
+                catalog = refresh_dimension_catalog()
+    return catalog
+
+
+@crash_events.subscribe
+def _on_crashes_committed(inserted, changed):
+    global _stale
+    if changed:
+        _stale = True
+    catalog = _catalog
+    if catalog is None:
+        return
+    for row in inserted:
+        catalog.add_crash(row)
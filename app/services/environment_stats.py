@@ -0,0 +1,135 @@
+# app/services/environment_stats.py
+
+from sqlalchemy import func, or_, text
+from app.models.models import db, Crash
+from app.services.crash_cube import cube_enabled, get_crash_cube
+
+# --------------------------------
+# Server-side aggregation for /environment/api/data
+# --------------------------------
+# The metrics and the three charts come from one GROUPING SETS query and the
+# most common street from one ORDER BY ... LIMIT 1 query, so the worker only
+# ever holds a few dozen aggregate rows no matter how many crashes match.
+# With the crash cube enabled the same numbers come from memory instead.
+
+EMPTY_SUMMARY = {
+    "metrics": {
+        "total": 0,
+        "common_street": "-",
+        "common_street_count": 0,
+        "severe": 0
+    },
+    "charts": {
+        "speed": [],
+        "weather": [],
+        "lighting": []
+    }
+}
+
+
+def filter_args(args):
+    """(month, weather, speed, lighting) from request args; missing or blank means 'All'."""
+    return tuple(args.get(name) or 'All' for name in ('month', 'weather', 'speed', 'lighting'))
+
+
+def filter_crashes(query, month='All', weather='All', speed='All', lighting='All'):
+    """Apply the environment page dropdown filters to a Crash query."""
+    if month != 'All':
+        query = query.filter(Crash.crash_month == int(month))
+    if weather != 'All':
+        query = query.filter(Crash.weather_condition == weather)
+    if speed != 'All':
+        query = query.filter(Crash.posted_speed_limit == int(speed))
+    if lighting != 'All':
+        query = query.filter(Crash.lighting_condition == lighting)
+    return query
+
+
+def environment_summary(month='All', weather='All', speed='All', lighting='All'):
+    """Metrics and chart data for the environment page, same shape as the JSON API."""
+    if cube_enabled():
+        return cube_environment_summary(get_crash_cube(), month, weather, speed, lighting)
+
+    severe = or_(Crash.injuries_fatal > 0, Crash.injuries_incapacitating > 0)
+    rows = filter_crashes(
+        db.session.query(
+            Crash.posted_speed_limit,
+            Crash.weather_condition,
+            Crash.lighting_condition,
+            func.grouping(Crash.posted_speed_limit),
+            func.grouping(Crash.weather_condition),
+            func.grouping(Crash.lighting_condition),
+            func.count(),
+            func.count().filter(severe),
+        ),
+        month, weather, speed, lighting,
+    ).group_by(func.grouping_sets(
+        Crash.posted_speed_limit,
+        Crash.weather_condition,
+        Crash.lighting_condition,
+        text("()"),   # grand total; a bare () would be sent as a bind parameter
+    )).order_by(func.count().desc()).all()
+
+    total_crashes, severe_count = 0, 0
+    charts = {"speed": [], "weather": [], "lighting": []}
+    for speed_value, weather_value, lighting_value, g_speed, g_weather, g_lighting, count, severe_in_group in rows:
+        if not g_speed:
+            charts["speed"].append({"label": str(speed_value), "count": count})
+        elif not g_weather:
+            charts["weather"].append({"label": weather_value, "count": count})
+        elif not g_lighting:
+            charts["lighting"].append({"label": lighting_value, "count": count})
+        else:
+            total_crashes, severe_count = count, severe_in_group
+
+    if not total_crashes:
+        return EMPTY_SUMMARY
+
+    top_street = filter_crashes(
+        db.session.query(Crash.street_name, func.count().label("count")),
+        month, weather, speed, lighting,
+    ).filter(Crash.street_name.isnot(None)) \
+        .group_by(Crash.street_name) \
+        .order_by(func.count().desc()) \
+        .first()
+    common_street, street_count = (top_street[0], top_street[1]) if top_street else ("-", 0)
+
+    return {
+        "metrics": {
+            "total": total_crashes,
+            "common_street": common_street,
+            "common_street_count": street_count,
+            "severe": severe_count
+        },
+        "charts": charts
+    }
+
+
+def cube_environment_summary(cube, month='All', weather='All', speed='All', lighting='All'):
+    """environment_summary() answered from the in-memory crash cube."""
+    mask = cube.mask(
+        month=None if month == 'All' else int(month),
+        weather=None if weather == 'All' else weather,
+        speed=None if speed == 'All' else int(speed),
+        lighting=None if lighting == 'All' else lighting,
+    )
+    total_crashes = cube.count(mask)
+    if not total_crashes:
+        return EMPTY_SUMMARY
+
+    streets = [(name, count) for name, count in cube.counts("street", mask) if name is not None]
+    common_street, street_count = streets[0] if streets else ("-", 0)
+
+    return {
+        "metrics": {
+            "total": total_crashes,
+            "common_street": common_street,
+            "common_street_count": street_count,
+            "severe": cube.count_severe(mask)
+        },
+        "charts": {
+            "speed": [{"label": str(k), "count": v} for k, v in cube.counts("speed", mask)],
+            "weather": [{"label": k, "count": v} for k, v in cube.counts("weather", mask)],
+            "lighting": [{"label": k, "count": v} for k, v in cube.counts("lighting", mask)],
+        }
+    }
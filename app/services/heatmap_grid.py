@@ -0,0 +1,144 @@
+# app/services/heatmap_grid.py
+
+from collections import OrderedDict
+from flask import current_app
+from app.models.models import db, Crash
+from app.services import crash_events
+from app.services.environment_stats import filter_crashes
+import numpy as np
+import pandas as pd
+import json, threading, time
+
+# --------------------------------
+# Density grids for the environment heatmap
+# --------------------------------
+# Every matching coordinate is binned (no sampling) into a fixed lat/lng grid
+# per zoom level, with cells sized to roughly CELL_PX screen pixels at that
+# zoom. Grids are anchored at (0, 0) so chunks can be binned independently
+# and merged. The serialized JSON for each level is cached per filter
+# combination; nothing is written to disk.
+
+ZOOM_LEVELS = (10, 11, 12, 13)
+CELL_PX = 8
+CHUNK_ROWS = 100_000
+COL_OFFSET = 1 << 31
+
+
+def cell_deg(zoom):
+    """Grid cell edge in degrees that spans about CELL_PX pixels at `zoom`."""
+    return 360.0 / (256 * 2 ** zoom) * CELL_PX
+
+
+def cell_keys(lat, lng, size):
+    rows = np.floor(np.asarray(lat) / size).astype(np.int64)
+    cols = np.floor(np.asarray(lng) / size).astype(np.int64) + COL_OFFSET
+    return (rows << 32) | cols
+
+
+class DensityGrid:
+    """Counts per grid cell, accumulated chunk by chunk."""
+
+    def __init__(self, size):
+        self.size = size
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def add(self, lat, lng):
+        keys, counts = np.unique(cell_keys(lat, lng, self.size), return_counts=True)
+        merged, inverse = np.unique(np.concatenate([self.keys, keys]), return_inverse=True)
+        self.counts = np.bincount(inverse, weights=np.concatenate([self.counts, counts])).astype(np.int64)
+        self.keys = merged
+
+    def payload(self, zoom):
+        """
+        Non-empty cells as parallel integer arrays. Cell (r, c) is centred on
+        ((origin[0] + r + 0.5) * cell_deg, (origin[1] + c + 0.5) * cell_deg).
+        """
+        rows = self.keys >> 32
+        cols = (self.keys & 0xFFFFFFFF) - COL_OFFSET
+        origin = (int(rows.min()), int(cols.min())) if len(rows) else (0, 0)
+        return {
+            "zoom": zoom,
+            "cell_deg": self.size,
+            "origin": origin,
+            "max": int(self.counts.max()) if len(self.counts) else 0,
+            "rows": (rows - origin[0]).tolist(),
+            "cols": (cols - origin[1]).tolist(),
+            "count": self.counts.tolist(),
+        }
+
+
+def build_heatmap_levels(month='All', weather='All', speed='All', lighting='All'):
+    """Bin every matching crash at each zoom level; returns {zoom: json string}."""
+    grids = {zoom: DensityGrid(cell_deg(zoom)) for zoom in ZOOM_LEVELS}
+    total = 0
+    query = filter_crashes(
+        db.session.query(Crash.latitude, Crash.longitude),
+        month, weather, speed, lighting,
+    ).filter(Crash.latitude.isnot(None), Crash.longitude.isnot(None)) \
+        .filter(Crash.latitude != 0, Crash.longitude != 0)
+
+    with db.engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql_query(query.statement, conn, chunksize=CHUNK_ROWS):
+            lat, lng = chunk.iloc[:, 0].to_numpy(float), chunk.iloc[:, 1].to_numpy(float)
+            total += len(lat)
+            for grid in grids.values():
+                grid.add(lat, lng)
+
+    return {
+        zoom: json.dumps({"total": total, **grid.payload(zoom)}, separators=(",", ":"))
+        for zoom, grid in grids.items()
+    }
+
+
+def level_for(zoom):
+    """Finest precomputed level not finer than the map's zoom."""
+    candidates = [z for z in ZOOM_LEVELS if z <= zoom]
+    return candidates[-1] if candidates else ZOOM_LEVELS[0]
+
+
+# --------------------------------
+# Per-filter LRU cache
+# --------------------------------
+_cache = OrderedDict()   # filters -> (built_at, data_version, {zoom: json})
+_lock = threading.Lock()
+_build_locks = {}        # filters -> lock held while that grid is built
+
+
+def _cached_levels(key, ttl, version):
+    """Cached {zoom: json} for key when fresh, else None. Call with _lock held."""
+    entry = _cache.get(key)
+    if entry and time.time() - entry[0] <= ttl and entry[1] == version:
+        _cache.move_to_end(key)
+        return entry[2]
+    return None
+
+
+def heatmap_json(zoom, month='All', weather='All', speed='All', lighting='All'):
+    key = (month, weather, speed, lighting)
+    ttl = current_app.config.get("HEATMAP_CACHE_TTL", 600)
+    size = current_app.config.get("HEATMAP_CACHE_SIZE", 64)
+    version = crash_events.data_version()
+
+    with _lock:
+        levels = _cached_levels(key, ttl, version)
+        if levels is not None:
+            return levels[level_for(zoom)]
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+
+    # Concurrent misses for the same filters wait for one build instead of each scanning
+    with build_lock:
+        with _lock:
+            levels = _cached_levels(key, ttl, version)
+        if levels is None:
+            try:
+                levels = build_heatmap_levels(month, weather, speed, lighting)
+                with _lock:
+                    _cache[key] = (time.time(), version, levels)
+                    _cache.move_to_end(key)
+                    while len(_cache) > size:
+                        _cache.popitem(last=False)
+            finally:
+                with _lock:
+                    _build_locks.pop(key, None)
+    return levels[level_for(zoom)]
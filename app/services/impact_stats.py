@@ -0,0 +1,112 @@
+# app/services/impact_stats.py
+
+from flask import current_app
+from sqlalchemy import func, tuple_
+from app.models.models import db, Crash
+from app.services.crash_cube import cube_enabled, get_crash_cube
+from app.services import crash_events
+import threading, time
+
+# --------------------------------
+# Single-pass aggregation for the /impact page
+# --------------------------------
+# One GROUPING SETS query returns crash counts per crash type, per
+# (crash type, hour) and per (crash type, most severe injury). Every
+# histogram and total on the page, for "All" or any single crash type, is a
+# slice or sum of that result, so it is computed once and shared between
+# /impact and /api/filter/<crash_type> for IMPACT_STATS_TTL seconds.
+
+
+class ImpactAggregates:
+    def __init__(self, rows):
+        """rows: (crash_type, crash_hour, most_severe_injury, by_hour, by_injury, count)"""
+        self.type_counts = {}
+        self.hour_counts = {}
+        self.injury_counts = {}
+        for crash_type, hour, injury, hour_rolled_up, injury_rolled_up, count in rows:
+            if not hour_rolled_up:
+                self.hour_counts[(crash_type, hour)] = count
+            elif not injury_rolled_up:
+                self.injury_counts[(crash_type, injury)] = count
+            else:
+                self.type_counts[crash_type] = count
+        self.built_at = time.time()
+        self.version = crash_events.data_version()
+
+    @staticmethod
+    def _matches(crash_type, selected):
+        return selected in (None, "All") or crash_type == selected
+
+    def _collapse(self, counts, selected):
+        totals = {}
+        for (crash_type, key), count in counts.items():
+            if self._matches(crash_type, selected):
+                totals[key] = totals.get(key, 0) + count
+        return totals
+
+    def crash_types(self):
+        """[(crash_type, count)] over all crashes, most common first."""
+        return sorted(self.type_counts.items(), key=lambda kv: kv[1], reverse=True)
+
+    def hours(self, crash_type=None):
+        """[(hour, count)] ordered by hour, NULL hour last (as ORDER BY in Postgres)."""
+        totals = self._collapse(self.hour_counts, crash_type)
+        return sorted(totals.items(), key=lambda kv: (kv[0] is None, kv[0] or 0))
+
+    def injuries(self, crash_type=None):
+        """[(most_severe_injury, count)], most common first."""
+        totals = self._collapse(self.injury_counts, crash_type)
+        return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+
+    def total(self, crash_type=None):
+        return sum(count for t, count in self.type_counts.items() if self._matches(t, crash_type))
+
+    def crash_type_options(self):
+        return sorted(t for t in self.type_counts if t)
+
+
+def cube_impact_rows(cube):
+    """The GROUPING SETS result rebuilt from the in-memory crash cube."""
+    rows = [(t, None, None, 1, 1, n) for t, n in cube.counts("crash_type")]
+    rows += [(t, h, None, 0, 1, n) for t, h, n in cube.counts2("crash_type", "hour")]
+    rows += [(t, None, i, 1, 0, n) for t, i, n in cube.counts2("crash_type", "severity")]
+    return rows
+
+
+def load_impact_aggregates():
+    if cube_enabled():
+        return ImpactAggregates(cube_impact_rows(get_crash_cube()))
+
+    rows = (
+        db.session.query(
+            Crash.crash_type,
+            Crash.crash_hour,
+            Crash.most_severe_injury,
+            func.grouping(Crash.crash_hour),
+            func.grouping(Crash.most_severe_injury),
+            func.count(Crash.crash_record_id),
+        )
+        .group_by(func.grouping_sets(
+            tuple_(Crash.crash_type),
+            tuple_(Crash.crash_type, Crash.crash_hour),
+            tuple_(Crash.crash_type, Crash.most_severe_injury),
+        ))
+        .all()
+    )
+    return ImpactAggregates(rows)
+
+
+_cached = None
+_lock = threading.Lock()
+
+
+def get_impact_aggregates():
+    """Shared aggregates, recomputed after IMPACT_STATS_TTL seconds or a Crash commit."""
+    global _cached
+    ttl = current_app.config.get("IMPACT_STATS_TTL", 60)
+    with _lock:
+        cached = _cached
+        if (cached is None or time.time() - cached.built_at > ttl
+                or cached.version != crash_events.data_version()):
+            cached = _cached = load_impact_aggregates()
+    return cached
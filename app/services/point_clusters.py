@@ -0,0 +1,197 @@
+# app/services/point_clusters.py
+
+from collections import OrderedDict
+from flask import current_app
+from app.models.models import db, Crash
+from app.services import crash_events
+import numpy as np
+import threading, time
+
+# --------------------------------
+# Zoom-aware point clustering for map layers
+# --------------------------------
+# Points are projected to Web Mercator and, for every zoom level from
+# MIN_ZOOM to MAX_ZOOM, binned into square cells CLUSTER_PX screen pixels
+# wide. A cell at zoom z is exactly four cells at z + 1, so the levels form a
+# hierarchy and clusters never jump between zooms. A viewport query only
+# touches the clusters of one level; above MAX_ZOOM the raw points in the
+# viewport are returned.
+
+MIN_ZOOM = 8
+MAX_ZOOM = 16
+CLUSTER_PX = 60
+TILE_PX = 256
+MAX_POINTS = 2000
+
+
+def mercator(lat, lng):
+    """Project to Web Mercator world coordinates in [0, 1)."""
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.05112878, 85.05112878)
+    x = (np.asarray(lng, dtype=np.float64) + 180.0) / 360.0
+    sin = np.sin(np.radians(lat))
+    y = 0.5 - np.log((1 + sin) / (1 - sin)) / (4 * np.pi)
+    return x, y
+
+
+def _cells(x, y, zoom):
+    scale = TILE_PX * 2 ** zoom / CLUSTER_PX
+    return np.floor(x * scale).astype(np.int64), np.floor(y * scale).astype(np.int64)
+
+
+class ClusterLevel:
+    """Clusters of one zoom level as parallel arrays."""
+
+    def __init__(self, cx, cy, count, lat, lng, first):
+        self.cx, self.cy = cx, cy
+        self.count = count
+        self.lat, self.lng = lat, lng
+        self.first = first  # index of one member point (the only one when count == 1)
+
+
+class ClusterIndex:
+    def __init__(self, lat, lng, properties):
+        """
+        lat, lng:   point coordinates
+        properties: list of per-point dicts returned for unclustered points
+        """
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self.properties = properties
+        self.x, self.y = mercator(self.lat, self.lng)
+        self.levels = {zoom: self._build_level(zoom) for zoom in range(MIN_ZOOM, MAX_ZOOM + 1)}
+        self.built_at = time.time()
+        self.version = None
+
+    def _build_level(self, zoom):
+        cx, cy = _cells(self.x, self.y, zoom)
+        keys = (cy << 32) | cx
+        uniq, first, inverse, count = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+        return ClusterLevel(
+            cx=(uniq & 0xFFFFFFFF),
+            cy=(uniq >> 32),
+            count=count,
+            lat=np.bincount(inverse, weights=self.lat) / count,
+            lng=np.bincount(inverse, weights=self.lng) / count,
+            first=first,
+        )
+
+    def __len__(self):
+        return len(self.lat)
+
+    # ---------- queries ----------
+    def _point_feature(self, i):
+        return {
+            "type": "Feature",
+            "properties": self.properties[i],
+            "geometry": {"type": "Point", "coordinates": [float(self.lng[i]), float(self.lat[i])]},
+        }
+
+    def _raw_points(self, west, south, east, north, limit):
+        inside = np.flatnonzero(
+            (self.lat >= south) & (self.lat <= north) & (self.lng >= west) & (self.lng <= east)
+        )
+        return [self._point_feature(i) for i in inside[:limit]], len(inside)
+
+    def clusters(self, west, south, east, north, zoom, limit=MAX_POINTS):
+        """
+        GeoJSON features visible in the bbox at `zoom`: one per cluster
+        (properties cluster/point_count) or per single point (its properties).
+        Beyond MAX_ZOOM every point in the bbox is returned, up to `limit`.
+        """
+        zoom = int(zoom)
+        if zoom > MAX_ZOOM:
+            features, total = self._raw_points(west, south, east, north, limit)
+            return {"zoom": zoom, "total": total, "truncated": total > len(features), "features": features}
+
+        level = self.levels[max(zoom, MIN_ZOOM)]
+        x0, y1 = mercator(south, west)
+        x1, y0 = mercator(north, east)
+        (cx0, cx1), (cy0, cy1) = _cells(np.array([x0, x1]), np.array([y0, y1]), max(zoom, MIN_ZOOM))
+        visible = np.flatnonzero(
+            (level.cx >= cx0) & (level.cx <= cx1) & (level.cy >= cy0) & (level.cy <= cy1)
+        )
+        total = int(level.count[visible].sum())
+        truncated = len(visible) > limit
+        if truncated:  # far larger bbox than a screen: keep the biggest clusters
+            visible = visible[np.argsort(-level.count[visible], kind="stable")[:limit]]
+
+        features = []
+        for i in visible:
+            if level.count[i] == 1:
+                features.append(self._point_feature(level.first[i]))
+            else:
+                features.append({
+                    "type": "Feature",
+                    "properties": {"cluster": True, "point_count": int(level.count[i])},
+                    "geometry": {"type": "Point", "coordinates": [float(level.lng[i]), float(level.lat[i])]},
+                })
+        return {"zoom": zoom, "total": total, "truncated": truncated, "features": features}
+
+    def stats(self):
+        return {
+            "points": len(self),
+            "clusters_per_zoom": {zoom: len(level.count) for zoom, level in self.levels.items()},
+            "built_at": self.built_at,
+        }
+
+
+# --------------------------------
+# Hit-and-run clusters per offense filter set
+# --------------------------------
+def hit_and_run_query(beat='all', cause=None, severity=None):
+    """Located hit-and-run crashes matching the offense page filters."""
+    q = db.session.query(
+        Crash.latitude.label('lat'),
+        Crash.longitude.label('lng'),
+        Crash.crash_date.label('date'),
+        Crash.prim_contributory_cause.label('cause'),
+    ).filter(Crash.hit_and_run_i == 'Y') \
+        .filter(Crash.latitude.isnot(None), Crash.longitude.isnot(None)) \
+        .filter(Crash.latitude != 0, Crash.longitude != 0)
+
+    if beat != 'all':
+        try:
+            q = q.filter(Crash.beat_of_occurrence == int(beat))
+        except ValueError:
+            pass
+    if cause:
+        q = q.filter(Crash.prim_contributory_cause == cause)
+    if severity:
+        q = q.filter(Crash.most_severe_injury == severity)
+    return q
+
+
+def load_hit_and_run_index(beat='all', cause=None, severity=None):
+    rows = hit_and_run_query(beat, cause, severity).all()
+    return ClusterIndex(
+        [row.lat for row in rows],
+        [row.lng for row in rows],
+        [{"date": row.date, "cause": row.cause or 'Unknown'} for row in rows],
+    )
+
+
+_cache = OrderedDict()   # (beat, cause, severity) -> ClusterIndex
+_lock = threading.Lock()
+
+
+def get_hit_and_run_index(beat='all', cause=None, severity=None):
+    """Cluster index for one filter set, kept for HIT_AND_RUN_CLUSTER_TTL seconds."""
+    key = (beat, cause or None, severity or None)
+    ttl = current_app.config.get("HIT_AND_RUN_CLUSTER_TTL", 600)
+    size = current_app.config.get("HIT_AND_RUN_CLUSTER_CACHE_SIZE", 32)
+    version = crash_events.data_version()
+
+    with _lock:
+        index = _cache.get(key)
+        if index is not None and time.time() - index.built_at <= ttl and index.version == version:
+            _cache.move_to_end(key)
+            return index
+
+    index = load_hit_and_run_index(*key)
+    index.version = version
+    with _lock:
+        _cache[key] = index
+        _cache.move_to_end(key)
+        while len(_cache) > size:
+            _cache.popitem(last=False)
+    return index
@@ -0,0 +1,358 @@
+# app/services/rollups.py
+
+from datetime import datetime, timezone
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import column, func, select, table, text
+from sqlalchemy.exc import SQLAlchemyError
+from app.models.models import db
+import click
+
+# --------------------------------
+# Rollup tables maintained from traffic_crashes
+# --------------------------------
+# crash_rollup holds one row per (dimension, value) with the number of crashes,
+# e.g. ('month', '7', 31204) or ('total', NULL, 812345), for the /location
+# landing cards. crash_offense_rollup holds one row per (beat, primary cause,
+# most severe injury, hit and run) for the /offense charts. Triggers on
+# traffic_crashes keep the counts in step with inserts, updates and deletes;
+# `flask rollups refresh` rebuilds everything from scratch.
+
+LANDING_ROLLUP = "landing"
+OFFENSE_ROLLUP = "offense"
+
+# rollup name -> prefix of its table, trigger function and triggers
+ROLLUP_OBJECTS = {
+    LANDING_ROLLUP: "crash_rollup",
+    OFFENSE_ROLLUP: "crash_offense_rollup",
+}
+
+ROLLUP_DIMENSIONS = {
+    "month": '"CRASH_MONTH"',
+    "weather": '"WEATHER_CONDITION"',
+    "cause": '"PRIM_CONTRIBUTORY_CAUSE"',
+}
+
+# Values the landing cards never report as "most common"
+EXCLUDED_VALUES = {
+    "weather": {None, "UNKNOWN"},
+    "cause": {None, "UNABLE TO DETERMINE"},
+}
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS crash_rollup (
+    dimension   TEXT   NOT NULL,
+    value       TEXT,
+    crash_count BIGINT NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS crash_rollup_key
+    ON crash_rollup (dimension, (COALESCE(value, '')));
+CREATE TABLE IF NOT EXISTS crash_rollup_state (
+    name         TEXT PRIMARY KEY,
+    refreshed_at TIMESTAMPTZ NOT NULL,
+    dirty        BOOLEAN NOT NULL DEFAULT FALSE
+);
+CREATE TABLE IF NOT EXISTS crash_offense_rollup (
+    beat        BIGINT,
+    cause       TEXT,
+    severity    TEXT,
+    hit_and_run TEXT,
+    crash_count BIGINT NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS crash_offense_rollup_key
+    ON crash_offense_rollup ((COALESCE(beat, -1)), (COALESCE(cause, '')),
+                             (COALESCE(severity, '')), (COALESCE(hit_and_run, '')));
+"""
+
+# crash_offense_rollup column -> traffic_crashes column
+OFFENSE_COLUMNS = {
+    "beat": '"BEAT_OF_OCCURRENCE"',
+    "cause": '"PRIM_CONTRIBUTORY_CAUSE"',
+    "severity": '"MOST_SEVERE_INJURY"',
+    "hit_and_run": '"HIT_AND_RUN_I"',
+}
+# crash_offense_rollup column -> the value its unique index folds NULL into
+OFFENSE_BLANKS = {"beat": "-1", "cause": "''", "severity": "''", "hit_and_run": "''"}
+OFFENSE_KEY = ", ".join(f"(COALESCE({name}, {blank}))" for name, blank in OFFENSE_BLANKS.items())
+
+offense_rollup = table("crash_offense_rollup", *[column(name) for name in OFFENSE_COLUMNS], column("crash_count"))
+
+
+def _rollup_select(source, sign=1):
+    """
+    SELECT producing (dimension, value, crash_count) rows for `source`.
+    Groups on the same COALESCE as the unique index, so NULL and '' make one
+    row (value NULL) and an upsert never hits the same key twice.
+    """
+    keys = {name: f"COALESCE({column}::text, '')" for name, column in ROLLUP_DIMENSIONS.items()}
+    dimension_case = " ".join(f"WHEN GROUPING({key}) = 0 THEN '{name}'" for name, key in keys.items())
+    value = ", ".join(f"NULLIF({key}, '')" for key in keys.values())
+    grouping_sets = ", ".join(f"({key})" for key in keys.values())
+    return f"""
+        SELECT CASE {dimension_case} ELSE 'total' END,
+               COALESCE({value}),
+               {sign} * COUNT(*)
+        FROM {source}
+        GROUP BY GROUPING SETS ({grouping_sets}, ())
+    """
+
+
+def _upsert_sql(source, sign):
+    return f"""
+        INSERT INTO crash_rollup AS r (dimension, value, crash_count)
+        {_rollup_select(source, sign)}
+        ON CONFLICT (dimension, (COALESCE(value, '')))
+        DO UPDATE SET crash_count = r.crash_count + EXCLUDED.crash_count;
+    """
+
+
+def _offense_select(source, sign=1):
+    """
+    SELECT producing one crash_offense_rollup row per unique index key of
+    `source`: NULL and the blank (-1 or '') are grouped together as NULL.
+    """
+    keys = [f"COALESCE({column}, {OFFENSE_BLANKS[name]})" for name, column in OFFENSE_COLUMNS.items()]
+    values = ", ".join(f"NULLIF({key}, {OFFENSE_BLANKS[name]})" for name, key in zip(OFFENSE_COLUMNS, keys))
+    return f"""
+        SELECT {values}, {sign} * COUNT(*)
+        FROM {source}
+        GROUP BY {", ".join(keys)}
+    """
+
+
+def _offense_upsert_sql(source, sign):
+    return f"""
+        INSERT INTO crash_offense_rollup AS r ({", ".join(OFFENSE_COLUMNS)}, crash_count)
+        {_offense_select(source, sign)}
+        ON CONFLICT ({OFFENSE_KEY})
+        DO UPDATE SET crash_count = r.crash_count + EXCLUDED.crash_count;
+    """
+
+
+def _trigger_sql(name, upsert_sql):
+    """Statement-level triggers applying `upsert_sql(transition_table, sign)` for rollup `name`."""
+    prefix = ROLLUP_OBJECTS[name]
+    return f"""
+CREATE OR REPLACE FUNCTION {prefix}_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {upsert_sql("new_rows", 1)}
+    ELSIF TG_OP = 'DELETE' THEN
+        {upsert_sql("old_rows", -1)}
+    ELSIF TG_OP = 'UPDATE' THEN
+        {upsert_sql("old_rows", -1)}
+        {upsert_sql("new_rows", 1)}
+    ELSE
+        UPDATE crash_rollup_state SET dirty = TRUE WHERE name = '{name}';
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS {prefix}_insert ON traffic_crashes;
+DROP TRIGGER IF EXISTS {prefix}_update ON traffic_crashes;
+DROP TRIGGER IF EXISTS {prefix}_delete ON traffic_crashes;
+DROP TRIGGER IF EXISTS {prefix}_truncate ON traffic_crashes;
+
+CREATE TRIGGER {prefix}_insert AFTER INSERT ON traffic_crashes
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {prefix}_apply();
+CREATE TRIGGER {prefix}_update AFTER UPDATE ON traffic_crashes
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {prefix}_apply();
+CREATE TRIGGER {prefix}_delete AFTER DELETE ON traffic_crashes
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {prefix}_apply();
+CREATE TRIGGER {prefix}_truncate AFTER TRUNCATE ON traffic_crashes
+    FOR EACH STATEMENT EXECUTE FUNCTION {prefix}_apply();
+"""
+
+
+def refresh_rollups(install_triggers=True):
+    """
+    Rebuild every rollup from traffic_crashes and (re)install the triggers
+    that keep them up to date. Writers are blocked for the duration of the
+    rebuild so no delta is lost between the scan and the trigger taking over.
+    """
+    db.session.execute(text(SCHEMA_SQL))
+    if install_triggers:
+        db.session.execute(text(_trigger_sql(LANDING_ROLLUP, _upsert_sql)))
+        db.session.execute(text(_trigger_sql(OFFENSE_ROLLUP, _offense_upsert_sql)))
+    db.session.execute(text("LOCK TABLE traffic_crashes IN SHARE MODE"))
+    db.session.execute(text("DELETE FROM crash_rollup"))
+    db.session.execute(text(
+        "INSERT INTO crash_rollup (dimension, value, crash_count)"
+        + _rollup_select("traffic_crashes")
+    ))
+    db.session.execute(text("DELETE FROM crash_offense_rollup"))
+    db.session.execute(text(
+        f"INSERT INTO crash_offense_rollup ({', '.join(OFFENSE_COLUMNS)}, crash_count)"
+        + _offense_select("traffic_crashes")
+    ))
+    for name in ROLLUP_OBJECTS:
+        db.session.execute(
+            text("""
+                INSERT INTO crash_rollup_state (name, refreshed_at, dirty)
+                VALUES (:name, now(), FALSE)
+                ON CONFLICT (name) DO UPDATE SET refreshed_at = now(), dirty = FALSE
+            """),
+            {"name": name},
+        )
+    db.session.commit()
+
+
+def drop_rollup_triggers():
+    for prefix in ROLLUP_OBJECTS.values():
+        for event in ("insert", "update", "delete", "truncate"):
+            db.session.execute(text(f"DROP TRIGGER IF EXISTS {prefix}_{event} ON traffic_crashes"))
+    db.session.commit()
+
+
+def summarize_rollup(rows):
+    """
+    Turn (dimension, value, crash_count) rollup rows into the landing card
+    values: total plus the most common month / weather / cause.
+    """
+    total = 0
+    best = {}
+    for dimension, value, count in rows:
+        if dimension == "total":
+            total = count
+            continue
+        if value in EXCLUDED_VALUES.get(dimension, ()) or count <= 0:
+            continue
+        if dimension not in best or count > best[dimension][1]:
+            best[dimension] = (value, count)
+
+    month = best.get("month")
+    return {
+        "total_crashes": total,
+        "top_month": int(month[0]) if month and month[0] is not None else None,
+        "top_weather": best["weather"][0] if "weather" in best else None,
+        "top_crash_type": best["cause"][0] if "cause" in best else None,
+    }
+
+
+def rollup_status(name=LANDING_ROLLUP):
+    """
+    Return (refreshed_at, dirty, incremental) for rollup `name`, or None
+    when the rollup tables have not been created yet.
+    """
+    try:
+        row = db.session.execute(
+            text("""
+                SELECT s.refreshed_at, s.dirty,
+                       EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = :trigger)
+                FROM crash_rollup_state s
+                WHERE s.name = :name
+            """),
+            {"name": name, "trigger": f"{ROLLUP_OBJECTS[name]}_insert"},
+        ).first()
+    except SQLAlchemyError:
+        db.session.rollback()
+        return None
+    return tuple(row) if row else None
+
+
+def is_fresh(refreshed_at, dirty, incremental, max_age):
+    """Trigger-maintained rollups stay fresh; otherwise they age out after max_age seconds."""
+    if dirty:
+        return False
+    if incremental:
+        return True
+    age = (datetime.now(timezone.utc) - refreshed_at).total_seconds()
+    return age <= max_age
+
+
+def landing_stats():
+    """
+    Landing card values read from the rollup in a single query, or None when
+    the rollup is missing or stale and the caller should query live.
+    """
+    try:
+        rows = db.session.execute(
+            text("""
+                SELECT r.dimension, r.value, r.crash_count,
+                       s.refreshed_at, s.dirty,
+                       EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'crash_rollup_insert')
+                FROM crash_rollup_state s
+                JOIN crash_rollup r ON TRUE
+                WHERE s.name = :name
+            """),
+            {"name": LANDING_ROLLUP},
+        ).all()
+    except SQLAlchemyError:
+        db.session.rollback()
+        return None
+
+    if not rows:
+        return None
+    refreshed_at, dirty, incremental = rows[0][3:]
+    max_age = current_app.config.get("ROLLUP_MAX_AGE", 900)
+    if not is_fresh(refreshed_at, dirty, incremental, max_age):
+        return None
+    return summarize_rollup(row[:3] for row in rows)
+
+
+def offense_rollup_fresh():
+    status = rollup_status(OFFENSE_ROLLUP)
+    if status is None:
+        return False
+    return is_fresh(*status, current_app.config.get("ROLLUP_MAX_AGE", 900))
+
+
+def offense_counts(group_by, limit=None, **filters):
+    """
+    [(*group values, crash_count)] from crash_offense_rollup, most crashes
+    first, with equality filters on any rollup column (None = no filter).
+    Returns None when the rollup is missing or stale.
+    """
+    if not offense_rollup_fresh():
+        return None
+    columns = [offense_rollup.c[name] for name in group_by]
+    total = func.sum(offense_rollup.c.crash_count)
+    stmt = select(*columns, total).group_by(*columns).having(total > 0).order_by(total.desc())
+    for name, value in filters.items():
+        if value is not None:
+            stmt = stmt.where(offense_rollup.c[name] == value)
+    if limit:
+        stmt = stmt.limit(limit)
+    return [(*row[:-1], int(row[-1])) for row in db.session.execute(stmt)]
+
+
+# --------------------------------
+# CLI: flask rollups ...
+# --------------------------------
+rollups_cli = AppGroup("rollups", help="Maintain the crash rollup tables.")
+
+
+@rollups_cli.command("refresh")
+@click.option("--no-triggers", is_flag=True, help="Rebuild only; do not install incremental triggers.")
+def refresh_command(no_triggers):
+    """Rebuild the rollups from traffic_crashes."""
+    refresh_rollups(install_triggers=not no_triggers)
+    click.echo("✅ Rollups refreshed.")
+
+
+@rollups_cli.command("drop-triggers")
+def drop_triggers_command():
+    """Stop maintaining the rollups incrementally."""
+    drop_rollup_triggers()
+    click.echo("✅ Rollup triggers dropped.")
+
+
+@rollups_cli.command("status")
+def status_command():
+    """Show when the rollups were last rebuilt and whether they are fresh."""
+    for name in ROLLUP_OBJECTS:
+        status = rollup_status(name)
+        click.echo(f"[{name}]")
+        if status is None:
+            click.echo("❗ Not built. Run `flask rollups refresh`.")
+            continue
+        refreshed_at, dirty, incremental = status
+        fresh = is_fresh(refreshed_at, dirty, incremental, current_app.config.get("ROLLUP_MAX_AGE", 900))
+        click.echo(f"refreshed_at: {refreshed_at.isoformat()}")
+        click.echo(f"incremental:  {incremental}")
+        click.echo(f"dirty:        {dirty}")
+        click.echo(f"fresh:        {fresh}")
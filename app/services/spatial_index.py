@@ -0,0 +1,217 @@
+# app/services/spatial_index.py
+
+from flask import current_app
+from app.models.models import db, Crash
+from app.services import crash_events
+import numpy as np
+import threading, time
+
+# --------------------------------
+# Uniform-grid spatial index over crash coordinates
+# --------------------------------
+# Points are bucketed into CELL_DEG x CELL_DEG cells and stored sorted by
+# cell key (row * n_cols + col), so the points of one grid row segment are a
+# contiguous slice found with two binary searches. Radius and bounding-box
+# queries only touch the slices under the query window, then filter exactly.
+# Rows added after the build go to a small pending buffer that is scanned
+# directly and merged into the sorted arrays once it grows past MERGE_AT.
+
+CELL_DEG = 0.005          # ~550 m north-south, ~410 m east-west in Chicago
+MERGE_AT = 5000
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEG_LAT = 111320.0
+
+
+def haversine_m(lat, lng, lats, lngs):
+    """Great-circle distance in meters from (lat, lng) to every point in the arrays."""
+    phi1, phi2 = np.radians(lat), np.radians(lats)
+    dphi = phi2 - phi1
+    dlmb = np.radians(lngs - lng)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+class SpatialIndex:
+    def __init__(self, lat, lng, severity, severity_labels, cell_deg=CELL_DEG):
+        """
+        lat, lng:         float arrays of crash coordinates
+        severity:         integer codes into severity_labels
+        severity_labels:  list of MOST_SEVERE_INJURY values ("Unknown" for NULL)
+        """
+        self.cell_deg = cell_deg
+        self.severity_labels = list(severity_labels)
+        self.lock = threading.Lock()
+        self.built_at = time.time()
+
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        if len(lat):
+            self.lat0, self.lng0 = float(lat.min()), float(lng.min())
+            self.n_rows = int((lat.max() - self.lat0) // cell_deg) + 1
+            self.n_cols = int((lng.max() - self.lng0) // cell_deg) + 1
+        else:
+            self.lat0, self.lng0, self.n_rows, self.n_cols = 0.0, 0.0, 1, 1
+        self._pending = ([], [], [])
+        self._build(lat, lng, np.asarray(severity, dtype=np.int16))
+
+    def _cells(self, lat, lng):
+        rows = np.clip(((lat - self.lat0) // self.cell_deg).astype(np.int64), 0, self.n_rows - 1)
+        cols = np.clip(((lng - self.lng0) // self.cell_deg).astype(np.int64), 0, self.n_cols - 1)
+        return rows, cols
+
+    def _build(self, lat, lng, severity):
+        rows, cols = self._cells(lat, lng)
+        keys = rows * self.n_cols + cols
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.lat = lat[order]
+        self.lng = lng[order]
+        self.severity = severity[order]
+
+    def __len__(self):
+        return len(self.lat) + len(self._pending[0])
+
+    # ---------- incremental updates ----------
+    def add(self, lat, lng, severity_label):
+        """Add one crash; merged into the sorted arrays in batches of MERGE_AT."""
+        label = severity_label or "Unknown"
+        with self.lock:
+            if label not in self.severity_labels:
+                self.severity_labels.append(label)
+            self._pending[0].append(lat)
+            self._pending[1].append(lng)
+            self._pending[2].append(self.severity_labels.index(label))
+            if len(self._pending[0]) >= MERGE_AT:
+                self._merge()
+
+    def _merge(self):
+        lat, lng, severity = (np.asarray(p) for p in self._pending)
+        self._build(
+            np.concatenate([self.lat, lat]),
+            np.concatenate([self.lng, lng]),
+            np.concatenate([self.severity, severity.astype(np.int16)]),
+        )
+        self._pending = ([], [], [])
+
+    # ---------- queries ----------
+    def _window(self, south, west, north, east):
+        """Coordinates and severities of every point in cells overlapping the window."""
+        r0, c0 = self._cells(np.array([south]), np.array([west]))
+        r1, c1 = self._cells(np.array([north]), np.array([east]))
+        grid_rows = np.arange(r0[0], r1[0] + 1)
+        lo = np.searchsorted(self.keys, grid_rows * self.n_cols + c0[0], side="left")
+        hi = np.searchsorted(self.keys, grid_rows * self.n_cols + c1[0], side="right")
+        idx = np.concatenate([np.arange(a, b) for a, b in zip(lo, hi)]) if len(lo) else np.empty(0, int)
+
+        lat, lng, severity = self.lat[idx], self.lng[idx], self.severity[idx]
+        if self._pending[0]:
+            lat = np.concatenate([lat, self._pending[0]])
+            lng = np.concatenate([lng, self._pending[1]])
+            severity = np.concatenate([severity, np.asarray(self._pending[2], dtype=np.int16)])
+        return lat, lng, severity
+
+    def _result(self, lat, lng, severity, include_points, limit, distance=None):
+        counts = np.bincount(severity, minlength=len(self.severity_labels)) if len(severity) else []
+        result = {
+            "count": int(len(lat)),
+            "severity": {
+                label: int(n) for label, n in zip(self.severity_labels, counts) if n
+            },
+        }
+        if include_points:
+            order = np.argsort(distance, kind="stable")[:limit] if distance is not None else np.arange(min(limit, len(lat)))
+            result["points"] = [
+                {
+                    "lat": float(lat[i]),
+                    "lng": float(lng[i]),
+                    "severity": self.severity_labels[severity[i]],
+                    **({"distance_m": round(float(distance[i]), 1)} if distance is not None else {}),
+                }
+                for i in order
+            ]
+        return result
+
+    def within_radius(self, lat, lng, meters, include_points=False, limit=500):
+        dlat = meters / METERS_PER_DEG_LAT
+        dlng = meters / (METERS_PER_DEG_LAT * max(np.cos(np.radians(lat)), 1e-6))
+        with self.lock:
+            lats, lngs, severity = self._window(lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+        distance = haversine_m(lat, lng, lats, lngs)
+        mask = distance <= meters
+        return self._result(lats[mask], lngs[mask], severity[mask], include_points, limit, distance[mask])
+
+    def within_bbox(self, south, west, north, east, include_points=False, limit=500):
+        with self.lock:
+            lats, lngs, severity = self._window(south, west, north, east)
+        mask = (lats >= south) & (lats <= north) & (lngs >= west) & (lngs <= east)
+        return self._result(lats[mask], lngs[mask], severity[mask], include_points, limit)
+
+    def memory_usage(self):
+        return int(self.keys.nbytes + self.lat.nbytes + self.lng.nbytes + self.severity.nbytes)
+
+    def stats(self):
+        return {
+            "points": len(self),
+            "pending": len(self._pending[0]),
+            "grid": [self.n_rows, self.n_cols],
+            "cell_deg": self.cell_deg,
+            "memory_bytes": self.memory_usage(),
+            "built_at": self.built_at,
+        }
+
+
+# --------------------------------
+# Process-wide index
+# --------------------------------
+_index = None
+_stale = False
+_build_lock = threading.Lock()
+
+
+def load_spatial_index():
+    rows = (
+        db.session.query(Crash.latitude, Crash.longitude, Crash.most_severe_injury)
+        .filter(Crash.latitude.isnot(None), Crash.longitude.isnot(None))
+        .filter(Crash.latitude != 0, Crash.longitude != 0)
+        .all()
+    )
+    labels = sorted({r[2] or "Unknown" for r in rows})
+    codes = {label: i for i, label in enumerate(labels)}
+    return SpatialIndex(
+        np.fromiter((r[0] for r in rows), dtype=np.float64, count=len(rows)),
+        np.fromiter((r[1] for r in rows), dtype=np.float64, count=len(rows)),
+        np.fromiter((codes[r[2] or "Unknown"] for r in rows), dtype=np.int16, count=len(rows)),
+        labels,
+    )
+
+
+def refresh_spatial_index():
+    global _index, _stale
+    index = load_spatial_index()
+    _index, _stale = index, False
+    return index
+
+
+def get_spatial_index():
+    """Current index, rebuilt when missing, invalidated or older than SPATIAL_INDEX_TTL."""
+    index = _index
+    ttl = current_app.config.get("SPATIAL_INDEX_TTL", 600)
+    if index is None or _stale or time.time() - index.built_at > ttl:
+        with _build_lock:
+            index = _index
+            if index is None or _stale or time.time() - index.built_at > ttl:
+                index = refresh_spatial_index()
+    return index
+
+
+@crash_events.subscribe
+def _on_crashes_committed(inserted, changed):
+    global _stale
+    if changed:
+        _stale = True
+    index = _index
+    if index is None:
+        return
+    for row in inserted:
+        if row["latitude"] and row["longitude"]:
+            index.add(row["latitude"], row["longitude"], row["most_severe_injury"])
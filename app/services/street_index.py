@@ -0,0 +1,194 @@
+# app/services/street_index.py
+
+from flask import current_app
+from sqlalchemy import func
+from app.models.models import db, Crash
+from app.services import crash_events
+import sys, threading, time
+
+# --------------------------------
+# In-memory street index for the /location typeahead
+# --------------------------------
+# Holds every distinct STREET_NAME (with coordinates) and its aggregates so
+# all three `metric` modes of /location/api/streets are answered without a
+# database round trip. Substring lookups go through a trigram posting list;
+# queries shorter than a trigram scan the (few thousand) names directly.
+
+GRAM = 3
+METRICS = ("crashes", "injuries", "vehicles")
+
+
+def trigrams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+class StreetStats:
+    __slots__ = ("name", "lat_sum", "lng_sum", "crashes", "injuries", "vehicles")
+
+    def __init__(self, name, lat_sum=0.0, lng_sum=0.0, crashes=0, injuries=None, vehicles=None):
+        self.name = name
+        self.lat_sum = lat_sum
+        self.lng_sum = lng_sum
+        self.crashes = crashes
+        # SUM() over only NULLs is NULL, so these stay None until a value is seen
+        self.injuries = injuries
+        self.vehicles = vehicles
+
+    def value(self, metric):
+        if metric == "injuries":
+            return self.injuries
+        if metric == "vehicles":
+            return self.vehicles
+        return self.crashes
+
+    def centroid(self):
+        return self.lat_sum / self.crashes, self.lng_sum / self.crashes
+
+
+def _add(total, value):
+    if value is None:
+        return total
+    return value if total is None else total + value
+
+
+class StreetIndex:
+    def __init__(self):
+        self.streets = []   # StreetStats, position == street id
+        self.lowered = []   # lower-cased names, same positions
+        self.ids = {}       # exact name -> street id
+        self.grams = {}     # trigram -> set of street ids
+        self.built_at = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows):
+        """rows: (name, lat_sum, lng_sum, crashes, injuries, vehicles) per street."""
+        index = cls()
+        for name, lat_sum, lng_sum, crashes, injuries, vehicles in rows:
+            index._insert(StreetStats(
+                name, float(lat_sum), float(lng_sum), int(crashes),
+                None if injuries is None else float(injuries),
+                None if vehicles is None else int(vehicles),
+            ))
+        index.built_at = time.time()
+        return index
+
+    def _insert(self, stats):
+        street_id = len(self.streets)
+        lowered = stats.name.lower()
+        self.streets.append(stats)
+        self.lowered.append(lowered)
+        self.ids[stats.name] = street_id
+        for gram in trigrams(lowered):
+            self.grams.setdefault(gram, set()).add(street_id)
+
+    def add_crash(self, name, lat, lng, injuries=None, vehicles=None):
+        """Fold one new crash into the aggregates (same filters as the SQL)."""
+        if not name or lat is None or lng is None:
+            return
+        with self.lock:
+            street_id = self.ids.get(name)
+            if street_id is None:
+                self._insert(StreetStats(name))
+                street_id = self.ids[name]
+            stats = self.streets[street_id]
+            stats.lat_sum += lat
+            stats.lng_sum += lng
+            stats.crashes += 1
+            stats.injuries = _add(stats.injuries, injuries)
+            stats.vehicles = _add(stats.vehicles, vehicles)
+
+    def _candidates(self, query):
+        if len(query) < GRAM:
+            return range(len(self.streets))
+        postings = sorted((self.grams.get(g, set()) for g in trigrams(query)), key=len)
+        return set.intersection(*postings) if postings[0] else set()
+
+    def search(self, query, metric="crashes", limit=10):
+        """
+        Streets whose name contains `query` (case-insensitive), ordered like
+        ORDER BY value DESC in Postgres, which puts NULL sums first.
+        """
+        query = query.lower()
+        with self.lock:
+            matches = [
+                self.streets[i] for i in self._candidates(query)
+                if query in self.lowered[i]
+            ]
+            matches.sort(key=lambda s: (s.value(metric) is not None, -(s.value(metric) or 0), s.name))
+            return [(s.name, *s.centroid(), s.value(metric)) for s in matches[:limit]]
+
+    def memory_usage(self):
+        """Approximate bytes held by the index structures."""
+        with self.lock:
+            size = sum(sys.getsizeof(c) for c in (self.streets, self.lowered, self.ids, self.grams))
+            size += sum(sys.getsizeof(s) + sys.getsizeof(s.name) for s in self.streets)
+            size += sum(sys.getsizeof(name) for name in self.lowered)
+            size += sum(sys.getsizeof(gram) + sys.getsizeof(ids) for gram, ids in self.grams.items())
+            return size
+
+    def stats(self):
+        return {
+            "streets": len(self.streets),
+            "trigrams": len(self.grams),
+            "memory_bytes": self.memory_usage(),
+            "built_at": self.built_at,
+        }
+
+
+# --------------------------------
+# Process-wide index
+# --------------------------------
+_index = None
+_stale = False
+_build_lock = threading.Lock()
+
+
+def load_street_rows():
+    return (
+        db.session.query(
+            Crash.street_name,
+            func.sum(Crash.latitude),
+            func.sum(Crash.longitude),
+            func.count(),
+            func.sum(Crash.injuries_total),
+            func.sum(Crash.num_units),
+        )
+        .filter(Crash.street_name.isnot(None))
+        .filter(Crash.latitude.isnot(None), Crash.longitude.isnot(None))
+        .group_by(Crash.street_name)
+        .all()
+    )
+
+
+def refresh_street_index():
+    """Rebuild the index from traffic_crashes and swap it in."""
+    global _index, _stale
+    index = StreetIndex.from_rows(load_street_rows())
+    _index, _stale = index, False
+    return index
+
+
+def get_street_index():
+    """Current index, rebuilt when missing, invalidated or older than STREET_INDEX_TTL."""
+    index = _index
+    ttl = current_app.config.get("STREET_INDEX_TTL", 600)
+    if index is None or _stale or time.time() - index.built_at > ttl:
+        with _build_lock:
+            index = _index
+            if index is None or _stale or time.time() - index.built_at > ttl:
+                index = refresh_street_index()
+    return index
+
+
+@crash_events.subscribe
+def _on_crashes_committed(inserted, changed):
+    global _stale
+    if changed:
+        _stale = True
+    index = _index
+    if index is None:
+        return
+    for row in inserted:
+        index.add_crash(row["street_name"], row["latitude"], row["longitude"],
+                        row["injuries_total"], row["num_units"])
@@ -3,52 +3,80 @@ Chart.register(ChartDataLabels);
 
 const charts = {}; // Store chart instances dynamically
 
-// === Load Filters ===
-async function loadFilters() {
-    try {
-        const res = await fetch('/environment/api/filters');
-        const data = await res.json();
-
-        document.getElementById('weather-filter').innerHTML =
-            `<option value="All">All</option>` + data.weather.map(w => `<option value="${w}">${w}</option>`).join('');
-        document.getElementById('speed-filter').innerHTML =
-            `<option value="All">All</option>` + data.speed.map(s => `<option value="${s}">${s}</option>`).join('');
-        document.getElementById('lighting-filter').innerHTML =
-            `<option value="All">All</option>` + data.lighting.map(l => `<option value="${l}">${l}</option>`).join('');
-    } catch (err) {
-        console.error("Failed to load filters:", err);
-    }
+// === Filters, Metrics & Charts ===
+function currentParams() {
+    // Selects without options yet (first load) have an empty value: no filter
+    const month = document.getElementById('month-filter').value || 'All';
+    const weather = document.getElementById('weather-filter').value || 'All';
+    const speed = document.getElementById('speed-filter').value || 'All';
+    const lighting = document.getElementById('lighting-filter').value || 'All';
+    return `month=${month}&weather=${weather}&speed=${speed}&lighting=${lighting}`;
+}
+
+function renderFilters(data) {
+    document.getElementById('weather-filter').innerHTML =
+        `<option value="All">All</option>` + data.weather.map(w => `<option value="${w}">${w}</option>`).join('');
+    document.getElementById('speed-filter').innerHTML =
+        `<option value="All">All</option>` + data.speed.map(s => `<option value="${s}">${s}</option>`).join('');
+    document.getElementById('lighting-filter').innerHTML =
+        `<option value="All">All</option>` + data.lighting.map(l => `<option value="${l}">${l}</option>`).join('');
+}
+
+function renderData(data) {
+    // Update metrics
+    document.getElementById("metric-total").textContent = data.metrics.total;
+    document.getElementById("metric-street").textContent = data.metrics.common_street;
+    document.getElementById("metric-street-count").textContent = `${data.metrics.common_street_count} crashes`;
+    document.getElementById("metric-severe").textContent = data.metrics.severe;
+
+    // Update charts
+    updateChart("chart-speed", data.charts.speed, "blue", "Crashes by Speed Limit", 'bar');
+    updateChart("chart-weather", data.charts.weather, "green", "Crashes by Weather", 'bar');
+    updateChart("chart-lighting", data.charts.lighting, "orange", "Crashes by Lighting", 'doughnut');
 }
 
-// === Load Metrics & Charts ===
-async function loadData() {
-    const month = document.getElementById('month-filter').value;
-    const weather = document.getElementById('weather-filter').value;
-    const speed = document.getElementById('speed-filter').value;
-    const lighting = document.getElementById('lighting-filter').value;
+// === Bootstrap: every panel in one request, each drawn as soon as it arrives ===
+async function loadPanels(panels) {
+    if (!heatmap) initHeatmap();
+    const zoom = heatmap.getZoom();
+    const params = currentParams();
 
     try {
-        const res = await fetch(`/environment/api/data?month=${month}&weather=${weather}&speed=${speed}&lighting=${lighting}`);
-        const data = await res.json();
-
-        // Update metrics
-        document.getElementById("metric-total").textContent = data.metrics.total;
-        document.getElementById("metric-street").textContent = data.metrics.common_street;
-        document.getElementById("metric-street-count").textContent = `${data.metrics.common_street_count} crashes`;
-        document.getElementById("metric-severe").textContent = data.metrics.severe;
-
-        // Update charts
-        updateChart("chart-speed", data.charts.speed, "blue", "Crashes by Speed Limit", 'bar');
-        updateChart("chart-weather", data.charts.weather, "green", "Crashes by Weather", 'bar');
-        updateChart("chart-lighting", data.charts.lighting, "orange", "Crashes by Lighting", 'doughnut');
-
-        // Load heatmap
-        loadHeatmap();
+        const res = await fetch(`/environment/api/bootstrap?${params}&zoom=${zoom}&panels=${panels.join(',')}&stream=1`);
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        for (;;) {
+            const { value, done } = await reader.read();
+            if (value) buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = done ? '' : lines.pop();
+
+            for (const line of lines.filter(Boolean)) {
+                const panel = JSON.parse(line);
+                if (panel.error) {
+                    console.error(`Failed to load ${panel.panel}:`, panel.error);
+                } else if (panel.panel === 'filters') {
+                    renderFilters(panel.data);
+                } else if (panel.panel === 'data') {
+                    renderData(panel.data);
+                } else if (panel.panel === 'heatmap') {
+                    heatmapCache[`${params}|${zoom}`] = panel.data;
+                    renderHeatmap(panel.data);
+                }
+            }
+            if (done) break;
+        }
     } catch (err) {
-        console.error("Failed to load data:", err);
+        console.error("Failed to load panels:", err);
     }
 }
 
+function loadData() {
+    return loadPanels(['data', 'heatmap']);
+}
+
 // === Update Chart Function ===
 function updateChart(canvasId, data, color, label, type = 'bar') {
     const ctx = document.getElementById(canvasId).getContext('2d');
@@ -118,31 +146,57 @@ function updateChart(canvasId, data, color, label, type = 'bar') {
 }
 
 // === Load Heatmap ===
+let heatmap = null;
+let heatLayer = null;
+const heatmapCache = {}; // "filters|zoom" -> density grid
+
+function initHeatmap() {
+    heatmap = L.map('heatmap-map').setView([41.8781, -87.6298], 11);
+    L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+        attribution: '&copy; OpenStreetMap contributors'
+    }).addTo(heatmap);
+    heatmap.on('zoomend', loadHeatmap);
+}
+
 async function loadHeatmap() {
-    const month = document.getElementById('month-filter').value;
-    const weather = document.getElementById('weather-filter').value;
-    const speed = document.getElementById('speed-filter').value;
-    const lighting = document.getElementById('lighting-filter').value;
+    if (!heatmap) initHeatmap();
+    const zoom = heatmap.getZoom();
+    const params = currentParams();
+    const key = `${params}|${zoom}`;
 
     try {
-        const res = await fetch(`/environment/heatmap?month=${month}&weather=${weather}&speed=${speed}&lighting=${lighting}`);
-        const data = await res.json();
-
-        const iframe = document.getElementById("heatmap-frame");
-        if (data.map_path) {
-            iframe.src = data.map_path;
-        } else {
-            iframe.srcdoc = "<p style='color:red;'>No data available for selected filters</p>";
+        if (!heatmapCache[key]) {
+            const res = await fetch(`/environment/api/heatmap?${params}&zoom=${zoom}`);
+            heatmapCache[key] = await res.json();
         }
+        renderHeatmap(heatmapCache[key]);
     } catch (err) {
         console.error("Failed to load heatmap:", err);
     }
 }
 
+function renderHeatmap(grid) {
+    // One weighted point per grid cell, centred on the cell
+    const points = grid.count.map((c, i) => [
+        (grid.origin[0] + grid.rows[i] + 0.5) * grid.cell_deg,
+        (grid.origin[1] + grid.cols[i] + 0.5) * grid.cell_deg,
+        c
+    ]);
+    if (heatLayer) heatmap.removeLayer(heatLayer);
+    heatLayer = L.heatLayer(points, {
+        radius: 12,
+        blur: 20,
+        minOpacity: 0.4,
+        max: grid.max || 1
+    }).addTo(heatmap);
+
+    document.getElementById("heatmap-empty").style.display = grid.total ? "none" : "block";
+}
+
 // === Init ===
 window.addEventListener('DOMContentLoaded', async () => {
-    await loadFilters();
-    await loadData();
+    // Filters, metrics, charts and heatmap all arrive from one bootstrap request
+    await loadPanels(['filters', 'data', 'heatmap']);
 
     // Add event listeners for all dropdowns including month
     document.querySelectorAll("select").forEach(sel => {
@@ -1,7 +1,8 @@
 // static/js/offense.js
 
 // grab DOM nodes & globals
-let beatSelect, ctx, causeChart, map, markerCluster, resetBtn;
+let beatSelect, ctx, causeChart, map, clusterLayer, resetBtn;
+let clusterRequest = 0; // ignore responses from superseded viewport fetches
 
 function initChart() {
     causeChart = new Chart(ctx, {
@@ -57,52 +58,102 @@ function initMap() {
         })
         .addTo(map);
 
-    // Initialize marker cluster group instead of plain layerGroup
-    markerCluster = L.markerClusterGroup();
-    map.addLayer(markerCluster);
+    // Clusters come pre-computed from the server for the current viewport
+    clusterLayer = L.layerGroup().addTo(map);
+    map.on("moveend", () => drawHitAndRun());
 }
 
-function fetchAndDraw(overrideBeat = null) {
-    const beat = encodeURIComponent(overrideBeat ?? beatSelect.value);
-
-    // 1) Update chart
-    fetch(`/offense/api/primary-cause?beat=${beat}`)
-        .then((r) => r.json())
-        .then((data) => {
-            const labels = data.map((d) => d.cause || "Unknown");
-            const counts = data.map((d) => d.count);
+function clusterIcon(count) {
+    // reuse the leaflet.markercluster styles already loaded in base.html
+    const size = count < 10 ? "small" : count < 100 ? "medium" : "large";
+    return L.divIcon({
+        html: `<div><span>${count.toLocaleString()}</span></div>`,
+        className: `marker-cluster marker-cluster-${size}`,
+        iconSize: L.point(40, 40),
+    });
+}
 
-            causeChart.data.labels = labels;
-            causeChart.data.datasets[0].data = counts;
-            causeChart.update();
-        });
+function drawHitAndRun(beatValue = beatSelect.value) {
+    const beat = encodeURIComponent(beatValue);
+    const bbox = map.getBounds().pad(0.2).toBBoxString();
+    const request = ++clusterRequest;
 
-    // 2) Update clustered hit-and-run points
-    fetch(`/offense/api/hit-and-run?beat=${beat}`)
+    fetch(`/offense/api/hit-and-run?beat=${beat}&bbox=${bbox}&zoom=${map.getZoom()}`)
         .then((r) => r.json())
         .then((geojson) => {
-            // clear old clusters
-            markerCluster.clearLayers();
-
-            // create a GeoJSON layer and add into cluster group
-            const geoLayer = L.geoJSON(geojson, {
-                pointToLayer: (feature, latlng) =>
-                    L.circleMarker(latlng, {
+            if (request !== clusterRequest) return;
+            clusterLayer.clearLayers();
+
+            L.geoJSON(geojson, {
+                pointToLayer: (feature, latlng) => {
+                    if (feature.properties.cluster) {
+                        const marker = L.marker(latlng, {
+                            icon: clusterIcon(feature.properties.point_count),
+                        });
+                        marker.on("click", () =>
+                            map.setView(latlng, map.getZoom() + 2),
+                        );
+                        return marker;
+                    }
+                    return L.circleMarker(latlng, {
                         radius: 6,
                         fillColor: "orange",
                         color: "#333",
                         weight: 1,
                         fillOpacity: 0.8,
-                    }),
+                    });
+                },
                 onEachFeature: (feature, layer) => {
+                    if (feature.properties.cluster) return;
                     layer.bindPopup(
                         `<strong>${feature.properties.cause}</strong><br>${feature.properties.date}`,
                     );
                 },
-            });
+            }).addTo(clusterLayer);
+        })
+        .catch((err) => console.error("Hit-and-run load error:", err));
+}
+
+function renderCauseChart(data) {
+    causeChart.data.labels = data.map((d) => d.cause || "Unknown");
+    causeChart.data.datasets[0].data = data.map((d) => d.count);
+    causeChart.update();
+}
+
+function renderTopCause(data) {
+    const top = data[0] || { cause: "—", count: 0 };
+    document.getElementById("summary-top-cause").innerText = `${
+        top.cause
+    } (${top.count.toLocaleString()})`;
+}
+
+function renderTopHitAndRun({ beat, count }) {
+    document.getElementById(
+        "summary-top-hitrun",
+    ).innerText = `${beat} (${count.toLocaleString()})`;
+}
+
+// Chart, sankey and summaries for a beat from one bootstrap request
+function fetchAndDraw(overrideBeat = null) {
+    const beatValue = overrideBeat ?? beatSelect.value;
+
+    fetch(`/offense/api/bootstrap?beat=${encodeURIComponent(beatValue)}`)
+        .then((r) => r.json())
+        .then(({ panels, errors }) => {
+            Object.entries(errors).forEach(([name, err]) =>
+                console.error(`Offense panel ${name} failed:`, err),
+            );
+            if (panels.primary_cause) {
+                renderCauseChart(panels.primary_cause);
+                renderTopCause(panels.primary_cause);
+            }
+            if (panels.cause_severity) drawSankey(panels.cause_severity);
+            if (panels.top_hit_and_run_beat) renderTopHitAndRun(panels.top_hit_and_run_beat);
+        })
+        .catch((err) => console.error("Offense bootstrap error:", err));
 
-            markerCluster.addLayer(geoLayer);
-        });
+    // clustered hit-and-run points follow the viewport, so they load on their own
+    drawHitAndRun(beatValue);
 }
 
 // (A) Transform API rows into Plotly sankey input
@@ -143,70 +194,51 @@ function buildSankeyData(rows, topN = 6) {
 function fetchAndDrawSankey(beat, singleCause = null) {
     fetch(`/offense/api/cause-severity?beat=${encodeURIComponent(beat)}`)
         .then((r) => r.json())
-        .then((rows) => {
-            // 1) optionally drill down to a single cause
-            const filtered = singleCause
-                ? rows.filter((r) => r.cause === singleCause)
-                : rows;
-
-            // 2) build top-6+Other nodes & links
-            const { nodes, links } = buildSankeyData(filtered, 6);
-
-            // 3) prepare Plotly sankey trace
-            const data = [
-                {
-                    type: "sankey",
-                    orientation: "h",
-                    node: {
-                        label: nodes,
-                        pad: 25,
-                        thickness: 20,
-                        line: { color: "black", width: 0.5 },
-                    },
-                    link: {
-                        source: links.map((l) => l.source),
-                        target: links.map((l) => l.target),
-                        value: links.map((l) => l.value),
-                    },
-                },
-            ];
-
-            // 4) autosize layout (no fixed width/height)
-            const layout = {
-                autosize: true,
-                margin: { t: 50, l: 20, r: 20, b: 20 },
-            };
-
-            // 5) tell Plotly to watch for container resizes
-            const config = { responsive: true };
-
-            // 6) draw & then force an immediate resize pass
-            Plotly.react("sankey-chart", data, layout, config).then(() => {
-                Plotly.Plots.resize(document.getElementById("sankey-chart"));
-            });
-        })
+        .then((rows) => drawSankey(rows, singleCause))
         .catch((err) => console.error("Sankey load error:", err));
 }
 
-function fetchSummary(beat = "all") {
-    fetch(`/offense/api/primary-cause?beat=${encodeURIComponent(beat)}`)
-        .then((r) => r.json())
-        .then((data) => {
-            const top = data[0] || { cause: "—", count: 0 };
-            document.getElementById("summary-top-cause").innerText = `${
-                top.cause
-            } (${top.count.toLocaleString()})`;
-        })
-        .catch(console.error);
+function drawSankey(rows, singleCause = null) {
+    // 1) optionally drill down to a single cause
+    const filtered = singleCause
+        ? rows.filter((r) => r.cause === singleCause)
+        : rows;
+
+    // 2) build top-6+Other nodes & links
+    const { nodes, links } = buildSankeyData(filtered, 6);
+
+    // 3) prepare Plotly sankey trace
+    const data = [
+        {
+            type: "sankey",
+            orientation: "h",
+            node: {
+                label: nodes,
+                pad: 25,
+                thickness: 20,
+                line: { color: "black", width: 0.5 },
+            },
+            link: {
+                source: links.map((l) => l.source),
+                target: links.map((l) => l.target),
+                value: links.map((l) => l.value),
+            },
+        },
+    ];
 
-    fetch(`/offense/api/most-hit-and-run-beat`)
-        .then((r) => r.json())
-        .then(({ beat, count }) => {
-            document.getElementById(
-                "summary-top-hitrun",
-            ).innerText = `${beat} (${count.toLocaleString()})`;
-        })
-        .catch(console.error);
+    // 4) autosize layout (no fixed width/height)
+    const layout = {
+        autosize: true,
+        margin: { t: 50, l: 20, r: 20, b: 20 },
+    };
+
+    // 5) tell Plotly to watch for container resizes
+    const config = { responsive: true };
+
+    // 6) draw & then force an immediate resize pass
+    Plotly.react("sankey-chart", data, layout, config).then(() => {
+        Plotly.Plots.resize(document.getElementById("sankey-chart"));
+    });
 }
 
 document.addEventListener("DOMContentLoaded", () => {
@@ -217,10 +249,8 @@ document.addEventListener("DOMContentLoaded", () => {
     initChart();
     initMap();
 
-    // initial load
+    // initial load: chart, sankey & summaries in one request, map by viewport
     fetchAndDraw();
-    fetchSummary();
-    fetchAndDrawSankey("all");
 
     // 2) Wire up Choices.js on the beat dropdown
     const beatChoices = new Choices("#region-select", {
@@ -235,10 +265,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
     // when the beat changes, redraw both
     beatSelect.addEventListener("change", () => {
-        const b = beatSelect.value;
-        fetchSummary(b);
-        fetchAndDraw(); // chart + map
-        fetchAndDrawSankey(b); // sankey default
+        fetchAndDraw(); // chart + sankey + summaries + map
     });
 
     resetBtn.addEventListener("click", () => {
@@ -246,8 +273,6 @@ document.addEventListener("DOMContentLoaded", () => {
         beatChoices.setChoiceByValue("all");
 
         fetchAndDraw("all");
-        fetchAndDrawSankey("all");
-        fetchSummary("all");
     });
 
     // drill-down on bar click
@@ -0,0 +1,104 @@
+"""
+Benchmark the vectorized beat assignment in app/services/beat_assignment.py
+in points per second. Uses the real beat polygons when given, otherwise a
+synthetic city of jittered, densified square beats (no database needed):
+
+    python benchmarks/bench_beat_assignment.py --points 1000000
+    python benchmarks/bench_beat_assignment.py --geojson app/static/data/beat_polygons.geojson
+"""
+import argparse, json, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from app.services.beat_assignment import BeatLocator
+from app.services.beat_geometry import BeatGeometry
+
+SOUTH, WEST, HEIGHT, WIDTH = 41.64, -87.94, 0.38, 0.42
+
+
+def synthetic_beats(rows=20, cols=14, vertices_per_side=100, seed=0):
+    rng = np.random.default_rng(seed)
+    dy, dx = HEIGHT / rows, WIDTH / cols
+    t = np.linspace(0, 1, vertices_per_side, endpoint=False)
+    features = []
+    for i in range(rows):
+        for j in range(cols):
+            s, w = SOUTH + i * dy, WEST + j * dx
+            ring = np.concatenate([
+                np.c_[w + t * dx, np.full_like(t, s)],
+                np.c_[np.full_like(t, w + dx), s + t * dy],
+                np.c_[w + dx - t * dx, np.full_like(t, s + dy)],
+                np.c_[np.full_like(t, w), s + dy - t * dy],
+            ])
+            # jitter only along each side so neighbouring beats still tile the city
+            ring[1:] += rng.normal(0, 1e-6, ring[1:].shape)
+            features.append({
+                "type": "Feature",
+                "properties": {"beat_id": str(1000 + i * cols + j)},
+                "geometry": {"type": "Polygon", "coordinates": [ring.tolist() + [ring[0].tolist()]]},
+            })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def ray_cast(x, y, ring):
+    """Plain Python even-odd test, the reference for a sample of points."""
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--geojson", help="beat polygon GeoJSON (default: synthetic beats)")
+    parser.add_argument("--check", type=int, default=2000, help="points verified against plain ray casting")
+    args = parser.parse_args()
+
+    if args.geojson:
+        with open(args.geojson) as f:
+            geojson = json.load(f)
+    else:
+        geojson = synthetic_beats()
+
+    start = time.perf_counter()
+    geometry = BeatGeometry(geojson)
+    locator = BeatLocator.from_geometry(geometry)
+    print(f"beats:            {len(locator)}")
+    print(f"vertices:         {geometry.stats()['vertices']['full']:,}")
+    print(f"setup:            {time.perf_counter() - start:.2f}s")
+
+    rng = np.random.default_rng(1)
+    lat = SOUTH + rng.random(args.points) * HEIGHT
+    lng = WEST + rng.random(args.points) * WIDTH
+
+    start = time.perf_counter()
+    beats = locator.assign(lat, lng)
+    elapsed = time.perf_counter() - start
+    print(f"points:           {args.points:,}")
+    print(f"assigned:         {np.count_nonzero(beats != -1):,}")
+    print(f"time:             {elapsed:.2f}s")
+    print(f"throughput:       {args.points / elapsed:,.0f} points/s")
+
+    if args.check:
+        candidates = []
+        for beat_id, g in zip(geometry.beat_ids, geometry.geometries):
+            rings = g["coordinates"] if g["type"] == "Polygon" else [r for p in g["coordinates"] for r in p]
+            xs = [x for r in rings for x, _ in r]
+            ys = [y for r in rings for _, y in r]
+            candidates.append((beat_id, rings, min(xs), max(xs), min(ys), max(ys)))
+        n = min(args.check, args.points)
+        wrong = 0
+        for i in range(n):
+            x, y = lng[i], lat[i]
+            expected = next((
+                beat_id for beat_id, rings, x0, x1, y0, y1 in candidates
+                if x0 <= x <= x1 and y0 <= y <= y1 and sum(ray_cast(x, y, r) for r in rings) % 2
+            ), -1)
+            wrong += expected != beats[i]
+        print(f"reference check:  {wrong} of {n} differ")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark /environment/api/data: the original row-by-row implementation
+against the server-side aggregation in app/services/environment_stats.py.
+
+Runs against BENCH_DATABASE_URI (never DATABASE_URI, it may seed rows):
+
+    BENCH_DATABASE_URI=postgresql://... python benchmarks/bench_environment_data.py --rows 1000000
+"""
+import argparse, os, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+from sqlalchemy import text
+from app.models.models import db, Crash
+from app.services.environment_stats import environment_summary, filter_crashes
+
+FILTERS = [
+    ("All filters", dict()),
+    ("Month = 7", dict(month='7')),
+    ("RAIN + DARKNESS", dict(weather='RAIN', lighting='DARKNESS')),
+]
+
+SEED_SQL = """
+INSERT INTO traffic_crashes (
+    "CRASH_RECORD_ID", "CRASH_DATE", "POSTED_SPEED_LIMIT", "WEATHER_CONDITION",
+    "LIGHTING_CONDITION", "CRASH_TYPE", "HIT_AND_RUN_I", "PRIM_CONTRIBUTORY_CAUSE",
+    "STREET_NAME", "BEAT_OF_OCCURRENCE", "NUM_UNITS", "MOST_SEVERE_INJURY",
+    "INJURIES_TOTAL", "INJURIES_FATAL", "INJURIES_INCAPACITATING",
+    "CRASH_HOUR", "CRASH_DAY_OF_WEEK", "CRASH_MONTH", "LATITUDE", "LONGITUDE"
+)
+SELECT
+    'bench-' || g,
+    to_char(timestamp '2018-01-01' + random() * interval '2500 days', 'MM/DD/YYYY HH12:MI:SS AM'),
+    (ARRAY[15, 20, 25, 30, 35, 45])[1 + floor(random() * 6)],
+    (ARRAY['CLEAR', 'RAIN', 'SNOW', 'CLOUDY/OVERCAST', 'UNKNOWN', 'FOG/SMOKE/HAZE'])[1 + floor(random() * 6)],
+    (ARRAY['DAYLIGHT', 'DARKNESS', 'DARKNESS, LIGHTED ROAD', 'DUSK', 'DAWN', 'UNKNOWN'])[1 + floor(random() * 6)],
+    (ARRAY['NO INJURY / DRIVE AWAY', 'INJURY AND / OR TOW DUE TO CRASH'])[1 + floor(random() * 2)],
+    (ARRAY['Y', 'N'])[1 + floor(random() * 2)],
+    (ARRAY['FAILING TO YIELD RIGHT-OF-WAY', 'FOLLOWING TOO CLOSELY', 'UNABLE TO DETERMINE',
+           'IMPROPER BACKING', 'EXCEEDING AUTHORIZED SPEED LIMIT'])[1 + floor(random() * 5)],
+    'STREET ' || floor(random() * 3000),
+    (ARRAY[111, 112, 113, 114, 121, 122, 123, 124, 131, 132])[1 + floor(random() * 10)],
+    1 + floor(random() * 3),
+    (ARRAY['NO INDICATION OF INJURY', 'NONINCAPACITATING INJURY', 'REPORTED, NOT EVIDENT',
+           'INCAPACITATING INJURY', 'FATAL'])[1 + floor(random() * 5)],
+    floor(random() * 3), (random() < 0.01)::int, (random() < 0.03)::int,
+    floor(random() * 24), 1 + floor(random() * 7), 1 + floor(random() * 12),
+    41.64 + random() * 0.38, -87.94 + random() * 0.42
+FROM generate_series(1, :n) g
+"""
+
+
+def legacy_environment_data(month='All', weather='All', speed='All', lighting='All'):
+    """The pre-aggregation implementation, kept verbatim for comparison."""
+    crashes = filter_crashes(Crash.query, month, weather, speed, lighting).with_entities(
+        Crash.street_name,
+        Crash.injuries_fatal,
+        Crash.injuries_incapacitating,
+        Crash.posted_speed_limit,
+        Crash.weather_condition,
+        Crash.lighting_condition
+    ).all()
+
+    total_crashes = len(crashes)
+    street_counts = {}
+    for c in crashes:
+        if c.street_name:
+            street_counts[c.street_name] = street_counts.get(c.street_name, 0) + 1
+    common_street, street_count = ("-", 0)
+    if street_counts:
+        common_street, street_count = max(street_counts.items(), key=lambda x: x[1])
+    severe_count = sum(
+        1 for c in crashes if (c.injuries_fatal and c.injuries_fatal > 0) or
+                              (c.injuries_incapacitating and c.injuries_incapacitating > 0)
+    )
+    speed_counts, weather_counts, lighting_counts = {}, {}, {}
+    for c in crashes:
+        speed_counts[c.posted_speed_limit] = speed_counts.get(c.posted_speed_limit, 0) + 1
+        weather_counts[c.weather_condition] = weather_counts.get(c.weather_condition, 0) + 1
+        lighting_counts[c.lighting_condition] = lighting_counts.get(c.lighting_condition, 0) + 1
+    return {
+        "metrics": {"total": total_crashes, "common_street": common_street,
+                    "common_street_count": street_count, "severe": severe_count},
+        "charts": {
+            "speed": [{"label": str(k), "count": v} for k, v in speed_counts.items()],
+            "weather": [{"label": k, "count": v} for k, v in weather_counts.items()],
+            "lighting": [{"label": k, "count": v} for k, v in lighting_counts.items()],
+        }
+    }
+
+
+def measure(fn, **filters):
+    """Latency from an untraced run; peak Python memory from a second, traced run."""
+    db.session.expunge_all()
+    start = time.perf_counter()
+    result = fn(**filters)
+    elapsed = time.perf_counter() - start
+
+    db.session.expunge_all()
+    tracemalloc.start()
+    fn(**filters)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='minimum rows in traffic_crashes')
+    args = parser.parse_args()
+
+    uri = os.getenv('BENCH_DATABASE_URI')
+    if not uri:
+        sys.exit("Set BENCH_DATABASE_URI to a scratch database.")
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        existing = db.session.query(db.func.count(Crash.crash_record_id)).scalar()
+        if existing < args.rows:
+            print(f"Seeding {args.rows - existing:,} rows...")
+            db.session.execute(text(SEED_SQL), {"n": args.rows - existing})
+            db.session.commit()
+            db.session.execute(text("ANALYZE traffic_crashes"))
+        total = db.session.query(db.func.count(Crash.crash_record_id)).scalar()
+        print(f"traffic_crashes: {total:,} rows\n")
+
+        print(f"{'filters':<18} {'impl':<10} {'latency':>10} {'peak memory':>14}")
+        for label, filters in FILTERS:
+            for name, fn in (("before", legacy_environment_data), ("after", environment_summary)):
+                result, elapsed, peak = measure(fn, **filters)
+                print(f"{label:<18} {name:<10} {elapsed * 1000:>8.0f}ms {peak / 2**20:>11.1f} MiB")
+            legacy = legacy_environment_data(**filters)
+            assert legacy["metrics"]["total"] == result["metrics"]["total"]
+            assert legacy["metrics"]["severe"] == result["metrics"]["severe"]
+            assert legacy["metrics"]["common_street_count"] == result["metrics"]["common_street_count"]
+
+
+if __name__ == '__main__':
+    main()
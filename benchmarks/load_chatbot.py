@@ -0,0 +1,211 @@
+"""
+Load-test the chatbot: concurrent questions through the Flask /api/chatbot
+and the FastAPI /ask endpoints, reporting throughput, p50/p95/p99 latency
+and how saturated the pipeline's model slots were.
+
+By default both apps are served in this process on local ports with the
+fake model backend (chatbot/fake_bedrock.py), so no AWS credentials are
+needed; FAKE_MODEL_* shape its latency and throttling. The database is
+DATABASE_URI, as for the apps. Pass --flask-url / --fastapi-url to drive
+servers that are already running instead (Flask needs --cookie with a
+logged-in session).
+
+    FAKE_MODEL_LATENCY=lognormal:0.8,0.4 python benchmarks/load_chatbot.py --concurrency 16 --requests 200
+    FAKE_MODEL_MAX_CONCURRENCY=3 python benchmarks/load_chatbot.py --target ask --distinct
+"""
+import argparse, json, os, socket, sys, threading, time
+import urllib.error, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault("CHATBOT_MODEL_BACKEND", "fake")
+
+QUESTIONS = [
+    "Which weather and lighting combinations have the most crashes?",
+    "top 5 causes in 2024",
+    "crashes by hour in snow",
+    "how many crashes in darkness",
+    "What share of crashes at stop signs involved injuries?",
+    "Which streets had the most rear end crashes at night in the rain?",
+]
+
+# endpoint -> (path, request body for a question, pipeline stats path)
+TARGETS = {
+    "chatbot": ("/api/chatbot", lambda q: {"message": q}, "/api/chatbot/pipeline"),
+    "ask": ("/ask", lambda q: {"question": q}, "/pipeline-stats"),
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_flask():
+    """(base URL, session cookie) of the dashboard app served from a background thread."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from main import app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args):
+            pass
+
+    port = free_port()
+    server = make_server("127.0.0.1", port, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    session = app.session_interface.get_signing_serializer(app).dumps({"user_id": 1})
+    return f"http://127.0.0.1:{port}", f"{app.config.get('SESSION_COOKIE_NAME', 'session')}={session}"
+
+
+def serve_fastapi():
+    import uvicorn
+    from chatbot.main import app
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def request_json(url, body=None, cookie=None, timeout=120):
+    """(HTTP status, decoded JSON body or None)."""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    if cookie:
+        req.add_header("Cookie", cookie)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status, json.loads(response.read() or "null")
+    except urllib.error.HTTPError as e:
+        return e.code, None
+    except (urllib.error.URLError, TimeoutError):
+        return 0, None
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] if ordered else 0.0
+
+
+class SaturationSampler:
+    """Polls the pipeline stats endpoint while the load runs."""
+
+    def __init__(self, url, cookie, interval):
+        self.url, self.cookie, self.interval = url, cookie, interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            status, stats = request_json(self.url, cookie=self.cookie, timeout=5)
+            if status == 200:
+                self.samples.append(stats)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self, before, after):
+        if not self.samples:
+            return {}
+        concurrency = self.samples[-1]["concurrency"]
+        in_flight = [s["in_flight"] for s in self.samples]
+        summary = {
+            "slots": concurrency,
+            "mean_in_flight": sum(in_flight) / len(in_flight),
+            "peak_in_flight": max(in_flight),
+            "full": sum(n >= concurrency for n in in_flight) / len(in_flight),
+            "peak_queued": max(s["queued"] for s in self.samples),
+            "rejected": after["rejected"] - before["rejected"],
+            "breaker_trips": after["breaker"]["trips"] - before["breaker"]["trips"],
+        }
+        if "model_client" in after:   # fake backend; created on the first call, so maybe not before
+            earlier = before.get("model_client", {"calls": 0, "throttled": 0})
+            summary["model_calls"] = after["model_client"]["calls"] - earlier["calls"]
+            summary["model_throttled"] = after["model_client"]["throttled"] - earlier["throttled"]
+        return summary
+
+
+def run_load(name, base_url, cookie, args, questions):
+    path, make_body, stats_path = TARGETS[name]
+    _, before = request_json(base_url + stats_path, cookie=cookie)
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def one(i):
+        question = questions[i % len(questions)]
+        if args.distinct:   # defeat the question cache: every request needs new SQL
+            question = f"{question} ({name} request {i})"
+        started = time.perf_counter()
+        status, _ = request_json(base_url + path, make_body(question), cookie, timeout=args.timeout)
+        elapsed = time.perf_counter() - started
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with SaturationSampler(base_url + stats_path, cookie, args.sample_interval) as sampler:
+        with ThreadPoolExecutor(args.concurrency) as workers:
+            list(workers.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - started
+    _, after = request_json(base_url + stats_path, cookie=cookie)
+
+    latencies.sort()
+    print(f"== {path}  ({args.requests} requests, {args.concurrency} clients)")
+    counts = ", ".join(f"{status or 'no response'}: {n}" for status, n in sorted(statuses.items()))
+    print(f"statuses:         {counts}")
+    print(f"time:             {elapsed:.2f}s")
+    print(f"throughput:       {len(latencies) / elapsed:.2f} answers/s")
+    print(f"latency p50:      {1000 * percentile(latencies, 0.50):.0f} ms")
+    print(f"latency p95:      {1000 * percentile(latencies, 0.95):.0f} ms")
+    print(f"latency p99:      {1000 * percentile(latencies, 0.99):.0f} ms")
+    print(f"latency max:      {1000 * (latencies[-1] if latencies else 0):.0f} ms")
+    saturation = sampler.summary(before, after) if before and after else {}
+    if saturation:
+        print(f"model slots:      {saturation['mean_in_flight']:.1f} mean / {saturation['peak_in_flight']} peak "
+              f"of {saturation['slots']}, all busy {100 * saturation['full']:.0f}% of the time")
+        print(f"queued (peak):    {saturation['peak_queued']}")
+        print(f"rejected busy:    {saturation['rejected']}")
+        print(f"breaker trips:    {saturation['breaker_trips']}")
+        if "model_calls" in saturation:
+            print(f"model calls:      {saturation['model_calls']} ({saturation['model_throttled']} throttled)")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--target", choices=["both", *TARGETS], default="both")
+    parser.add_argument("--concurrency", type=int, default=8, help="clients sending questions at once")
+    parser.add_argument("--requests", type=int, default=100, help="questions per endpoint")
+    parser.add_argument("--questions", help="file with one question per line (default: a built-in mix)")
+    parser.add_argument("--distinct", action="store_true", help="make every question unique to bypass the SQL cache")
+    parser.add_argument("--flask-url", help="running dashboard app (default: serve one here)")
+    parser.add_argument("--fastapi-url", help="running chatbot service (default: serve one here)")
+    parser.add_argument("--cookie", help="session cookie for --flask-url, e.g. session=...")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--sample-interval", type=float, default=0.1, help="seconds between pipeline stats samples")
+    args = parser.parse_args()
+
+    questions = QUESTIONS
+    if args.questions:
+        with open(args.questions) as f:
+            questions = [line.strip() for line in f if line.strip()]
+    print(f"model backend:    {os.environ['CHATBOT_MODEL_BACKEND']}"
+          f" (latency {os.getenv('FAKE_MODEL_LATENCY', 'default')})\n")
+
+    if args.target in ("both", "chatbot"):
+        base_url, cookie = (args.flask_url, args.cookie) if args.flask_url else serve_flask()
+        run_load("chatbot", base_url.rstrip("/"), cookie, args, questions)
+    if args.target in ("both", "ask"):
+        base_url = args.fastapi_url or serve_fastapi()
+        run_load("ask", base_url.rstrip("/"), None, args, questions)
+
+if __name__ == "__main__":
+    main()
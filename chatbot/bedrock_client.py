@@ -1,6 +1,8 @@
 import boto3
+import importlib
 import os
 from dotenv import load_dotenv
+from config import Config
 
 load_dotenv()
 
@@ -11,3 +13,22 @@ def get_bedrock_client(region=None):
         aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
         aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
     )
+
+def get_model_client(backend=None):
+    """
+    Model client for CHATBOT_MODEL_BACKEND. Any object with Bedrock runtime's
+    invoke_model and invoke_model_with_response_stream will do:
+      "bedrock"          the real service (default)
+      "fake"             local stand-in with simulated latency and throttling (fake_bedrock.py)
+      "module:factory"   a callable returning such a client
+    """
+    backend = backend or Config.CHATBOT_MODEL_BACKEND
+    if backend == "bedrock":
+        return get_bedrock_client()
+    if backend == "fake":
+        from chatbot.fake_bedrock import FakeBedrockClient
+        return FakeBedrockClient.from_config()
+    if ":" in backend:
+        module, factory = backend.split(":", 1)
+        return getattr(importlib.import_module(module), factory)()
+    raise ValueError(f"Unknown CHATBOT_MODEL_BACKEND {backend!r}: use 'bedrock', 'fake' or 'module:factory'")
@@ -1,21 +1,52 @@
 import json
 
-def prompt_claude_v3(client, user_prompt: str):
-    body = {
+MODEL_ID = "anthropic.claude-3-haiku-20240307-v1:0"
+
+def _request_body(user_prompt: str):
+    return json.dumps({
         "messages": [
             {"role": "user", "content": user_prompt}
         ],
         "max_tokens": 1024,
         "temperature": 0.7,
         "anthropic_version": "bedrock-2023-05-31"
-    }
+    })
 
+def invoke_claude_v3(client, user_prompt: str):
+    """(reply text, usage): usage holds the input_tokens/output_tokens Bedrock reports."""
     response = client.invoke_model(
-        modelId="anthropic.claude-3-haiku-20240307-v1:0",
-        body=json.dumps(body),
+        modelId=MODEL_ID,
+        body=_request_body(user_prompt),
         contentType="application/json",
         accept="application/json"
     )
 
     result = json.loads(response["body"].read())
-    return result["content"][0]["text"]
+    return result["content"][0]["text"], result.get("usage", {})
+
+def prompt_claude_v3(client, user_prompt: str):
+    return invoke_claude_v3(client, user_prompt)[0]
+
+def stream_claude_v3(client, user_prompt: str, usage=None):
+    """
+    Yield the reply text piece by piece as the model generates it. Token
+    counts from the stream's message events are filled into `usage` (a dict).
+    """
+    response = client.invoke_model_with_response_stream(
+        modelId=MODEL_ID,
+        body=_request_body(user_prompt),
+        contentType="application/json",
+        accept="application/json"
+    )
+
+    for event in response["body"]:
+        chunk = event.get("chunk")
+        if not chunk:
+            continue
+        payload = json.loads(chunk["bytes"])
+        if payload.get("type") == "content_block_delta":
+            yield payload["delta"].get("text", "")
+        elif usage is not None and payload.get("type") == "message_start":
+            usage.update(payload.get("message", {}).get("usage", {}))
+        elif usage is not None and payload.get("type") == "message_delta":
+            usage.update(payload.get("usage", {}))
@@ -24,6 +24,9 @@ def fetch_table_as_df(table_name: str):
 import json
 
 async def get_schema_info(pool, schema_path='schema.json'):
+    return load_schema_info(pool, schema_path)
+
+def load_schema_info(pool, schema_path='schema.json'):
     print("Getting schema")
     try:
         with open(schema_path, 'r') as f:
@@ -0,0 +1,137 @@
+import calendar
+import pandas as pd
+
+# 💡 Fast path: explanations for simple result shapes without the model
+#
+# A single number or period, a ranked list of (label, value) rows and a
+# month, hour, day-of-week or year series are explained from a fixed sentence
+# pattern, with periods spelled out (3 -> March, 17 -> 5 PM, 1 -> Sunday). Anything
+# else returns None and goes to the model as before, and so does a series
+# cut short by the preview (its peak and low would only cover the rows shown).
+
+PERIODS = ("month", "hour", "day_of_week", "year")
+
+# period -> (plural, preposition before one of its labels)
+PERIOD_WORDS = {
+    "month": ("months", "in"), "hour": ("hours", "at"),
+    "day_of_week": ("days of the week", "on"), "year": ("years", "in"),
+}
+
+# Chicago crash data numbers days from Sunday = 1
+DAY_NAMES = {i + 1: name for i, name in enumerate(
+    ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"])}
+
+
+def fmt_number(value):
+    value = float(value)
+    return f"{value:,.0f}" if value.is_integer() else f"{value:,.2f}"
+
+
+def humanize(column):
+    return str(column).replace("_", " ").strip().lower()
+
+
+def with_article(phrase):
+    return ("an " if phrase[:1] in "aeiou" else "a ") + phrase
+
+
+def period_of(column):
+    """"month", "hour", "day_of_week" or "year" when column names a period, else None."""
+    name = str(column).lower()
+    for period in PERIODS:
+        if name == period or name.endswith("_" + period) or name.startswith(period + "_"):
+            return period
+    if name.endswith("_dow") or name in ("dow", "weekday"):
+        return "day_of_week"
+    return None
+
+
+def period_label(period, value):
+    number = int(value)
+    if period == "month" and 1 <= number <= 12:
+        return calendar.month_name[number]
+    if period == "hour" and 0 <= number <= 23:
+        return f"{(number - 1) % 12 + 1} {'AM' if number < 12 else 'PM'}"
+    if period == "day_of_week" and number in DAY_NAMES:
+        return DAY_NAMES[number]
+    if period == "year":
+        return str(number)
+    raise ValueError(f"{value!r} is not a {period}")
+
+
+def classify_result(frame):
+    """"scalar", "period", "ranking", "series" or None (the model explains it)."""
+    if frame.empty or frame.shape[1] > 2:
+        return None
+    measure = pd.to_numeric(frame.iloc[:, -1], errors="coerce")
+    if measure.isna().any() or pd.api.types.is_bool_dtype(frame.iloc[:, -1]):
+        return None
+    period = period_of(frame.columns[0])
+    if frame.shape[1] == 1:
+        if len(frame) != 1:
+            return None
+        if period is None:
+            return "scalar"
+        # "which month had the most crashes": the value is the period itself
+        try:
+            period_label(period, frame.iloc[0, 0])
+        except (TypeError, ValueError):
+            return None
+        return "period"
+    if period is not None:
+        if frame.attrs.get("truncated"):
+            return None
+        try:
+            [period_label(period, v) for v in frame.iloc[:, 0]]
+        except (TypeError, ValueError):
+            return None
+        return "series"
+    if measure.is_monotonic_decreasing:
+        return "ranking"
+    return None
+
+
+def template_explanation(frame):
+    """Two or three sentences explaining frame, or None when its shape needs the model."""
+    shape = classify_result(frame)
+    if shape is None:
+        return None
+    measure_name = humanize(frame.columns[-1])
+    values = [fmt_number(v) for v in pd.to_numeric(frame.iloc[:, -1])]
+
+    if shape == "scalar":
+        text = (f"The {measure_name} is {values[0]}. "
+                f"That single figure covers every record matching your question.")
+    elif shape == "period":
+        period = period_of(frame.columns[0])
+        text = (f"The {measure_name} is {period_label(period, frame.iloc[0, 0])}. "
+                f"It is the only {period.replace('_', ' ')} in the result.")
+    elif shape == "ranking":
+        labels = ["(blank)" if pd.isna(v) else str(v) for v in frame.iloc[:, 0]]
+        if len(labels) == 1:
+            text = (f"{labels[0]} has {with_article(measure_name)} of {values[0]}. "
+                    f"It is the only row in the result.")
+        else:
+            others = [f"{label} ({value})" for label, value in zip(labels[1:3], values[1:3])]
+            text = (f"{labels[0]} ranks first with {with_article(measure_name)} of {values[0]}, "
+                    f"followed by {' and '.join(others)}. "
+                    f"The {len(labels)} results shown range from {values[0]} down to {values[-1]}.")
+    else:
+        period = period_of(frame.columns[0])
+        units, at = PERIOD_WORDS[period]
+        labels = [period_label(period, v) for v in frame.iloc[:, 0]]
+        numbers = list(pd.to_numeric(frame.iloc[:, -1]))
+        peak, low = numbers.index(max(numbers)), numbers.index(min(numbers))
+        listed = ", ".join(f"{label} ({value})" for label, value in zip(labels, values))
+        if len(labels) == 1:
+            text = (f"{at.capitalize()} {labels[0]}, the {measure_name} is {values[0]}. "
+                    f"It is the only {period.replace('_', ' ')} in the result.")
+        else:
+            text = (f"Across the {len(labels)} {units} shown, the {measure_name} is highest {at} "
+                    f"{labels[peak]} ({values[peak]}) and lowest {at} {labels[low]} ({values[low]}). "
+                    f"In order: {listed}.")
+
+    sample_percent = frame.attrs.get("sample_percent")
+    if sample_percent is not None:
+        text += f" These figures come from a {sample_percent:g}% sample of the data, so they are approximate."
+    return text
@@ -0,0 +1,174 @@
+import io
+import json
+import math
+import random
+import re
+import threading
+import time
+from botocore.exceptions import ClientError
+from config import Config
+
+# 💡 Local stand-in for the Bedrock runtime client
+#
+# Answers invoke_model and invoke_model_with_response_stream the way Bedrock
+# does for Claude 3 (content, usage, streamed message events) without AWS, so
+# both chatbot entry points can be run and load-tested offline
+# (CHATBOT_MODEL_BACKEND=fake). Each call sleeps for a draw from a latency
+# distribution, and can be throttled at random or once too many calls are in
+# flight, raising the same ThrottlingException the pipeline retries.
+# Replies are canned: SQL for SQL-generation prompts (chosen by regex on the
+# question) and a fixed explanation for everything else.
+
+DEFAULT_SQL = """SELECT "WEATHER_CONDITION", "LIGHTING_CONDITION", COUNT(*) AS crash_count
+FROM traffic_crashes
+WHERE "WEATHER_CONDITION" IS NOT NULL AND "LIGHTING_CONDITION" IS NOT NULL
+GROUP BY "WEATHER_CONDITION", "LIGHTING_CONDITION"
+ORDER BY crash_count DESC
+LIMIT 5"""
+
+DEFAULT_EXPLANATION = ("Clear weather in daylight accounts for the most crashes in this result, "
+                       "well ahead of the other weather and lighting combinations shown.")
+
+# The SQL prompts of both entry points end by quoting the question
+SQL_QUESTION = re.compile(r'Now write a valid SQL query to answer:\s*"(.*)"\s*Only return the SQL query', re.DOTALL)
+
+CHARS_PER_TOKEN = 4
+
+
+def latency_distribution(spec):
+    """
+    Seconds sampler for a spec: "0.8" (fixed), "uniform:low,high",
+    "normal:mean,sd", "lognormal:median,sigma" or "exponential:mean".
+    Draws are never negative.
+    """
+    name, _, params = str(spec).partition(":")
+    if not params:
+        seconds = float(name)
+        return lambda rng: seconds
+    a, _, b = params.partition(",")
+    a = float(a)
+    b = float(b) if b else None
+    if name == "uniform":
+        return lambda rng: rng.uniform(a, b)
+    if name == "normal":
+        return lambda rng: max(0.0, rng.gauss(a, b))
+    if name == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(a), b)
+    if name == "exponential":
+        return lambda rng: rng.expovariate(1 / a)
+    raise ValueError(f"Unknown latency distribution {spec!r}")
+
+
+def throttling_error(operation):
+    return ClientError({"Error": {"Code": "ThrottlingException", "Message": "Too many requests, please wait."}},
+                       operation)
+
+
+class FakeBedrockClient:
+    """
+    latency: a spec for latency_distribution. throttle_rate: chance any call
+    is throttled. max_concurrency: calls in flight beyond which new ones are
+    throttled (0: no limit). sql: {question regex: SQL}, first match wins,
+    else default_sql.
+    """
+
+    def __init__(self, latency="0", throttle_rate=0.0, max_concurrency=0, sql=None,
+                 default_sql=DEFAULT_SQL, explanation=DEFAULT_EXPLANATION, seed=None):
+        self.latency = latency_distribution(latency)
+        self.throttle_rate = throttle_rate
+        self.max_concurrency = max_concurrency
+        self.sql = [(re.compile(pattern, re.IGNORECASE), text) for pattern, text in (sql or {}).items()]
+        self.default_sql = default_sql
+        self.explanation = explanation
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.active = self.peak = 0
+        self.calls = self.throttled = 0
+
+    @classmethod
+    def from_config(cls):
+        """Client configured from the FAKE_MODEL_* settings."""
+        canned = {}
+        if Config.FAKE_MODEL_RESPONSES:
+            with open(Config.FAKE_MODEL_RESPONSES) as f:
+                canned = json.load(f)
+        return cls(
+            latency=Config.FAKE_MODEL_LATENCY,
+            throttle_rate=Config.FAKE_MODEL_THROTTLE_RATE,
+            max_concurrency=Config.FAKE_MODEL_MAX_CONCURRENCY,
+            sql=canned.get("sql"),
+            default_sql=canned.get("default_sql", DEFAULT_SQL),
+            explanation=canned.get("explanation", DEFAULT_EXPLANATION),
+        )
+
+    def reply_for(self, prompt):
+        match = SQL_QUESTION.search(prompt)
+        if match is None:
+            return self.explanation
+        question = match.group(1)
+        return next((text for pattern, text in self.sql if pattern.search(question)), self.default_sql)
+
+    def _admit(self, operation):
+        with self._lock:
+            self.calls += 1
+            over_quota = self.max_concurrency and self.active >= self.max_concurrency
+            if over_quota or self._random.random() < self.throttle_rate:
+                self.throttled += 1
+                raise throttling_error(operation)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            return self.latency(self._random)
+
+    def _done(self):
+        with self._lock:
+            self.active -= 1
+
+    def invoke_model(self, body, **kwargs):
+        prompt = json.loads(body)["messages"][0]["content"]
+        seconds = self._admit("InvokeModel")
+        try:
+            time.sleep(seconds)
+        finally:
+            self._done()
+        text = self.reply_for(prompt)
+        result = {
+            "type": "message",
+            "role": "assistant",
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "usage": {"input_tokens": _tokens(prompt), "output_tokens": _tokens(text)},
+        }
+        return {"body": io.BytesIO(json.dumps(result).encode()), "contentType": "application/json"}
+
+    def invoke_model_with_response_stream(self, body, **kwargs):
+        prompt = json.loads(body)["messages"][0]["content"]
+        seconds = self._admit("InvokeModelWithResponseStream")
+        return {"body": self._events(prompt, self.reply_for(prompt), seconds), "contentType": "application/json"}
+
+    def _events(self, prompt, text, seconds):
+        """Stream events; a third of the latency before the first chunk, the rest spread over the words."""
+        words = re.findall(r"\S+\s*", text)
+        try:
+            time.sleep(seconds / 3)
+            yield _event({"type": "message_start",
+                          "message": {"usage": {"input_tokens": _tokens(prompt), "output_tokens": 1}}})
+            for word in words:
+                time.sleep(2 * seconds / 3 / max(1, len(words)))
+                yield _event({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": word}})
+            yield _event({"type": "message_delta", "delta": {"stop_reason": "end_turn"},
+                          "usage": {"output_tokens": _tokens(text)}})
+            yield _event({"type": "message_stop"})
+        finally:
+            self._done()
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "throttled": self.throttled, "active": self.active, "peak": self.peak}
+
+
+def _tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _event(payload):
+    return {"chunk": {"bytes": json.dumps(payload).encode()}}
@@ -0,0 +1,231 @@
+import re
+import threading
+from collections import deque
+from chatbot.question_cache import normalize_question
+
+# 💡 Fast path: common question shapes answered from vetted SQL templates
+#
+# Top-N rankings ("top 5 causes in 2024"), counts by month, hour or day of
+# week ("crashes by hour in snow") and filtered counts ("how many crashes in
+# darkness") are recognized without the model and filled into fixed SQL.
+# Filter values are matched against the categorical vocabularies (the same
+# values the SQL prompt lists) and always used verbatim, so templates only
+# ever see known columns, known values and integers. A question matches only
+# when every word is accounted for: anything the templates don't understand
+# ("fatal", "least", "since", a second value) sends it to the model instead.
+
+# phrase -> column the answer is grouped by
+GROUP_PHRASES = {
+    "cause": "PRIM_CONTRIBUTORY_CAUSE", "causes": "PRIM_CONTRIBUTORY_CAUSE",
+    "primary cause": "PRIM_CONTRIBUTORY_CAUSE", "primary causes": "PRIM_CONTRIBUTORY_CAUSE",
+    "contributory cause": "PRIM_CONTRIBUTORY_CAUSE", "contributory causes": "PRIM_CONTRIBUTORY_CAUSE",
+    "reason": "PRIM_CONTRIBUTORY_CAUSE", "reasons": "PRIM_CONTRIBUTORY_CAUSE",
+    "weather": "WEATHER_CONDITION",
+    "street": "STREET_NAME", "streets": "STREET_NAME",
+    "lighting": "LIGHTING_CONDITION",
+    "crash type": "FIRST_CRASH_TYPE", "crash types": "FIRST_CRASH_TYPE",
+    "type of crash": "FIRST_CRASH_TYPE", "types of crashes": "FIRST_CRASH_TYPE",
+    "beat": "BEAT_OF_OCCURRENCE", "beats": "BEAT_OF_OCCURRENCE",
+    "police beat": "BEAT_OF_OCCURRENCE", "police beats": "BEAT_OF_OCCURRENCE",
+    "road surface": "ROADWAY_SURFACE_COND", "road surfaces": "ROADWAY_SURFACE_COND",
+    "traffic control device": "TRAFFIC_CONTROL_DEVICE", "traffic control devices": "TRAFFIC_CONTROL_DEVICE",
+}
+
+# phrase -> time column the answer is broken down by
+PERIOD_PHRASES = {
+    "month": "CRASH_MONTH", "months": "CRASH_MONTH", "monthly": "CRASH_MONTH",
+    "hour": "CRASH_HOUR", "hours": "CRASH_HOUR", "hourly": "CRASH_HOUR",
+    "time of day": "CRASH_HOUR", "hour of the day": "CRASH_HOUR", "hour of day": "CRASH_HOUR",
+    "day": "CRASH_DAY_OF_WEEK", "days": "CRASH_DAY_OF_WEEK",
+    "day of week": "CRASH_DAY_OF_WEEK", "day of the week": "CRASH_DAY_OF_WEEK",
+    "days of the week": "CRASH_DAY_OF_WEEK", "weekday": "CRASH_DAY_OF_WEEK", "weekdays": "CRASH_DAY_OF_WEEK",
+}
+
+MONTH_NUMBERS = {
+    "january": 1, "february": 2, "march": 3, "april": 4, "may": 5, "june": 6, "july": 7,
+    "august": 8, "september": 9, "october": 10, "november": 11, "december": 12,
+}
+
+# Words that don't change what is asked
+FILLER_WORDS = {
+    "what", "whats", "which", "where", "are", "is", "were", "was", "been", "the", "a", "an",
+    "of", "in", "on", "at", "for", "during", "with", "by", "per", "each", "every", "to",
+    "show", "me", "list", "give", "tell", "get", "find", "see", "there", "did", "do", "does",
+    "have", "has", "had", "happen", "happened", "occur", "occurred", "reported", "recorded",
+    "crash", "crashes", "accident", "accidents", "collision", "collisions", "incidents",
+    "traffic", "chicago", "how", "many", "number", "count", "total", "overall", "all",
+    "most", "common", "frequent", "top", "leading", "highest", "biggest", "main",
+    "busiest", "peak", "worst", "condition", "conditions", "breakdown",
+}
+
+COUNT_WORDS = {"how", "number", "count", "total"}
+RANKED_WORDS = {"most", "highest", "busiest", "peak", "worst"}
+# Words that ask for a breakdown; without one, "how many crashes on one way streets" is a count
+PER_WORDS = {"by", "per", "each", "every"}
+BREAKDOWN_WORDS = RANKED_WORDS | PER_WORDS | {
+    "top", "leading", "common", "frequent", "biggest", "main", "breakdown",
+}
+
+DEFAULT_TOP_N = 5
+MAX_TOP_N = 50
+
+# Most rows a template returns (top 50; at most 24 per period), all fetched for the answer
+TEMPLATE_ROWS = MAX_TOP_N
+
+YEAR_FILTER = """EXTRACT(YEAR FROM TO_TIMESTAMP("CRASH_DATE", 'MM/DD/YYYY HH12:MI:SS AM')) = {year}"""
+
+TOP_N_SQL = """SELECT "{column}" AS {alias}, COUNT(*) AS crash_count
+FROM traffic_crashes
+WHERE {where}
+GROUP BY "{column}"
+ORDER BY crash_count DESC
+LIMIT {n}"""
+
+PERIOD_SQL = """SELECT "{column}" AS {alias}, COUNT(*) AS crash_count
+FROM traffic_crashes
+WHERE {where}
+GROUP BY "{column}"
+ORDER BY {order}"""
+
+COUNT_SQL = """SELECT COUNT(*) AS crash_count
+FROM traffic_crashes{where}"""
+
+
+def sql_literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _phrases(vocabularies):
+    """{phrase: [(kind, column, value)]}, longest phrase first."""
+    phrases = {}
+    for p, column in GROUP_PHRASES.items():
+        phrases.setdefault(p, []).append(("group", column, None))
+    for p, column in PERIOD_PHRASES.items():
+        phrases.setdefault(p, []).append(("period", column, None))
+    for column, values in vocabularies.items():
+        for value in values:
+            phrase = normalize_question(value)
+            if phrase:
+                phrases.setdefault(phrase, []).append(("value", column, value))
+    return dict(sorted(phrases.items(), key=lambda item: len(item[0]), reverse=True))
+
+
+def match_intent(question, vocabularies):
+    """
+    (intent name, SQL) when the question fits a template, else None.
+    vocabularies: {column: values} of the categorical columns that can be filtered on.
+    """
+    text = f" {normalize_question(question)} "
+    found = {"group": set(), "period": set(), "value": set()}
+    for phrase, meanings in _phrases(vocabularies).items():
+        if f" {phrase} " in text:
+            text = text.replace(f" {phrase} ", " ")
+            for kind, column, value in meanings:
+                found[kind].add((column, value))
+
+    words = text.split()
+    top = re.search(r" top ([1-9]\d*) ", text)
+    n = min(int(top.group(1)), MAX_TOP_N) if top else DEFAULT_TOP_N
+    years = {w for w in words if re.fullmatch(r"(19|20)\d\d", w)}
+    months = {w for w in words if w in MONTH_NUMBERS}
+    leftover = [w for w in words if w not in FILLER_WORDS and w not in years and w not in months
+                and not (top and w == top.group(1))]
+    # a value several columns share ("UNKNOWN") is as ambiguous as two values
+    if leftover or len(years) > 1 or len(months) > 1 or len(found["value"]) > 1:
+        return None
+
+    filters = []
+    filtered_columns = set()
+    for column, value in found["value"]:
+        filters.append(f'"{column}" = {sql_literal(value)}')
+        filtered_columns.add(column)
+    for year in years:
+        filters.append(YEAR_FILTER.format(year=int(year)))
+    for month in months:
+        filters.append(f'"CRASH_MONTH" = {MONTH_NUMBERS[month]}')
+        filtered_columns.add("CRASH_MONTH")
+
+    # "crashes in snow weather": the group word only names the filtered column
+    groups = {column for column, _ in found["group"]} - filtered_columns
+    periods = {column for column, _ in found["period"]}
+    if len(groups) + len(periods) > 1 or periods & filtered_columns:
+        return None
+    # a group or period word in a count question without "by", "top", "most"...
+    # is only a noun ("on one way streets"); the templates can't tell what is counted
+    if (groups or periods) and COUNT_WORDS & set(words) and not BREAKDOWN_WORDS & set(words):
+        return None
+
+    if groups:
+        column = groups.pop()
+        where = " AND ".join([f'"{column}" IS NOT NULL'] + filters)
+        return "top_n", TOP_N_SQL.format(column=column, alias=column.lower(), where=where, n=n)
+    if periods:
+        column = periods.pop()
+        where = " AND ".join([f'"{column}" IS NOT NULL'] + filters)
+        ranked = "top" in words or RANKED_WORDS & set(words)
+        order = "crash_count DESC" if ranked else f'"{column}"'
+        sql = PERIOD_SQL.format(column=column, alias=column.lower(), where=where, order=order)
+        if "top" in words:   # "top 3 months": only the n busiest
+            sql += f"\nLIMIT {n}"
+        return "by_period", sql
+    # "per year", "each week": a breakdown the templates don't have, not a grand total
+    if COUNT_WORDS & set(words) and not PER_WORDS & set(words):
+        where = "\nWHERE " + " AND ".join(filters) if filters else ""
+        return "count", COUNT_SQL.format(where=where)
+    return None
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class IntentStats:
+    """
+    Template hit rate, recent end-to-end latency per SQL source (template,
+    cache, model) and how many answers were explained by template vs model.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self.matched = self.unmatched = 0
+        self._latency = {}   # path -> recent durations in seconds
+        self.explained_by = {"template": 0, "model": 0}
+
+    def record_match(self, matched):
+        with self._lock:
+            if matched:
+                self.matched += 1
+            else:
+                self.unmatched += 1
+
+    def record_explanation(self, source):
+        with self._lock:
+            self.explained_by[source] += 1
+
+    def record_latency(self, path, seconds):
+        with self._lock:
+            self._latency.setdefault(path, deque(maxlen=self.window)).append(seconds)
+
+    def stats(self):
+        with self._lock:
+            total = self.matched + self.unmatched
+            latency = {}
+            for path, durations in self._latency.items():
+                ordered = sorted(durations)
+                latency[path] = {
+                    "count": len(ordered),
+                    "mean_ms": round(1000 * sum(ordered) / len(ordered), 1),
+                    "p50_ms": round(1000 * _percentile(ordered, 0.5), 1),
+                    "p95_ms": round(1000 * _percentile(ordered, 0.95), 1),
+                }
+            return {
+                "matched": self.matched,
+                "unmatched": self.unmatched,
+                "hit_rate": round(self.matched / total, 3) if total else 0.0,
+                "latency": latency,
+                "explained_by": dict(self.explained_by),
+            }
+
+
+intent_stats = IntentStats()
@@ -1,40 +1,39 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
-from chatbot.bedrock_client import get_bedrock_client
-from chatbot.claude_utils import prompt_claude_v3
-from chatbot.db_utils import get_schema_info
-import pandas as pd
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from chatbot.explanations import template_explanation
+from chatbot.metrics import Trace, registry
+from chatbot.pipeline import Busy, PipelineUnavailable, backoff_delay, pipeline
+from chatbot.question_cache import normalize_question, question_cache, question_key
+from chatbot.result_cache import result_cache
+from chatbot.schema_cache import schema_cache
+from chatbot.sql_guard import QueryRejected
+from config import Config
+from contextlib import nullcontext
+from db_pool import pool_manager
 import json
-from sqlalchemy import create_engine
 from dotenv import load_dotenv
-import os
 import re
-import psycopg2.pool
+import time
 import asyncio
 
 load_dotenv()
 app = FastAPI()
-client = get_bedrock_client()
-
-# 🔧 PostgreSQL connection pool
-pg_pool = psycopg2.pool.SimpleConnectionPool(
-    1, 5,
-    host=os.getenv("DB_HOST"),
-    database=os.getenv("DB_NAME"),
-    user=os.getenv("DB_USER"),
-    password=os.getenv("DB_PASS"),
-    port=os.getenv("DB_PORT", 5432)
-)
+
+# 🔧 One shared, instrumented pool (db_pool.py); the chatbot quota applies here too
+pg_pool = pool_manager.subsystem("chatbot")
 
 # 💡 Request structure
 class AskRequest(BaseModel):
     question: str
 
 
-# 💡 Get SQLAlchemy engine
-def get_sqlalchemy_engine():
-    db_url = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASS')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-    return create_engine(db_url)
+class AskBatchRequest(BaseModel):
+    questions: list[str]
+
+
+# 💡 Concurrency per stage; a single /ask is limited only by the pipeline itself
+UNLIMITED = {"generate": nullcontext(), "execute": nullcontext(), "explain": nullcontext()}
 
 
 # 💡 Extract SQL only
@@ -43,24 +42,9 @@ def extract_sql_only(text: str) -> str:
     return match.group(0).strip() if match else ""
 
 
-# 💡 Load full schema.json as string
-def load_full_schema_text(path="schema.json"):
-    with open(path, "r") as f:
-        return json.dumps(json.load(f), indent=2)
-
-
-# 🚀 Main endpoint
-@app.post("/ask")
-def ask_data(request: AskRequest):
-    user_q = request.question
-
-    # 🔹 Ensure schema.json exists (auto-generate if missing)
-    asyncio.run(get_schema_info(pg_pool))
-
-    # 🔹 Load full schema for prompt
-    full_schema_json_text = load_full_schema_text()
-
-    # 🔹 Step 1: Ask Claude to generate SQL
+# 💡 SQL-generation prompt with only the schema columns this question needs
+def build_sql_prompt(user_q, schema):
+    schema_text, _ = schema.prompt_for(user_q)
     sql_prompt = f"""
 You are an expert SQL assistant for a chatbot that answers traffic-related questions using PostgreSQL.
 
@@ -79,40 +63,82 @@ IMPORTANT RULES:
 - When referring to the column "ROAD_DEFECT", the possible values include "SHOULDER DEFECT", "WORN SURFACE", "OTHER", "UNKNOWN", "NO DEFECTS", "DEBRIS ON ROADWAY", and "RUT, HOLES".
 - When referring to the column "CRASH_TYPE", the possible values include "NO INJURY / DRIVE AWAY" and "INJURY AND / OR TOW DUE TO CRASH".
 
-== FULL DATABASE SCHEMA ==
-{full_schema_json_text}
+== DATABASE SCHEMA (relevant columns) ==
+{schema_text}
 
 Now write a valid SQL query to answer:
 "{user_q}"
 
 Only return the SQL query. No explanation.
 """
+    return sql_prompt
 
+
+# 🚀 Main endpoint
+@app.post("/ask")
+async def ask_data(request: AskRequest):
+    user_q = request.question
+    trace = Trace(user_q)
     try:
-        raw_sql = prompt_claude_v3(client, sql_prompt).strip()
-        generated_sql = extract_sql_only(raw_sql)
-        print(f"💡 Claude Raw:\n{raw_sql}")
-        print(f"✅ SQL:\n{generated_sql}")
-    except Exception as e:
-        return {"error": "Claude failed to generate SQL", "details": str(e)}
+        result = await answer_question(user_q, trace=trace)
+    except PipelineUnavailable as e:
+        # 🔹 Throttled / saturated: fail fast instead of tying up the service
+        trace.finish(path="/ask", status="busy")
+        return JSONResponse({"error": "Model temporarily unavailable", "details": str(e)}, status_code=503)
+    finish_trace(trace, "/ask", result)
+    return result
+
 
-    if not generated_sql:
-        return {"question": user_q, "answer": "Claude could not generate a valid SQL query."}
+def finish_trace(trace, path, result):
+    trace.finish(path=path, status="failed" if "error" in result else "ok",
+                 explained_by=result.get("explained_by"), sample_percent=result.get("sample_percent"))
 
-    if "limit" not in generated_sql.lower():
-        generated_sql = generated_sql.rstrip().rstrip(";") + " LIMIT 100"
 
+async def answer_question(user_q, limits=UNLIMITED, trace=None):
+    # 🔹 Schema is cached in memory (first call reads it, off the event loop)
+    schema = await asyncio.to_thread(schema_cache.get, pg_pool)
 
+    # 🔹 Step 1: Ask Claude to generate SQL (repeat questions reuse the cached SQL)
+    cache_key = question_key(user_q, schema.version)
+    generated_sql = question_cache.get(cache_key)
+    if trace is not None:
+        trace.set(sql_source="model" if generated_sql is None else "cache")
+    if generated_sql is None:
+        try:
+            async with limits["generate"]:
+                raw_sql = (await pipeline.prompt_with_retry(build_sql_prompt(user_q, schema), "generate", trace)).strip()
+            generated_sql = extract_sql_only(raw_sql)
+            print(f"💡 Claude Raw:\n{raw_sql}")
+            print(f"✅ SQL:\n{generated_sql}")
+        except PipelineUnavailable:
+            raise
+        except Exception as e:
+            return {"error": "Claude failed to generate SQL", "details": str(e)}
+
+        if not generated_sql:
+            return {"question": user_q, "answer": "Claude could not generate a valid SQL query."}
+        question_cache.set(cache_key, generated_sql)
+
+    # 🔹 Step 2: Run it through the guarded executor (cost check, timeout, read-only, preview rows only)
     try:
-        df_result = pd.read_sql(generated_sql, get_sqlalchemy_engine())
+        async with limits["execute"]:
+            df_result, _ = await pipeline.run_sql(generated_sql, trace)
         if df_result.empty:
             return {"question": user_q, "sql": generated_sql, "answer": "No matching data found in the database."}
-        result_preview = df_result.head(5).to_markdown(index=False)
+        result_preview = df_result.to_markdown(index=False)
+        sample_percent = df_result.attrs.get("sample_percent")
+    except QueryRejected as e:
+        question_cache.discard(cache_key)
+        return {"error": "Query rejected", "sql": generated_sql, "details": str(e)}
     except Exception as e:
+        question_cache.discard(cache_key)   # don't serve SQL that fails
         return {"error": "Failed to execute SQL", "sql": generated_sql, "details": str(e)}
 
-    # 🔹 Step 3: Ask Claude to explain the result
-    explanation_prompt = f"""
+    # 🔹 Step 3: Explain the result (simple shapes from a template, the rest by Claude)
+    final_answer = template_explanation(df_result)
+    explained_by = "model" if final_answer is None else "template"
+    if final_answer is None:
+        explanation_prompt = f"""
 You are a traffic analyst AI.
 
 User asked:
@@ -123,15 +149,112 @@ Here is the SQL result preview:
 
 Explain the result clearly in 2–3 sentences. Do not assume more than what the result shows.
 """
+        if sample_percent is not None:
+            explanation_prompt += (f"The query was too expensive to run in full, so this result comes from a "
+                                   f"{sample_percent:g}% random sample of the data. Say that counts and totals are approximate.\n")
 
-    try:
-        final_answer = prompt_claude_v3(client, explanation_prompt)
-    except Exception as e:
-        return {"error": "Claude failed to explain result", "details": str(e)}
+        try:
+            async with limits["explain"]:
+                final_answer = await pipeline.prompt_with_retry(explanation_prompt, "explain", trace)
+        except PipelineUnavailable:
+            raise
+        except Exception as e:
+            return {"error": "Claude failed to explain result", "details": str(e)}
 
     return {
         "question": user_q,
         "sql": generated_sql,
         "sql_result_preview": result_preview,
+        "sample_percent": sample_percent,
+        "explained_by": explained_by,
         "answer": final_answer
     }
+
+
+# 📦 Many questions at once, streamed back as NDJSON lines as each one finishes
+@app.post("/ask/batch")
+async def ask_batch(request: AskBatchRequest):
+    # 🔹 One answer per distinct question (compared the way the question cache does)
+    unique = {}
+    for index, question in enumerate(request.questions):
+        unique.setdefault(normalize_question(question), (question, []))[1].append(index)
+    if len(unique) > Config.ASK_BATCH_MAX_QUESTIONS:
+        return JSONResponse({"error": f"At most {Config.ASK_BATCH_MAX_QUESTIONS} distinct questions per batch"},
+                            status_code=413)
+    return StreamingResponse(batch_lines(list(unique.values()), len(request.questions)),
+                             media_type="application/x-ndjson")
+
+
+def batch_limits():
+    return {
+        "generate": asyncio.Semaphore(Config.ASK_BATCH_GENERATE_CONCURRENCY),
+        "execute": asyncio.Semaphore(Config.ASK_BATCH_EXECUTE_CONCURRENCY),
+        "explain": asyncio.Semaphore(Config.ASK_BATCH_EXPLAIN_CONCURRENCY),
+    }
+
+
+async def answer_patiently(user_q, limits, trace=None):
+    """answer_question, waiting out Busy (model slots taken by other callers) with backoff."""
+    for attempt in range(pipeline.retries):
+        try:
+            return await answer_question(user_q, limits, trace)
+        except Busy:
+            if attempt == pipeline.retries - 1:
+                raise
+            await asyncio.sleep(backoff_delay(attempt, pipeline.backoff, pipeline.max_backoff))
+
+
+async def batch_lines(questions, submitted):
+    """One JSON line per (question, input indexes) as it finishes, then a summary line."""
+    limits = batch_limits()
+    started = time.perf_counter()
+
+    async def answer(question, indexes):
+        trace = Trace(question)
+        try:
+            result = await answer_patiently(question, limits, trace)
+        except PipelineUnavailable as e:
+            result = {"error": "Model temporarily unavailable", "details": str(e)}
+        except Exception as e:
+            result = {"error": "Failed to answer", "details": str(e)}
+        finish_trace(trace, "/ask/batch", result)
+        return {"indexes": indexes, "question": question, **result}
+
+    tasks = [asyncio.ensure_future(answer(question, indexes)) for question, indexes in questions]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield json.dumps(await finished, default=str) + "\n"
+        yield json.dumps({"done": True, "submitted": submitted, "answered": len(tasks),
+                          "seconds": round(time.perf_counter() - started, 3)}) + "\n"
+    finally:
+        for task in tasks:   # client went away: stop the rest
+            task.cancel()
+
+
+# 📊 Shared pool usage
+@app.get("/pool-stats")
+def pool_stats():
+    return pool_manager.stats()
+
+
+# 🚦 Model concurrency, queue and circuit breaker
+@app.get("/pipeline-stats")
+def pipeline_stats():
+    return pipeline.stats()
+
+
+# 📈 Stage latencies, model calls, tokens, queue waits and caches (Prometheus text format)
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+# 🧹 Chatbot caches
+@app.get("/cache/stats")
+def cache_stats():
+    return {"questions": question_cache.stats(), "results": result_cache.stats()}
+
+
+@app.post("/cache/purge")
+def cache_purge():
+    return {"questions": question_cache.purge(), "results": result_cache.purge()}
@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from config import Config
+
+# 💡 Chatbot instrumentation
+#
+# Per-stage durations, model calls (outcome, retries, prompt/response tokens
+# as Bedrock reports them), queue waits, preview rows and cache hits are kept
+# as Prometheus-style counters and histograms in-process and rendered in the
+# text exposition format by the metrics endpoints. Each question can also
+# carry a Trace: when CHATBOT_TRACE_PATH is set, its stages are appended to
+# that file as one JSON line per request.
+
+SECONDS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+ROW_BUCKETS = (0, 1, 2, 5, 10, 100, 1000)
+
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[n]) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}   # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[n]) for n in self.labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            bucket = bisect_left(self.buckets, value)   # first bound >= value
+            if bucket < len(self.buckets):
+                series[bucket] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_label_text(self.labels, key, [('le', _number(bound))])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_number(round(series[-2], 6))}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []   # callables returning exposition lines, read at scrape time
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, buckets, labels=()):
+        metric = Histogram(name, help, buckets, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def register(self, collector):
+        self.collectors.append(collector)
+        return collector
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for collector in self.collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "chatbot_stage_seconds", "Time per answer stage (generate, execute, explain), retries and waits included.",
+    SECONDS_BUCKETS, labels=("stage",))
+MODEL_CALL_SECONDS = registry.histogram(
+    "chatbot_model_call_seconds", "Time per Bedrock call attempt.", SECONDS_BUCKETS, labels=("stage", "outcome"))
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "chatbot_queue_wait_seconds", "Time spent waiting for a model slot.", SECONDS_BUCKETS)
+MODEL_RETRIES = registry.counter(
+    "chatbot_model_retries_total", "Bedrock calls retried after a failure.", labels=("stage", "reason"))
+TOKENS = registry.histogram(
+    "chatbot_tokens", "Prompt (input) and response (output) tokens per model call.", TOKEN_BUCKETS,
+    labels=("stage", "direction"))
+SQL_ROWS = registry.histogram("chatbot_sql_rows", "Preview rows returned per query.", ROW_BUCKETS)
+SQL_RESULTS = registry.counter(
+    "chatbot_sql_results_total", "Queries answered, by where the preview came from.", labels=("source",))
+
+
+def cache_collector(name, cache):
+    """Exposition lines for an LRUCache's counters, read when metrics are scraped."""
+    def collect():
+        stats = cache.stats()
+        lines = []
+        for key in ("hits", "misses", "evictions", "expirations"):
+            metric = f"chatbot_{name}_cache_{key}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {stats[key]}"]
+        lines += [f"# TYPE chatbot_{name}_cache_entries gauge", f"chatbot_{name}_cache_entries {len(cache)}"]
+        return lines
+    return collect
+
+
+def record_model_call(stage, seconds, outcome, usage, trace=None):
+    MODEL_CALL_SECONDS.observe(seconds, stage=stage, outcome=outcome)
+    tokens = {"input": (usage or {}).get("input_tokens"), "output": (usage or {}).get("output_tokens")}
+    for direction, count in tokens.items():
+        if count is not None:
+            TOKENS.observe(count, stage=stage, direction=direction)
+    if trace is not None:
+        trace.span("model_call", seconds, stage=stage, outcome=outcome,
+                   input_tokens=tokens["input"], output_tokens=tokens["output"])
+
+
+class Trace:
+    """One question's stages, written as a JSON line to CHATBOT_TRACE_PATH when it finishes."""
+
+    _write_lock = threading.Lock()
+
+    def __init__(self, question, path=None):
+        self.question = question
+        self.path = path if path is not None else Config.CHATBOT_TRACE_PATH
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.spans = []
+        self.fields = {}
+
+    def span(self, name, seconds, **attrs):
+        self.spans.append({"name": name, "ms": round(1000 * seconds, 1),
+                           **{k: v for k, v in attrs.items() if v is not None}})
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def record(self):
+        return {
+            "ts": self.started_at,
+            "question": self.question,
+            "ms": round(1000 * (time.perf_counter() - self._started), 1),
+            **self.fields,
+            "spans": self.spans,
+        }
+
+    def finish(self, **fields):
+        self.set(**fields)
+        if not self.path:
+            return
+        line = json.dumps(self.record(), default=str)
+        with self._write_lock, open(self.path, "a") as f:
+            f.write(line + "\n")
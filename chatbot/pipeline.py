@@ -0,0 +1,373 @@
+import asyncio
+import random
+import threading
+import time
+from botocore.exceptions import ClientError
+from config import Config
+from chatbot.bedrock_client import get_model_client
+from chatbot.claude_utils import invoke_claude_v3, stream_claude_v3
+from chatbot.metrics import (MODEL_RETRIES, QUEUE_WAIT_SECONDS, SQL_RESULTS, SQL_ROWS, STAGE_SECONDS,
+                             record_model_call, registry)
+from chatbot.result_cache import PREVIEW_ROWS, fetch_preview
+from db_pool import pool_manager
+
+# 💡 Async chatbot pipeline
+#
+# Bedrock calls and SQL execution run in worker threads (asyncio.to_thread),
+# so waiting on them never blocks the event loop. At most
+# CHATBOT_MAX_CONCURRENCY model calls are in flight per process; a caller
+# that cannot get a slot within CHATBOT_QUEUE_TIMEOUT fails fast with Busy.
+# Throttled or failed calls are retried with full-jitter exponential backoff
+# outside the slot, and CHATBOT_BREAKER_FAILURES failures in a row open a
+# circuit breaker that rejects calls immediately for CHATBOT_BREAKER_COOLDOWN
+# seconds. The FastAPI service awaits the pipeline directly. Flask views hand
+# their coroutine to one background event loop with run_sync(), or iterate
+# a streaming answer with iter_sync(). Every stage, model call and query is
+# recorded in chatbot.metrics and, when the caller passes one, its Trace. The
+# model client (CHATBOT_MODEL_BACKEND, see bedrock_client.py) is created on
+# first use, not at import.
+
+
+class PipelineUnavailable(Exception):
+    """The model can't take the call right now; the caller should back off."""
+
+
+class Busy(PipelineUnavailable):
+    pass
+
+
+class CircuitOpen(PipelineUnavailable):
+    pass
+
+
+def is_throttling(error):
+    return isinstance(error, ClientError) and \
+        error.response.get("Error", {}).get("Code") == "ThrottlingException"
+
+
+def backoff_delay(attempt, base, cap):
+    """Full jitter: uniform between 0 and the capped exponential delay."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class _Retry:
+    """Marker a streaming attempt yields before it is retried."""
+
+
+class CircuitBreaker:
+    def __init__(self, failures, cooldown):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self.consecutive = 0
+        self.opened_at = None
+        self.trips = 0
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self.opened_at < self.cooldown else "half-open"
+
+    def allow(self):
+        """Closed: yes. Open: no. Half-open (cooldown over): yes, the next result decides."""
+        with self._lock:
+            return self.state != "open"
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive += 1
+            if self.state == "half-open" or self.consecutive >= self.failures:
+                if self.state != "open":
+                    self.trips += 1
+                self.opened_at = time.monotonic()
+
+
+class ChatPipeline:
+    def __init__(self, client, concurrency, queue_timeout, retries, backoff, max_backoff, breaker,
+                 client_factory=None):
+        self._client = client
+        self.client_factory = client_factory
+        self._client_lock = threading.Lock()
+        self.concurrency = concurrency
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker
+        self._semaphores = {}   # event loop -> asyncio.Semaphore
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+
+    @property
+    def client(self):
+        """The model client, created on first use so importing the pipeline needs no credentials."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self.client_factory()
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return self._semaphores[loop]
+
+    async def _call_model(self, prompt, stage, trace):
+        semaphore = await self._acquire()
+        started = time.perf_counter()
+        outcome, usage = "ok", None
+        try:
+            text, usage = await asyncio.to_thread(invoke_claude_v3, self.client, prompt)
+            return text
+        except Exception as e:
+            outcome = "throttled" if is_throttling(e) else "error"
+            raise
+        finally:
+            self._release(semaphore)
+            record_model_call(stage, time.perf_counter() - started, outcome, usage, trace)
+
+    async def _acquire(self):
+        semaphore = self._semaphore()
+        self.queued += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Busy(f"no model slot free within {self.queue_timeout}s")
+        finally:
+            self.queued -= 1
+            QUEUE_WAIT_SECONDS.observe(time.perf_counter() - started)
+        self.in_flight += 1
+        return semaphore
+
+    def _release(self, semaphore):
+        self.in_flight -= 1
+        semaphore.release()
+
+    async def _stream_model(self, prompt, stage, trace):
+        """Reply chunks from the streaming API; a worker thread feeds them through a queue."""
+        semaphore = await self._acquire()
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop = threading.Event()
+        started = time.perf_counter()
+        outcome, usage = "ok", {}
+
+        def produce():
+            try:
+                for text in stream_claude_v3(self.client, prompt, usage):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, ("chunk", text))
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, ("error", e))
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, ("done", None))
+
+        producer = asyncio.ensure_future(asyncio.to_thread(produce))
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == "chunk":
+                    yield value
+                elif kind == "error":
+                    outcome = "throttled" if is_throttling(value) else "error"
+                    raise value
+                else:
+                    break
+        finally:
+            stop.set()   # the consumer may have gone away mid-stream
+            self._release(semaphore)
+            producer.cancel()
+            record_model_call(stage, time.perf_counter() - started, outcome, usage, trace)
+
+    async def stream_with_retry(self, prompt, stage="model", trace=None):
+        """
+        Async iterator over the reply text as it is generated. Failures before
+        the first chunk are retried like prompt_with_retry; after that the
+        error is raised, since part of the reply has already been sent.
+        """
+        started = time.perf_counter()
+        retries = 0
+        try:
+            async for text in self._stream_attempts(prompt, stage, trace):
+                if isinstance(text, _Retry):
+                    retries += 1
+                    continue
+                yield text
+        finally:
+            self._record_stage(stage, started, retries, trace)
+
+    async def _stream_attempts(self, prompt, stage, trace):
+        for attempt in range(self.retries):
+            if not self.breaker.allow():
+                self.rejected += 1
+                raise CircuitOpen(f"model calls paused for up to {self.breaker.cooldown}s after repeated failures")
+            started = False
+            try:
+                async for text in self._stream_model(prompt, stage, trace):
+                    started = True
+                    yield text
+            except PipelineUnavailable:
+                raise
+            except Exception as e:
+                self.breaker.record_failure()
+                if started or attempt == self.retries - 1:
+                    raise
+                yield _Retry()
+                await self._wait_to_retry(attempt, e, stage)
+            else:
+                self.breaker.record_success()
+                return
+
+    async def prompt_with_retry(self, prompt, stage="model", trace=None):
+        """Model reply for prompt; retries throttling and errors with jittered backoff."""
+        started = time.perf_counter()
+        attempt = 0
+        try:
+            for attempt in range(self.retries):
+                if not self.breaker.allow():
+                    self.rejected += 1
+                    raise CircuitOpen(f"model calls paused for up to {self.breaker.cooldown}s after repeated failures")
+                try:
+                    reply = await self._call_model(prompt, stage, trace)
+                except PipelineUnavailable:
+                    raise
+                except Exception as e:
+                    self.breaker.record_failure()
+                    if attempt == self.retries - 1:
+                        raise
+                    await self._wait_to_retry(attempt, e, stage)
+                else:
+                    self.breaker.record_success()
+                    return reply
+        finally:
+            self._record_stage(stage, started, attempt, trace)
+
+    async def _wait_to_retry(self, attempt, error, stage):
+        throttled = is_throttling(error)
+        MODEL_RETRIES.inc(stage=stage, reason="throttled" if throttled else "error")
+        wait_time = backoff_delay(attempt, self.backoff, self.max_backoff)
+        reason = "Throttled by Bedrock" if throttled else f"Error {error}"
+        print(f"⏳ {reason}, retrying in {wait_time:.1f}s...")
+        await asyncio.sleep(wait_time)
+
+    def _record_stage(self, stage, started, retries, trace):
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        if trace is not None:
+            trace.span(stage, seconds, retries=retries)
+
+    async def run_sql(self, sql, trace=None, rows=PREVIEW_ROWS):
+        """(preview DataFrame of up to `rows` rows, served-from-cache flag) from the shared pool, off the event loop."""
+        def run():
+            with pool_manager.connection("chatbot") as conn:
+                return fetch_preview(conn, sql, rows)
+        started = time.perf_counter()
+        try:
+            frame, cached = await asyncio.to_thread(run)
+        finally:
+            seconds = time.perf_counter() - started
+            STAGE_SECONDS.observe(seconds, stage="execute")
+        SQL_ROWS.observe(len(frame))
+        SQL_RESULTS.inc(source="cache" if cached else "database")
+        if trace is not None:
+            trace.span("execute", seconds, rows=len(frame), cached=cached,
+                       sample_percent=frame.attrs.get("sample_percent"))
+        return frame, cached
+
+    def collect_metrics(self):
+        """Live pipeline gauges in the metrics exposition format."""
+        lines = []
+        for name, kind, value in (("in_flight", "gauge", self.in_flight), ("queued", "gauge", self.queued),
+                                  ("rejected_total", "counter", self.rejected),
+                                  ("breaker_trips_total", "counter", self.breaker.trips)):
+            lines += [f"# TYPE chatbot_pipeline_{name} {kind}", f"chatbot_pipeline_{name} {value}"]
+        return lines
+
+    def stats(self):
+        stats = {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "breaker": {
+                "state": self.breaker.state,
+                "consecutive_failures": self.breaker.consecutive,
+                "trips": self.breaker.trips,
+            },
+        }
+        if hasattr(self._client, "stats"):   # the fake backend counts its calls
+            stats["model_client"] = self._client.stats()
+        return stats
+
+
+# --- one background event loop for synchronous (Flask) callers ---
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop():
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="chatbot-pipeline", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run_sync(coro, timeout=None):
+    """Run coro on the shared background loop and wait up to timeout seconds for it."""
+    future = asyncio.run_coroutine_threadsafe(coro, _background_loop())
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        future.cancel()
+        raise
+
+
+def iter_sync(agen, timeout=None):
+    """Iterate an async generator on the background loop from synchronous code."""
+    loop = _background_loop()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            future = asyncio.run_coroutine_threadsafe(agen.__anext__(), loop)
+            try:
+                yield future.result(remaining)
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                future.cancel()
+                raise
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop)
+
+
+pipeline = ChatPipeline(
+    client=None,
+    client_factory=get_model_client,
+    concurrency=Config.CHATBOT_MAX_CONCURRENCY,
+    queue_timeout=Config.CHATBOT_QUEUE_TIMEOUT,
+    retries=Config.CHATBOT_RETRIES,
+    backoff=Config.CHATBOT_BACKOFF,
+    max_backoff=Config.CHATBOT_MAX_BACKOFF,
+    breaker=CircuitBreaker(Config.CHATBOT_BREAKER_FAILURES, Config.CHATBOT_BREAKER_COOLDOWN),
+)
+registry.register(pipeline.collect_metrics)
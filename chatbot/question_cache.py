@@ -0,0 +1,42 @@
+import re
+from config import Config
+from chatbot.lru_cache import LRUCache
+from chatbot.metrics import cache_collector, registry
+
+# 💡 Generated SQL per normalized question
+#
+# Repeat questions reuse the SQL generated the first time and skip the LLM.
+# Questions are compared after lower-casing, dropping punctuation and
+# collapsing whitespace, with number words and month abbreviations spelled
+# one way ("top ten in Sept." == "Top 10 in september"). The schema version
+# is part of the key, so a schema change never serves stale SQL.
+
+NUMBER_WORDS = {
+    "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6",
+    "seven": "7", "eight": "8", "nine": "9", "ten": "10", "eleven": "11",
+    "twelve": "12", "fifteen": "15", "twenty": "20", "fifty": "50", "hundred": "100",
+}
+
+MONTHS = {
+    "jan": "january", "feb": "february", "mar": "march", "apr": "april",
+    "jun": "june", "jul": "july", "aug": "august", "sep": "september",
+    "sept": "september", "oct": "october", "nov": "november", "dec": "december",
+}
+
+FILLER_WORDS = {"please", "pls", "kindly"}
+
+
+def normalize_question(question):
+    text = str(question).lower()
+    text = re.sub(r"(?<=\d),(?=\d{3}\b)", "", text)          # 1,000 -> 1000
+    words = re.findall(r"\d+(?:\.\d+)?|[a-z]+", text)        # punctuation dropped
+    words = [NUMBER_WORDS.get(w) or MONTHS.get(w) or w for w in words if w not in FILLER_WORDS]
+    return " ".join(words)
+
+
+def question_key(question, schema_version):
+    return (schema_version, normalize_question(question))
+
+
+question_cache = LRUCache(Config.QUESTION_CACHE_SIZE, Config.QUESTION_CACHE_TTL)
+registry.register(cache_collector("question", question_cache))
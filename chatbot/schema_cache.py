@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from chatbot.db_utils import load_schema_info
+
+# 💡 Schema kept in memory for the life of the process
+#
+# schema.json (or information_schema when the file is missing) is read once
+# and parsed into tables/columns. Each question then gets a compact schema
+# listing only the columns it plausibly needs, matched on column-name words,
+# a synonym table and, optionally, the categorical values each column holds.
+# The cache only changes on invalidate(), e.g. after a migration.
+
+SCHEMA_PATH = "schema.json"
+
+# Accounts and the dashboard's own rollup tables are never prompt material
+EXCLUDED_TABLES = {"users", "crash_rollup", "crash_rollup_state", "crash_offense_rollup"}
+
+# Columns every selection keeps: the row key and the date most questions filter on
+ALWAYS_COLUMNS = ("CRASH_RECORD_ID", "CRASH_DATE")
+
+# Words too common in crash questions (or column names) to say anything
+IGNORED_WORDS = {
+    "crash", "crashes", "accident", "accidents", "traffic", "chicago", "type", "cnt",
+    "num", "the", "and", "for", "with", "what", "which", "how", "many", "much", "most",
+    "top", "show", "list", "give", "are", "was", "were", "there", "have", "has", "all",
+    "count", "number", "total", "per", "from", "that", "this", "than", "more", "less",
+}
+
+TIME_COLUMNS = ("CRASH_DATE", "CRASH_MONTH", "CRASH_HOUR", "CRASH_DAY_OF_WEEK")
+INJURY_COLUMNS = ("MOST_SEVERE_INJURY", "INJURIES_TOTAL", "INJURIES_FATAL", "INJURIES_INCAPACITATING")
+CAUSE_COLUMNS = ("PRIM_CONTRIBUTORY_CAUSE", "SEC_CONTRIBUTORY_CAUSE")
+STREET_COLUMNS = ("STREET_NAME", "STREET_DIRECTION", "STREET_NO")
+
+# Question words -> columns they point at (matched on the first 5 letters)
+SYNONYMS = {
+    **dict.fromkeys(("when", "year", "month", "date", "time", "day", "week", "weekday",
+                     "weekend", "hour", "morning", "afternoon", "evening",
+                     "season", "trend", "daily", "monthly", "yearly"), TIME_COLUMNS),
+    **dict.fromkeys(("why", "cause", "reason", "factor", "speeding", "distracted",
+                     "drunk", "alcohol", "phone"), CAUSE_COLUMNS),
+    **dict.fromkeys(("injury", "injured", "hurt", "fatal", "fatality", "killed",
+                     "death", "deadly", "severe", "severity", "serious"), INJURY_COLUMNS),
+    **dict.fromkeys(("street", "avenue", "road", "where", "location", "address",
+                     "intersection"), STREET_COLUMNS),
+    **dict.fromkeys(("weather", "rain", "snow", "fog", "sleet", "hail", "wind",
+                     "cloudy", "clear"), ("WEATHER_CONDITION",)),
+    **dict.fromkeys(("dark", "daylight", "dawn", "dusk", "lit", "lighting"), ("LIGHTING_CONDITION",)),
+    "night": TIME_COLUMNS + ("LIGHTING_CONDITION",),
+    **dict.fromkeys(("surface", "wet", "dry", "icy", "ice", "slippery"), ("ROADWAY_SURFACE_COND",)),
+    **dict.fromkeys(("hit", "run", "fled", "flee"), ("HIT_AND_RUN_I",)),
+    **dict.fromkeys(("beat", "police", "district", "area"), ("BEAT_OF_OCCURRENCE",)),
+    **dict.fromkeys(("speed", "mph", "fast"), ("POSTED_SPEED_LIMIT",)),
+    **dict.fromkeys(("signal", "sign", "stop", "control", "device"), ("TRAFFIC_CONTROL_DEVICE", "DEVICE_CONDITION")),
+    **dict.fromkeys(("pedestrian", "cyclist", "bike", "bicycle", "collision", "sideswipe",
+                     "rear", "head", "turning", "angle"), ("FIRST_CRASH_TYPE",)),
+    **dict.fromkeys(("damage", "cost", "expensive"), ("DAMAGE",)),
+    **dict.fromkeys(("map", "coordinates", "latitude", "longitude", "near"), ("LATITUDE", "LONGITUDE")),
+    **dict.fromkeys(("vehicles", "cars", "units"), ("NUM_UNITS",)),
+    **dict.fromkeys(("construction", "work", "zone"), ("WORK_ZONE_I", "WORK_ZONE_TYPE")),
+    **dict.fromkeys(("pothole", "defect"), ("ROAD_DEFECT",)),
+    **dict.fromkeys(("curve", "hill", "grade"), ("ALIGNMENT",)),
+    **dict.fromkeys(("tow", "towed"), ("CRASH_TYPE",)),
+    **dict.fromkeys(("door", "dooring"), ("DOORING_I",)),
+}
+
+STEM = 5   # words match on their first STEM letters (plural "s" dropped)
+
+
+def _stem(word):
+    if len(word) > 3 and word.endswith("s"):
+        word = word[:-1]
+    return word[:STEM]
+
+
+def _words(text):
+    return [w for w in re.findall(r"[a-z0-9]+", str(text).lower()) if len(w) > 1]
+
+
+_SYNONYM_INDEX = {}
+for _word, _columns in SYNONYMS.items():
+    _SYNONYM_INDEX.setdefault(_stem(_word), set()).update(_columns)
+
+
+class Schema:
+    def __init__(self, rows):
+        """rows: the information_schema records stored in schema.json"""
+        self.tables = {}   # table -> {column: {"type", "keys", "references"}}
+        for row in rows:
+            if row.get("table_name") in EXCLUDED_TABLES:
+                continue
+            columns = self.tables.setdefault(row["table_name"], {})
+            column = columns.setdefault(row["column_name"], {
+                "type": row.get("data_type"), "keys": [], "references": None,
+            })
+            if row.get("constraint_type") and row["constraint_type"] not in column["keys"]:
+                column["keys"].append(row["constraint_type"])
+            if row.get("referenced_table"):
+                column["references"] = f'{row["referenced_table"]}.{row["referenced_column"]}'
+
+        canonical = json.dumps(rows, sort_keys=True, default=str)
+        self.version = hashlib.sha1(canonical.encode()).hexdigest()[:12]
+
+        # stemmed column-name words -> (table, column)
+        self._name_index = {}
+        for table, columns in self.tables.items():
+            for column in columns:
+                for word in _words(column.replace("_", " ")):
+                    if word not in IGNORED_WORDS and len(word) > 2:
+                        self._name_index.setdefault(_stem(word), []).append((table, column))
+
+    def relevant_columns(self, question, vocabularies=None):
+        """
+        {table: [columns]} the question plausibly needs, in schema order.
+        vocabularies: optional {column: [values]} so that e.g. "snow" finds
+        the column holding "SNOW". Every column is returned when nothing matches.
+        """
+        value_index = {}
+        for column, values in (vocabularies or {}).items():
+            for value in values:
+                for word in _words(value):
+                    if word not in IGNORED_WORDS and len(word) > 2:
+                        value_index.setdefault(_stem(word), set()).add(column)
+
+        wanted = set()
+        for word in _words(question):
+            if word in IGNORED_WORDS:
+                continue
+            stem = _stem(word)
+            wanted.update(c for _, c in self._name_index.get(stem, ()))
+            wanted.update(_SYNONYM_INDEX.get(stem, ()))
+            wanted.update(value_index.get(stem, ()))
+
+        selection = {}
+        for table, columns in self.tables.items():
+            hits = [c for c in columns if c in wanted]
+            if hits:
+                selection[table] = [c for c in columns if c in wanted or c in ALWAYS_COLUMNS or columns[c]["keys"]]
+        return selection or {table: list(columns) for table, columns in self.tables.items()}
+
+    def render(self, selection=None):
+        """Compact schema text: one line per column, keys and references inline."""
+        selection = selection or {table: list(columns) for table, columns in self.tables.items()}
+        lines = []
+        for table, names in selection.items():
+            lines.append(f"TABLE {table}")
+            for name in names:
+                column = self.tables[table][name]
+                line = f'  "{name}" {column["type"]}'
+                if column["keys"]:
+                    line += " " + ", ".join(column["keys"])
+                if column["references"]:
+                    line += f' REFERENCES {column["references"]}'
+                lines.append(line)
+        return "\n".join(lines)
+
+    def prompt_for(self, question, vocabularies=None):
+        """(schema text, selected column names) for one question."""
+        selection = self.relevant_columns(question, vocabularies)
+        columns = {name for names in selection.values() for name in names}
+        return self.render(selection), columns
+
+
+class SchemaCache:
+    def __init__(self, path=SCHEMA_PATH):
+        self.path = path
+        self._schema = None
+        self._lock = threading.Lock()
+
+    def get(self, pool):
+        """Parsed schema, read from schema.json (or the database via pool) only once."""
+        if self._schema is None:
+            with self._lock:
+                if self._schema is None:
+                    self._schema = Schema(load_schema_info(pool, self.path))
+        return self._schema
+
+    def invalidate(self, refresh=False):
+        """Forget the cached schema; refresh=True also regenerates schema.json from the database."""
+        with self._lock:
+            self._schema = None
+            if refresh and os.path.exists(self.path):
+                os.remove(self.path)
+
+
+schema_cache = SchemaCache()
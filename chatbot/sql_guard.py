@@ -0,0 +1,201 @@
+import logging
+import re
+from contextlib import contextmanager
+import pandas as pd
+from sqlalchemy.exc import DBAPIError
+from config import Config
+
+# 💡 Guarded execution of generated SQL
+#
+# Model-written SQL runs against the production database, so before it runs:
+# it must be one SELECT (or WITH) statement; the planner's cost for fetching
+# the preview rows is estimated with EXPLAIN, and queries costing more than
+# CHATBOT_SQL_APPROXIMATE_COST run on a TABLESAMPLE of their tables instead
+# (the preview is marked approximate), while those still costing more than
+# CHATBOT_SQL_REJECT_COST are refused. What does run is in a READ ONLY
+# transaction with a statement_timeout, through a server-side cursor that
+# fetches only the preview rows. Rejections and timeouts are logged with the SQL.
+
+logger = logging.getLogger(__name__)
+
+SQL_TOKENS = re.compile(
+    r"'(?:[^']|'')*'"          # string literal
+    r'|"(?:[^"]|"")*"'         # quoted identifier
+    r"|--[^\n]*|/\*.*?\*/"     # comments
+    r"|\w+|[^\s\w]",
+    re.DOTALL,
+)
+
+# Words that can follow a table name but are never its alias
+NOT_ALIASES = {
+    "where", "join", "inner", "left", "right", "full", "cross", "natural", "on",
+    "using", "group", "order", "limit", "offset", "having", "union", "intersect",
+    "except", "window", "fetch", "for", "tablesample", "lateral",
+}
+
+QUERY_CANCELED = "57014"   # SQLSTATE raised when statement_timeout fires
+
+
+class QueryRejected(Exception):
+    """Generated SQL the guard won't run (not a single SELECT, or too expensive)."""
+
+
+class QueryTooExpensive(QueryRejected):
+    pass
+
+
+class QueryTimeout(QueryTooExpensive):
+    pass
+
+
+def sql_tokens(sql):
+    """[(start, end, token)] for sql, comments dropped."""
+    return [(m.start(), m.end(), m.group()) for m in SQL_TOKENS.finditer(sql)
+            if not m.group().startswith(("--", "/*"))]
+
+
+def _words(tokens):
+    return [t if t[0] in "'\"" else t.lower() for _, _, t in tokens]
+
+
+def table_reference_starts(words):
+    """
+    Indexes of the FROM and JOIN words that introduce a table reference: at
+    the top level or directly inside a subquery, not inside a function call
+    (EXTRACT(YEAR FROM ...), SUBSTRING(... FROM ...), TRIM(... FROM ...))
+    and not the FROM of IS [NOT] DISTINCT FROM.
+    """
+    starts = []
+    query_parens = []   # per open paren: does a subquery start inside it?
+    for i, word in enumerate(words):
+        if word == "(":
+            query_parens.append(i + 1 < len(words) and words[i + 1] in ("select", "with"))
+        elif word == ")":
+            if query_parens:
+                query_parens.pop()
+        elif word in ("from", "join") and (not query_parens or query_parens[-1]):
+            if word == "from" and i > 0 and words[i - 1] == "distinct":
+                continue
+            starts.append(i)
+    return starts
+
+
+def check_statement(sql):
+    """Raise QueryRejected unless sql is a single SELECT or WITH statement."""
+    words = _words(sql_tokens(sql))
+    while words and words[-1] == ";":
+        words.pop()
+    if not words or words[0] not in ("select", "with"):
+        reject(sql, "only SELECT queries can be run")
+    if ";" in words:
+        reject(sql, "only a single statement can be run")
+
+
+def reject(sql, reason, error=QueryRejected):
+    logger.warning("Rejected generated SQL (%s): %s", reason, sql)
+    raise error(reason)
+
+
+def _driver_sql(sql):
+    # exec_driver_sql hands the driver a parameter mapping, so literal % must be doubled
+    return sql.replace("%", "%%")
+
+
+def preview_cost(conn, sql, rows):
+    """
+    Planner estimate for fetching the first `rows` rows: the startup cost plus
+    that share of the run cost (as the planner costs a LIMIT). Sorts and
+    aggregates must read all their input first, so they cost nearly the total.
+    """
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + _driver_sql(sql)).scalar()[0]["Plan"]
+    startup, total = plan["Startup Cost"], plan["Total Cost"]
+    fraction = min(1.0, rows / plan["Plan Rows"]) if plan["Plan Rows"] else 1.0
+    return startup + (total - startup) * fraction
+
+
+def sampled_sql(sql, percent):
+    """
+    sql with TABLESAMPLE SYSTEM (percent) after each table read directly in a
+    FROM or JOIN (not subqueries, functions or CTE names); None when there is
+    no such table. Comma-separated FROM lists only sample their first table.
+    """
+    tokens = sql_tokens(sql)
+    words = _words(tokens)
+    ctes = {words[i - 1] for i in range(2, len(words) - 1)
+            if words[i] == "as" and words[i + 1] == "(" and words[i - 2] in ("with", "recursive", ",")}
+
+    inserts = []
+    for i in table_reference_starts(words):
+        if i + 1 >= len(words) or words[i + 1] in ("(", "lateral", "only"):
+            continue
+        j = i + 1
+        while j + 2 < len(words) and words[j + 1] == ".":
+            j += 2
+        if words[j] in ctes or (j + 1 < len(words) and words[j + 1] == "("):
+            continue
+        end = j
+        k = j + 2 if j + 1 < len(words) and words[j + 1] == "as" else j + 1
+        if k < len(words) and re.fullmatch(r'[a-z_]\w*|"(?:[^"]|"")*"', words[k]) and words[k] not in NOT_ALIASES:
+            end = k
+        if end + 1 < len(words) and words[end + 1] == "tablesample":
+            continue
+        inserts.append(tokens[end][1])
+
+    if not inserts:
+        return None
+    for offset in reversed(inserts):
+        sql = f"{sql[:offset]} TABLESAMPLE SYSTEM ({percent:g}){sql[offset:]}"
+    return sql
+
+
+@contextmanager
+def read_only(conn, timeout=None):
+    """Transaction on conn that can't write and cancels statements after timeout seconds."""
+    timeout = Config.CHATBOT_SQL_TIMEOUT if timeout is None else timeout
+    with conn.begin():
+        conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout * 1000)}")
+        yield conn
+
+
+def guarded_preview(conn, sql, rows):
+    """
+    First `rows` rows of sql as a DataFrame, within a read_only() transaction.
+    A preview computed on a sample has attrs["sample_percent"] set.
+    """
+    check_statement(sql)
+    sql = sql.strip().rstrip(";")
+    cost = preview_cost(conn, sql, rows)
+    percent = None
+    if cost > Config.CHATBOT_SQL_APPROXIMATE_COST:
+        sampled = sampled_sql(sql, Config.CHATBOT_SQL_SAMPLE_PERCENT)
+        sampled_cost = None
+        if sampled is not None:
+            try:
+                # a savepoint, so a sampled query Postgres can't plan leaves the transaction usable
+                with conn.begin_nested():
+                    sampled_cost = preview_cost(conn, sampled, rows)
+            except DBAPIError as e:
+                logger.warning("Couldn't plan the sampled SQL, judging the original (%s): %s", e.orig, sampled)
+        if sampled_cost is not None and sampled_cost <= Config.CHATBOT_SQL_REJECT_COST:
+            logger.info("Approximating generated SQL (cost %.0f) on a %g%% sample: %s",
+                        cost, Config.CHATBOT_SQL_SAMPLE_PERCENT, sql)
+            sql, cost, percent = sampled, sampled_cost, Config.CHATBOT_SQL_SAMPLE_PERCENT
+    if cost > Config.CHATBOT_SQL_REJECT_COST:
+        reject(sql, f"estimated cost {cost:.0f} is over the limit of {Config.CHATBOT_SQL_REJECT_COST:.0f}",
+               QueryTooExpensive)
+
+    try:
+        # per statement: Connection.execution_options() would change conn for what runs after
+        result = conn.exec_driver_sql(_driver_sql(sql),
+                                      execution_options={"stream_results": True, "max_row_buffer": rows})
+        frame = pd.DataFrame(result.fetchmany(rows), columns=list(result.keys()))
+        result.close()
+    except Exception as e:
+        if getattr(getattr(e, "orig", None), "pgcode", None) == QUERY_CANCELED:
+            logger.warning("Generated SQL timed out: %s", sql)
+            raise QueryTimeout("the query took too long to run") from e
+        raise
+    if percent is not None:
+        frame.attrs["sample_percent"] = percent
+    return frame
@@ -7,5 +7,102 @@ load_dotenv()
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URI')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # One pool per process, shared by the dashboards and the chatbot (see db_pool.py)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', 5)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
+
+    # Most connections a subsystem may hold at once, so it can't starve the dashboards
+    DB_POOL_QUOTAS = {
+        'chatbot': int(os.getenv('CHATBOT_POOL_QUOTA', 3)),
+    }
     SECRET_KEY = os.getenv('AUTH_KEY', 'fallback-secret-key')
-    PERMANENT_SESSION_LIFETIME = 300  # 5 minutes (in seconds)
\ No newline at end of file
+    PERMANENT_SESSION_LIFETIME = 300  # 5 minutes (in seconds)
+
+    # Seconds a rollup rebuilt without incremental triggers is trusted for
+    ROLLUP_MAX_AGE = int(os.getenv('ROLLUP_MAX_AGE', 900))
+
+    # Seconds before the in-memory street typeahead index is rebuilt
+    STREET_INDEX_TTL = int(os.getenv('STREET_INDEX_TTL', 600))
+
+    # Seconds before the in-memory spatial (radius / bbox) index is rebuilt
+    SPATIAL_INDEX_TTL = int(os.getenv('SPATIAL_INDEX_TTL', 600))
+
+    # Seconds the single-pass /impact aggregates are reused across requests
+    IMPACT_STATS_TTL = int(os.getenv('IMPACT_STATS_TTL', 60))
+
+    # Optional in-memory columnar cube serving the environment/impact/offense charts
+    CRASH_CUBE_ENABLED = os.getenv('CRASH_CUBE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    CRASH_CUBE_TTL = int(os.getenv('CRASH_CUBE_TTL', 3600))
+    CRASH_CUBE_CHECK_INTERVAL = int(os.getenv('CRASH_CUBE_CHECK_INTERVAL', 30))
+
+    # Environment heatmap density grids, cached per filter combination
+    HEATMAP_CACHE_TTL = int(os.getenv('HEATMAP_CACHE_TTL', 600))
+    HEATMAP_CACHE_SIZE = int(os.getenv('HEATMAP_CACHE_SIZE', 64))
+
+    # Seconds the distinct-value catalog behind every filter dropdown is kept
+    DIMENSION_CATALOG_TTL = int(os.getenv('DIMENSION_CATALOG_TTL', 3600))
+
+    # Hit-and-run map cluster indexes, one per offense filter set
+    HIT_AND_RUN_CLUSTER_TTL = int(os.getenv('HIT_AND_RUN_CLUSTER_TTL', 600))
+    HIT_AND_RUN_CLUSTER_CACHE_SIZE = int(os.getenv('HIT_AND_RUN_CLUSTER_CACHE_SIZE', 32))
+
+    # Beat polygon GeoJSON (defaults to app/static/data/beat_polygons.geojson)
+    BEAT_POLYGONS_PATH = os.getenv('BEAT_POLYGONS_PATH')
+
+    # Threads running dashboard bootstrap panels concurrently (each holds a DB connection)
+    BOOTSTRAP_WORKERS = int(os.getenv('BOOTSTRAP_WORKERS', 4))
+
+    # Chatbot SQL reused for repeat questions (normalized question + schema version)
+    QUESTION_CACHE_SIZE = int(os.getenv('QUESTION_CACHE_SIZE', 1000))
+    QUESTION_CACHE_TTL = int(os.getenv('QUESTION_CACHE_TTL', 86400))
+
+    # Chatbot result previews reused per canonical SQL while the data is unchanged
+    RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', 500))
+    RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', 3600))
+    RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+
+    # Chatbot pipeline: concurrent model calls per process, seconds a question may
+    # queue for one, retries with jittered backoff and the circuit breaker
+    CHATBOT_MAX_CONCURRENCY = int(os.getenv('CHATBOT_MAX_CONCURRENCY', 4))
+    CHATBOT_QUEUE_TIMEOUT = float(os.getenv('CHATBOT_QUEUE_TIMEOUT', 10))
+    CHATBOT_RETRIES = int(os.getenv('CHATBOT_RETRIES', 3))
+    CHATBOT_BACKOFF = float(os.getenv('CHATBOT_BACKOFF', 1))
+    CHATBOT_MAX_BACKOFF = float(os.getenv('CHATBOT_MAX_BACKOFF', 8))
+    CHATBOT_BREAKER_FAILURES = int(os.getenv('CHATBOT_BREAKER_FAILURES', 5))
+    CHATBOT_BREAKER_COOLDOWN = float(os.getenv('CHATBOT_BREAKER_COOLDOWN', 30))
+    CHATBOT_REQUEST_TIMEOUT = float(os.getenv('CHATBOT_REQUEST_TIMEOUT', 60))
+
+    # Generated SQL guardrails: statement timeout in seconds, planner cost (for the
+    # preview rows) above which queries run on a TABLESAMPLE or are rejected
+    CHATBOT_SQL_TIMEOUT = float(os.getenv('CHATBOT_SQL_TIMEOUT', 15))
+    CHATBOT_SQL_APPROXIMATE_COST = float(os.getenv('CHATBOT_SQL_APPROXIMATE_COST', 500000))
+    CHATBOT_SQL_REJECT_COST = float(os.getenv('CHATBOT_SQL_REJECT_COST', 5000000))
+    CHATBOT_SQL_SAMPLE_PERCENT = float(os.getenv('CHATBOT_SQL_SAMPLE_PERCENT', 10))
+
+    # FastAPI /ask/batch: distinct questions per batch and questions in flight per stage
+    # (generate + explain share the CHATBOT_MAX_CONCURRENCY model slots, execute the pool quota)
+    ASK_BATCH_MAX_QUESTIONS = int(os.getenv('ASK_BATCH_MAX_QUESTIONS', 500))
+    ASK_BATCH_GENERATE_CONCURRENCY = int(os.getenv('ASK_BATCH_GENERATE_CONCURRENCY', 2))
+    ASK_BATCH_EXECUTE_CONCURRENCY = int(os.getenv('ASK_BATCH_EXECUTE_CONCURRENCY', 2))
+    ASK_BATCH_EXPLAIN_CONCURRENCY = int(os.getenv('ASK_BATCH_EXPLAIN_CONCURRENCY', 2))
+
+    # File each chatbot request's stage timings are appended to as JSON lines (unset: off)
+    CHATBOT_TRACE_PATH = os.getenv('CHATBOT_TRACE_PATH')
+
+    # Model client: "bedrock", "fake" (local stand-in, for load tests) or "module:factory"
+    CHATBOT_MODEL_BACKEND = os.getenv('CHATBOT_MODEL_BACKEND', 'bedrock')
+
+    # Fake backend: latency per call ("0.8", "uniform:0.3,1.5", "normal:0.8,0.2",
+    # "lognormal:0.8,0.5" as median,sigma, "exponential:0.8"), chance a call is
+    # throttled, calls in flight before it throttles like a Bedrock quota (0: no
+    # limit) and an optional JSON file of canned SQL/explanation replies
+    FAKE_MODEL_LATENCY = os.getenv('FAKE_MODEL_LATENCY', 'lognormal:0.8,0.4')
+    FAKE_MODEL_THROTTLE_RATE = float(os.getenv('FAKE_MODEL_THROTTLE_RATE', 0))
+    FAKE_MODEL_MAX_CONCURRENCY = int(os.getenv('FAKE_MODEL_MAX_CONCURRENCY', 0))
+    FAKE_MODEL_RESPONSES = os.getenv('FAKE_MODEL_RESPONSES')
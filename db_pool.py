@@ -0,0 +1,219 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import QueuePool
+from config import Config
+
+# ─────────────────────────────
+# One database pool per process
+# ─────────────────────────────
+# The Flask app, its background panels and the chatbot all borrow from the
+# single SQLAlchemy pool Flask-SQLAlchemy builds from
+# Config.SQLALCHEMY_ENGINE_OPTIONS. Outside Flask (the FastAPI chatbot
+# service) the same options build the engine on first use. Subsystems
+# other than the dashboards check connections out through a quota, so the
+# chatbot can never hold more than its share of the pool.
+
+
+class PoolStats:
+    """Checkout counters shared by every InstrumentedQueuePool of the process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.waiting = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "checkouts": self.checkouts,
+                "waiting": self.waiting,
+                "timeouts": self.timeouts,
+                "wait_ms_total": round(self.wait_total * 1000, 1),
+                "wait_ms_max": round(self.wait_max * 1000, 1),
+                "wait_ms_avg": round(self.wait_total * 1000 / self.checkouts, 2) if self.checkouts else 0.0,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long every checkout waited for a connection."""
+
+    def _do_get(self):
+        with pool_stats.lock:
+            pool_stats.waiting += 1
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with pool_stats.lock:
+                pool_stats.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with pool_stats.lock:
+                pool_stats.waiting -= 1
+                pool_stats.checkouts += 1
+                pool_stats.wait_total += waited
+                pool_stats.wait_max = max(pool_stats.wait_max, waited)
+
+
+class QuotaExceeded(exc.TimeoutError):
+    """A subsystem waited longer than the pool timeout for one of its quota slots."""
+
+
+class Quota:
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self.semaphore = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+
+    @contextmanager
+    def slot(self, timeout):
+        with self.lock:
+            self.waiting += 1
+        start = time.perf_counter()
+        acquired = self.semaphore.acquire(timeout=timeout)
+        with self.lock:
+            self.waiting -= 1
+            self.wait_total += time.perf_counter() - start
+            if acquired:
+                self.in_use += 1
+            else:
+                self.rejected += 1
+        if not acquired:
+            raise QuotaExceeded(f"{self.name} pool quota of {self.size} connections exhausted")
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.in_use -= 1
+            self.semaphore.release()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "quota": self.size,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "rejected": self.rejected,
+                "wait_ms_total": round(self.wait_total * 1000, 1),
+            }
+
+
+def database_uri():
+    """DATABASE_URI, or the DB_* variables the standalone chatbot service uses."""
+    uri = Config.SQLALCHEMY_DATABASE_URI
+    if uri:
+        return uri
+    if not os.getenv("DB_HOST"):
+        raise RuntimeError("DATABASE_URI is not set in the environment")
+    return (f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASS')}"
+            f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT', 5432)}/{os.getenv('DB_NAME')}")
+
+
+class PoolManager:
+    def __init__(self):
+        self.app = None
+        self._engine = None
+        self._lock = threading.Lock()
+        self.timeout = Config.SQLALCHEMY_ENGINE_OPTIONS.get("pool_timeout", 30)
+        self.quotas = {name: Quota(name, size) for name, size in Config.DB_POOL_QUOTAS.items()}
+
+    def init_app(self, app):
+        """Call before db.init_app(app) so Flask-SQLAlchemy builds the instrumented pool."""
+        options = app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+        options.setdefault("poolclass", InstrumentedQueuePool)
+        self.timeout = options.get("pool_timeout", self.timeout)
+        for name, size in app.config.get("DB_POOL_QUOTAS", {}).items():
+            self.quotas[name] = Quota(name, size)
+        self.app = app
+        app.extensions["db_pool"] = self
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    if self.app is not None:
+                        from app.models.models import db
+                        with self.app.app_context():
+                            self._engine = db.engine
+                    else:
+                        self._engine = create_engine(
+                            database_uri(), poolclass=InstrumentedQueuePool,
+                            **Config.SQLALCHEMY_ENGINE_OPTIONS,
+                        )
+        return self._engine
+
+    def _slot(self, subsystem):
+        quota = self.quotas.get(subsystem)
+        return quota.slot(self.timeout) if quota else _no_quota()
+
+    @contextmanager
+    def connection(self, subsystem):
+        """SQLAlchemy connection from the shared pool, counted against `subsystem`'s quota."""
+        with self._slot(subsystem):
+            with self.engine.connect() as conn:
+                yield conn
+
+    def subsystem(self, name):
+        """psycopg2-pool style getconn()/putconn() view of the shared pool for `name`."""
+        return SubsystemPool(self, name)
+
+    def stats(self):
+        pool = self.engine.pool
+        live = {"class": type(pool).__name__}
+        for key in ("size", "checkedout", "checkedin", "overflow"):
+            if hasattr(pool, key):
+                live[key] = getattr(pool, key)()
+        return {
+            "pool": live,
+            **pool_stats.snapshot(),
+            "subsystems": {name: quota.stats() for name, quota in self.quotas.items()},
+        }
+
+
+@contextmanager
+def _no_quota():
+    yield
+
+
+class SubsystemPool:
+    def __init__(self, manager, name):
+        self.manager = manager
+        self.name = name
+        self._slots = {}
+
+    def getconn(self):
+        slot = self.manager._slot(self.name)
+        slot.__enter__()
+        try:
+            conn = self.manager.engine.raw_connection()
+        except BaseException:
+            slot.__exit__(None, None, None)
+            raise
+        self._slots[id(conn)] = slot
+        return conn
+
+    def putconn(self, conn):
+        conn.close()   # back to the shared pool
+        self._slots.pop(id(conn)).__exit__(None, None, None)
+
+
+pool_manager = PoolManager()
@@ -1,13 +1,18 @@
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
 from dotenv import load_dotenv
 from config import Config
+from db_pool import pool_manager
 from app.models.models import db, Crash
 from app.routes.offense import offense_bp
 from app.routes.impact import impact_bp
 from app.routes.location import location_bp
 from app.routes.environment import environment_bp
-from app.routes.chatbot import chatbot_bp
+from app.routes.chatbot import chatbot_bp, chatbot_cli
 from app.routes.auth import auth_bp
+from app.services.rollups import rollups_cli
+from app.services.crash_cube import cube_cli
+from app.services import beat_geometry
+from app.services.beat_assignment import beats_cli
 import json
 from datetime import timedelta
 
@@ -22,6 +27,7 @@ app.config.from_object(Config)
 # ─────────────────────────────
 # Register Blueprints
 # ─────────────────────────────
+pool_manager.init_app(app)
 db.init_app(app)
 app.register_blueprint(offense_bp)
 app.register_blueprint(impact_bp)
@@ -30,6 +36,19 @@ app.register_blueprint(environment_bp)
 app.register_blueprint(chatbot_bp)
 app.register_blueprint(auth_bp)
 
+# ─────────────────────────────
+# Preload Static Geometry
+# ─────────────────────────────
+beat_geometry.init_app(app)
+
+# ─────────────────────────────
+# CLI Commands
+# ─────────────────────────────
+app.cli.add_command(rollups_cli)
+app.cli.add_command(cube_cli)
+app.cli.add_command(beats_cli)
+app.cli.add_command(chatbot_cli)
+
 # ─────────────────────────────
 # Restrict access to all routes except dashboard and auth
 # ─────────────────────────────
@@ -48,6 +67,14 @@ def dashboard():
     """Main dashboard page"""
     return render_template('dashboard.html')
 
+# ─────────────────────────────
+# Database Pool Stats
+# ─────────────────────────────
+@app.route('/api/db-pool')
+def db_pool_stats():
+    """Live shared-pool usage: checked out, waiting, wait times, per-subsystem quotas"""
+    return jsonify(pool_manager.stats())
+
 # ─────────────────────────────
 # Start App
 # ─────────────────────────────
@@ -0,0 +1,33 @@
+from chatbot import main
+from fastapi.testclient import TestClient
+import asyncio, json
+
+def test_batch_dedupes_bounds_and_streams(monkeypatch):
+    running = {"now": 0, "peak": 0}
+
+    async def fake_answer(user_q, limits, trace=None):
+        async with limits["generate"]:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            await asyncio.sleep(0.02)
+            running["now"] -= 1
+        return {"answer": user_q.upper()}
+
+    monkeypatch.setattr(main, "answer_question", fake_answer)
+    monkeypatch.setattr(main.Config, "ASK_BATCH_GENERATE_CONCURRENCY", 2)
+    questions = ["top causes", "Top causes?", "crashes by hour", "how many crashes", "top causes"]
+    response = TestClient(main.app).post("/ask/batch", json={"questions": questions})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    # ✅ One line per distinct question, with every input position it answers
+    answers = {tuple(line["indexes"]): line["answer"] for line in lines[:-1]}
+    assert answers == {(0, 1, 4): "TOP CAUSES", (2,): "CRASHES BY HOUR", (3,): "HOW MANY CRASHES"}
+    assert lines[-1]["done"] and (lines[-1]["submitted"], lines[-1]["answered"]) == (5, 3)
+
+    # ✅ The stage limit held
+    assert running["peak"] == 2
+
+def test_batch_size_is_capped(monkeypatch):
+    monkeypatch.setattr(main.Config, "ASK_BATCH_MAX_QUESTIONS", 1)
+    response = TestClient(main.app).post("/ask/batch", json={"questions": ["a", "b"]})
+    assert response.status_code == 413
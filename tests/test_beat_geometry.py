@@ -0,0 +1,50 @@
+import json
+import numpy as np
+from app.services.beat_geometry import BeatGeometry, simplify_ring, tolerance_for
+
+def _square(west, south, size=0.02, n=200, jitter=0.00001, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 1, n, endpoint=False)
+    pts = np.concatenate([
+        np.c_[west + t * size, np.full_like(t, south)],
+        np.c_[np.full_like(t, west + size), south + t * size],
+        np.c_[west + size - t * size, np.full_like(t, south + size)],
+        np.c_[np.full_like(t, west), south + size - t * size],
+    ]) + rng.normal(0, jitter, (4 * n, 2))
+    return pts.tolist() + [pts[0].tolist()]
+
+GEOJSON = {"type": "FeatureCollection", "features": [
+    {"type": "Feature", "properties": {"beat_id": "111"},
+     "geometry": {"type": "Polygon", "coordinates": [_square(-87.64, 41.88)]}},
+    {"type": "Feature", "properties": {"beat_id": "112", "district": "1"},
+     "geometry": {"type": "MultiPolygon", "coordinates": [[_square(-87.62, 41.88)], [_square(-87.60, 41.88)]]}},
+    {"type": "Feature", "properties": {},
+     "geometry": {"type": "Polygon", "coordinates": [_square(-87.58, 41.88)]}},
+]}
+
+def test_ring_simplification_keeps_shape():
+    ring = np.array(_square(-87.64, 41.88))
+    simplified = simplify_ring(ring, tolerance_for(11))
+
+    # ✅ A jittered square collapses to (about) its corners and stays closed
+    assert 5 <= len(simplified) < 20
+    assert simplified[0].tolist() == simplified[-1].tolist()
+    # ✅ Tiny rings are left alone
+    assert len(simplify_ring(ring[[0, 200, 400, 0]], 1.0)) == 4
+
+def test_choropleth_merges_counts_into_cached_features():
+    geometry = BeatGeometry(GEOJSON)
+    full = json.loads(geometry.choropleth_json({111: 7, None: 99}))
+    coarse = json.loads(geometry.choropleth_json({112: 3}, zoom=10))
+
+    # ✅ Counts land on their beats; features without a beat get 0
+    assert [f["properties"] for f in full["features"]] == [
+        {"beat_id": "111", "hit_and_run_count": 7},
+        {"beat_id": "112", "district": "1", "hit_and_run_count": 0},
+        {"hit_and_run_count": 0},
+    ]
+    assert coarse["features"][1]["properties"]["hit_and_run_count"] == 3
+    # ✅ Zoomed-out responses carry far fewer vertices than full resolution
+    stats = geometry.stats()
+    assert stats["vertices"][9] * 20 < stats["vertices"]["full"]
+    assert len(coarse["features"][1]["geometry"]["coordinates"]) == 2
@@ -0,0 +1,61 @@
+from flask import Flask
+from app.models.models import db
+from app.services.bootstrap import PANEL_ERROR, bootstrap_response
+import json, threading, time
+
+def make_app(running=None):
+    running = running if running is not None else {"now": 0, "peak": 0}
+    lock = threading.Lock()
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    app.config["BOOTSTRAP_WORKERS"] = 4
+    db.init_app(app)
+
+    def slow(value, delay):
+        def panel():
+            with lock:
+                running["now"] += 1
+                running["peak"] = max(running["peak"], running["now"])
+            time.sleep(delay)
+            with lock:
+                running["now"] -= 1
+            return value
+        return panel
+
+    def broken():
+        raise RuntimeError("boom: password authentication failed for user postgres")
+
+    @app.route("/bootstrap")
+    def bootstrap():
+        return bootstrap_response({
+            "a": slow([1, 2], 0.3),
+            "b": slow({"x": 1}, 0.3),
+            "c": slow("fast", 0.0),
+            "bad": broken,
+        })
+
+    return app
+
+def test_panels_run_concurrently_and_errors_stay_per_panel():
+    running = {"now": 0, "peak": 0}
+    client = make_app(running).test_client()
+
+    body = client.get("/bootstrap").get_json()
+
+    # ✅ The slow panels ran at the same time, not one after another
+    assert running["peak"] >= 2
+    assert body["panels"] == {"a": [1, 2], "b": {"x": 1}, "c": "fast"}
+    # ✅ A failing panel is reported without failing the page, or leaking the error text
+    assert body["errors"] == {"bad": PANEL_ERROR}
+    assert set(body["timings_ms"]) == {"a", "b", "c", "bad"}
+
+def test_stream_and_panel_selection():
+    client = make_app().test_client()
+
+    response = client.get("/bootstrap?stream=1&panels=a,c")
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+
+    # ✅ One NDJSON line per selected panel, fastest first
+    assert response.mimetype == "application/x-ndjson"
+    assert [line["panel"] for line in lines] == ["c", "a"]
+    assert lines[1]["data"] == [1, 2]
@@ -0,0 +1,43 @@
+import pandas as pd
+from app.services.crash_cube import CrashCube, DIMENSIONS, _Encoder
+
+def _cube(records):
+    encoders = {dim: _Encoder(kind) for dim, (_, kind) in DIMENSIONS.items()}
+    frame = pd.DataFrame([{dim: r.get(dim) for dim in DIMENSIONS} for r in records])
+    columns = {dim: encoders[dim].encode(frame[dim]) for dim in DIMENSIONS}
+    values = {dim: enc.values for dim, enc in encoders.items()}
+    return CrashCube(columns, values, [r.get("severe", False) for r in records])
+
+RECORDS = [
+    {"month": 7, "weather": "RAIN", "beat": 111, "cause": "SPEEDING", "severity": "FATAL", "severe": True},
+    {"month": 7, "weather": "CLEAR", "beat": 111, "cause": "SPEEDING", "severity": "NO INDICATION OF INJURY"},
+    {"month": 7, "weather": "RAIN", "beat": 112, "cause": "FOLLOWING TOO CLOSELY"},
+    {"month": 1, "weather": None, "beat": None, "cause": "SPEEDING", "hit_and_run": "Y"},
+] * 5
+
+def test_mask_and_bincount():
+    cube = _cube(RECORDS)
+
+    # ✅ No filters means every row
+    assert cube.mask(month=None) is None
+    assert cube.count() == 20
+
+    # ✅ Filters AND together through the bitmaps
+    mask = cube.mask(month=7, weather="RAIN")
+    assert cube.count(mask) == 10
+    assert cube.count_severe(mask) == 5
+    assert cube.counts("cause", mask) == [("SPEEDING", 5), ("FOLLOWING TOO CLOSELY", 5)]
+
+    # ✅ NULLs are a value of their own; unknown values match nothing
+    assert ("None" not in dict(cube.counts("beat"))) and dict(cube.counts("beat"))[None] == 5
+    assert cube.count(cube.mask(weather="SNOW")) == 0
+
+def test_pair_counts_and_footprint():
+    cube = _cube(RECORDS)
+
+    pairs = cube.counts2("cause", "severity", cube.mask(beat=111))
+    assert sorted(pairs) == [("SPEEDING", "FATAL", 5), ("SPEEDING", "NO INDICATION OF INJURY", 5)]
+
+    stats = cube.stats()
+    assert stats["rows"] == 20
+    assert stats["memory_bytes"]["total"] == stats["memory_bytes"]["columns"] + stats["memory_bytes"]["bitmaps"]
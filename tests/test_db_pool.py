@@ -0,0 +1,44 @@
+from sqlalchemy import create_engine, text
+from db_pool import InstrumentedQueuePool, Quota, QuotaExceeded, pool_stats
+import pytest, threading, time
+
+def test_instrumented_pool_counts_checkouts():
+    engine = create_engine("sqlite://", poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0)
+    before = pool_stats.snapshot()["checkouts"]
+
+    for _ in range(3):
+        with engine.connect() as conn:
+            conn.execute(text("select 1"))
+
+    # ✅ Every checkout goes through the instrumented path
+    assert pool_stats.snapshot()["checkouts"] == before + 3
+    assert pool_stats.snapshot()["waiting"] == 0
+
+def test_quota_bounds_a_subsystem():
+    quota = Quota("chatbot", 1)
+    held = threading.Event()
+    release = threading.Event()
+
+    def holder():
+        with quota.slot(timeout=1):
+            held.set()
+            release.wait()
+
+    t = threading.Thread(target=holder)
+    t.start()
+    held.wait()
+
+    # ✅ A second checkout beyond the quota is rejected after the timeout
+    start = time.perf_counter()
+    with pytest.raises(QuotaExceeded):
+        with quota.slot(timeout=0.1):
+            pass
+    assert time.perf_counter() - start >= 0.1
+    assert quota.stats()["in_use"] == 1
+    assert quota.stats()["rejected"] == 1
+
+    release.set()
+    t.join()
+    with quota.slot(timeout=0.1):
+        assert quota.stats()["in_use"] == 1
+    assert quota.stats()["in_use"] == 0
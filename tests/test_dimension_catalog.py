@@ -0,0 +1,55 @@
+from app.services.dimension_catalog import DimensionCatalog
+import threading
+
+ROWS = [
+    ("weather", "RAIN", 40), ("weather", "CLEAR", 120), ("weather", None, 3),
+    ("speed", 30, 90), ("speed", 0, 2), ("speed", 15, 8),
+    ("beat", 1811, 5), ("beat", 111, 9),
+]
+
+def test_options_and_counts():
+    catalog = DimensionCatalog(ROWS)
+
+    # ✅ Dropdowns get sorted, non-empty values only
+    assert catalog.options("weather") == ["CLEAR", "RAIN"]
+    assert catalog.options("speed") == [15, 30]
+    assert catalog.options("beat") == [111, 1811]
+    assert catalog.options("road_defect") == []
+    # ✅ Counts keep NULL and come back most common first
+    assert catalog.counts("weather") == [("CLEAR", 120), ("RAIN", 40), (None, 3)]
+    assert catalog.column_name("weather") == "WEATHER_CONDITION"
+
+def test_inserted_crashes_are_counted():
+    catalog = DimensionCatalog(ROWS)
+    catalog.add_crash({"weather_condition": "SNOW", "posted_speed_limit": 30, "beat_of_occurrence": 111})
+
+    # ✅ New values appear without a rebuild; missing attributes count as NULL
+    assert "SNOW" in catalog.options("weather")
+    assert dict(catalog.counts("speed"))[30] == 91
+    assert dict(catalog.counts("road_defect")) == {None: 1}
+
+def test_counts_can_be_read_while_crashes_are_added():
+    catalog = DimensionCatalog(ROWS)
+    errors = []
+
+    def add():
+        for i in range(20000):
+            catalog.add_crash({"street_name": None, "beat_of_occurrence": i})
+
+    def read():
+        try:
+            for _ in range(200):
+                catalog.options("beat")
+                catalog.counts("beat")
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=add), threading.Thread(target=read)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # ✅ No "dictionary changed size during iteration", and every insert counted
+    assert errors == []
+    assert len(catalog.counts("beat")) == 20000
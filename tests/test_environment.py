@@ -19,3 +19,16 @@ def test_impact_route_response():
     # ✅ Response time should be under 1 second
     print(f"/impact response time: {duration:.4f} seconds")
     assert duration < 1.0
+
+def test_bootstrap_with_blank_filters_matches_all():
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+
+    # The page's selects are still empty on the first bootstrap request
+    blank = client.get('/environment/api/bootstrap?month=All&weather=&speed=&lighting=&panels=data').get_json()
+    unfiltered = client.get('/environment/api/bootstrap?panels=data').get_json()
+
+    # ✅ Blank filters mean no filter, not a failing or empty panel
+    assert blank['errors'] == {}
+    assert blank['panels']['data'] == unfiltered['panels']['data']
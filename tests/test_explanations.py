@@ -0,0 +1,47 @@
+from chatbot.explanations import classify_result, template_explanation
+import pandas as pd
+
+def test_result_shapes():
+    assert classify_result(pd.DataFrame({"crash_count": [33203]})) == "scalar"
+    assert classify_result(pd.DataFrame({"cause": ["A", "B"], "crash_count": [9, 4]})) == "ranking"
+    assert classify_result(pd.DataFrame({"crash_month": [1, 2], "crash_count": [4, 9]})) == "series"
+
+    # ✅ Unsorted lists, extra columns and non-numeric values go to the model
+    assert classify_result(pd.DataFrame({"cause": ["A", "B"], "crash_count": [4, 9]})) is None
+    assert classify_result(pd.DataFrame({"a": [1], "b": [2], "c": [3]})) is None
+    assert classify_result(pd.DataFrame({"street": ["STATE ST"]})) is None
+    assert classify_result(pd.DataFrame({"crash_month": [13], "crash_count": [1]})) is None
+
+def test_template_explanations():
+    assert template_explanation(pd.DataFrame({"crash_count": [33203]})).startswith("The crash count is 33,203.")
+
+    ranking = pd.DataFrame({"street_name": ["WESTERN AVE", "ASHLAND AVE", "STATE ST"], "crash_count": [2193, 2000, 7]})
+    assert template_explanation(ranking).startswith(
+        "WESTERN AVE ranks first with a crash count of 2,193, followed by ASHLAND AVE (2,000) and STATE ST (7).")
+
+    # ✅ Months, hours and days are spelled out
+    months = pd.DataFrame({"crash_month": [1, 2, 3], "crash_count": [100, 80, 120]})
+    assert "highest in March (120) and lowest in February (80)" in template_explanation(months)
+    hours = pd.DataFrame({"crash_hour": [0, 17], "crash_count": [5, 50]})
+    assert "highest at 5 PM (50) and lowest at 12 AM (5)" in template_explanation(hours)
+
+    # ✅ Sampled results say so
+    months.attrs["sample_percent"] = 10.0
+    assert template_explanation(months).endswith("10% sample of the data, so they are approximate.")
+
+def test_truncated_series_goes_to_the_model():
+    frame = pd.DataFrame({"crash_month": [1, 2, 3, 4, 5], "crash_count": [10, 30, 20, 5, 8]})
+    assert classify_result(frame) == "series"
+
+    # ✅ Five of twelve months can't say when crashes peak
+    frame.attrs["truncated"] = True
+    assert classify_result(frame) is None and template_explanation(frame) is None
+
+def test_single_period_value_is_spelled_out():
+    # "which month had the most crashes" -> SELECT crash_month ... LIMIT 1
+    frame = pd.DataFrame({"crash_month": [12]})
+    assert classify_result(frame) == "period"
+    assert template_explanation(frame) == "The crash month is December. It is the only month in the result."
+
+    # ✅ A value that isn't a valid period goes to the model
+    assert classify_result(pd.DataFrame({"crash_hour": [31]})) is None
@@ -0,0 +1,67 @@
+from chatbot.bedrock_client import get_model_client
+from chatbot.claude_utils import invoke_claude_v3, stream_claude_v3
+from chatbot.fake_bedrock import FakeBedrockClient, latency_distribution
+from chatbot.pipeline import ChatPipeline, CircuitBreaker, is_throttling
+import asyncio, pytest, random
+
+SQL_PROMPT = 'Schema: "WEATHER_CONDITION"\n\nNow write a valid SQL query to answer:\n"crashes by hour?"\n\nOnly return the SQL query.'
+
+def test_canned_replies_by_prompt_kind():
+    client = FakeBedrockClient(sql={r"\bhour\b": "SELECT 1 AS hour"}, explanation="Mostly at 5 PM.")
+
+    # ✅ SQL prompts get the SQL whose pattern matches the question, not the schema text
+    text, usage = invoke_claude_v3(client, SQL_PROMPT)
+    assert text == "SELECT 1 AS hour"
+    assert usage["input_tokens"] > 0 and usage["output_tokens"] > 0
+    assert invoke_claude_v3(client, SQL_PROMPT.replace("by hour", "in snow"))[0] == client.default_sql
+
+    # ✅ Anything else is explained; streaming yields the same text and fills usage
+    usage = {}
+    assert "".join(stream_claude_v3(client, "Explain this result", usage)) == "Mostly at 5 PM."
+    assert set(usage) == {"input_tokens", "output_tokens"}
+    assert client.stats()["active"] == 0
+
+def test_throttling_looks_like_bedrock():
+    client = FakeBedrockClient(throttle_rate=1.0)
+    with pytest.raises(Exception) as error:
+        invoke_claude_v3(client, "hi")
+
+    # ✅ The pipeline recognizes it and retries
+    assert is_throttling(error.value)
+    assert client.stats()["throttled"] == 1
+
+def test_quota_throttles_calls_beyond_max_concurrency():
+    client = FakeBedrockClient(latency="0.02", max_concurrency=1)
+    pipeline = ChatPipeline(client, concurrency=2, queue_timeout=5, retries=10, backoff=0.05, max_backoff=0.2,
+                            breaker=CircuitBreaker(failures=50, cooldown=60))
+
+    async def ask():
+        return await asyncio.gather(*(pipeline.prompt_with_retry(f"q{i}") for i in range(2)))
+
+    # ✅ Extra calls are throttled, retried and still answered
+    assert asyncio.run(ask()) == [client.explanation] * 2
+    assert client.stats()["throttled"] > 0 and client.stats()["peak"] == 1
+
+def test_latency_distributions():
+    rng = random.Random(0)
+    assert latency_distribution("0.25")(rng) == 0.25
+    assert all(0.2 <= latency_distribution("uniform:0.2,0.4")(rng) <= 0.4 for _ in range(100))
+    assert all(latency_distribution("normal:0.01,1")(rng) >= 0 for _ in range(100))
+    assert latency_distribution("lognormal:0.8,0")(rng) == pytest.approx(0.8)
+    with pytest.raises(ValueError):
+        latency_distribution("pareto:1")
+
+def test_client_is_created_on_first_use():
+    created = []
+    pipeline = ChatPipeline(None, 1, 1, 1, 0, 0, CircuitBreaker(1, 1),
+                            client_factory=lambda: created.append(1) or FakeBedrockClient())
+
+    # ✅ No client (and no credentials) needed until a model call
+    assert created == []
+    assert asyncio.run(pipeline.prompt_with_retry("Explain")) == FakeBedrockClient().explanation
+    assert created == [1]
+
+    # ✅ The backend is chosen by name
+    assert isinstance(get_model_client("fake"), FakeBedrockClient)
+    with pytest.raises(ValueError):
+        get_model_client("openai")
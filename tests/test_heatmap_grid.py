@@ -0,0 +1,65 @@
+import numpy as np
+from collections import OrderedDict
+from flask import Flask
+from app.services import heatmap_grid
+from app.services.heatmap_grid import ZOOM_LEVELS, DensityGrid, cell_deg, level_for
+import threading, time
+
+def test_chunked_grid_matches_histogram():
+    rng = np.random.default_rng(3)
+    lat = 41.64 + rng.random(30000) * 0.38
+    lng = -87.94 + rng.random(30000) * 0.42
+    size = cell_deg(12)
+
+    grid = DensityGrid(size)
+    for start in range(0, len(lat), 7000):
+        grid.add(lat[start:start + 7000], lng[start:start + 7000])
+    payload = grid.payload(12)
+
+    expected = {}
+    for r, c in zip(np.floor(lat / size).astype(int), np.floor(lng / size).astype(int)):
+        expected[(r, c)] = expected.get((r, c), 0) + 1
+    got = {
+        (payload["origin"][0] + r, payload["origin"][1] + c): n
+        for r, c, n in zip(payload["rows"], payload["cols"], payload["count"])
+    }
+
+    # ✅ Every crash is counted once, in the same cell a full histogram puts it
+    assert got == expected
+    assert sum(payload["count"]) == 30000
+    assert payload["max"] == max(expected.values())
+
+def test_zoom_level_selection():
+    # ✅ Map zooms snap to the nearest precomputed level at or below them
+    assert level_for(3) == 10
+    assert level_for(12) == 12
+    assert level_for(18) == 13
+    assert DensityGrid(cell_deg(11)).payload(11)["count"] == []
+
+def test_concurrent_misses_build_once(monkeypatch):
+    builds = []
+
+    def build(*filters):
+        builds.append(filters)
+        time.sleep(0.1)
+        return {z: f"grid {z}" for z in ZOOM_LEVELS}
+
+    monkeypatch.setattr(heatmap_grid, "build_heatmap_levels", build)
+    monkeypatch.setattr(heatmap_grid.crash_events, "data_version", lambda: 1)
+    monkeypatch.setattr(heatmap_grid, "_cache", OrderedDict())
+    app = Flask(__name__)
+    results = []
+
+    def request():
+        with app.app_context():
+            results.append(heatmap_grid.heatmap_json(12, month="7"))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # ✅ One scan for eight simultaneous requests, all answered from it
+    assert builds == [("7", "All", "All", "All")]
+    assert results == [f"grid {level_for(12)}"] * 8
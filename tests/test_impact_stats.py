@@ -0,0 +1,37 @@
+from app.services.impact_stats import ImpactAggregates
+
+NO_INJURY = "NO INJURY / DRIVE AWAY"
+INJURY = "INJURY AND / OR TOW DUE TO CRASH"
+
+# crash_type, hour, injury, GROUPING(hour), GROUPING(injury), count
+ROWS = [
+    (NO_INJURY, None, None, 1, 1, 6),
+    (INJURY, None, None, 1, 1, 4),
+    (None, None, None, 1, 1, 1),
+    (NO_INJURY, 8, None, 0, 1, 4),
+    (NO_INJURY, 17, None, 0, 1, 2),
+    (INJURY, 17, None, 0, 1, 3),
+    (INJURY, None, None, 0, 1, 1),
+    (None, 8, None, 0, 1, 1),
+    (NO_INJURY, None, "NO INDICATION OF INJURY", 1, 0, 6),
+    (INJURY, None, "FATAL", 1, 0, 1),
+    (INJURY, None, None, 1, 0, 3),
+    (None, None, None, 1, 0, 1),
+]
+
+def test_histograms_for_all_and_filtered():
+    stats = ImpactAggregates(ROWS)
+
+    # ✅ "All" sums across crash types, NULL hour sorts last
+    assert stats.hours("All") == [(8, 5), (17, 5), (None, 1)]
+    assert stats.total("All") == 11
+    assert stats.injuries("All")[0] == ("NO INDICATION OF INJURY", 6)
+
+    # ✅ A single crash type is a slice of the same result
+    assert stats.hours(INJURY) == [(17, 3), (None, 1)]
+    assert stats.injuries(INJURY) == [(None, 3), ("FATAL", 1)]
+    assert stats.total(INJURY) == 4
+
+    # ✅ The crash type chart and dropdown ignore the filter
+    assert stats.crash_types()[0] == (NO_INJURY, 6)
+    assert stats.crash_type_options() == [INJURY, NO_INJURY]
@@ -0,0 +1,69 @@
+from chatbot.intents import IntentStats, match_intent
+
+VOCABULARIES = {
+    "WEATHER_CONDITION": ["CLEAR", "RAIN", "SNOW", "UNKNOWN", "FREEZING RAIN/DRIZZLE"],
+    "LIGHTING_CONDITION": ["DARKNESS", "DARKNESS, LIGHTED ROAD", "DAYLIGHT", "UNKNOWN"],
+}
+
+def test_common_shapes_fill_templates():
+    name, sql = match_intent("Top ten causes of crashes in 2024?", VOCABULARIES)
+    assert name == "top_n"
+    assert 'GROUP BY "PRIM_CONTRIBUTORY_CAUSE"' in sql and "LIMIT 10" in sql and "= 2024" in sql
+
+    name, sql = match_intent("What hour has the most crashes in snow?", VOCABULARIES)
+    assert name == "by_period"
+    assert '"WEATHER_CONDITION" = \'SNOW\'' in sql and "ORDER BY crash_count DESC" in sql
+
+    name, sql = match_intent("crashes by day of the week", VOCABULARIES)
+    assert 'GROUP BY "CRASH_DAY_OF_WEEK"' in sql and 'ORDER BY "CRASH_DAY_OF_WEEK"' in sql
+
+    # ✅ Longest vocabulary value wins and is used verbatim
+    name, sql = match_intent("How many crashes in darkness, lighted road in Jan?", VOCABULARIES)
+    assert name == "count"
+    assert '"LIGHTING_CONDITION" = \'DARKNESS, LIGHTED ROAD\'' in sql and '"CRASH_MONTH" = 1' in sql
+
+def test_anything_not_understood_goes_to_the_model():
+    # ✅ Unknown qualifiers, two values, shared values and two dimensions don't match
+    for question in ("top causes for fatal crashes", "how many crashes in rain and snow",
+                     "how many crashes in snow or rain", "how many crashes in unknown conditions",
+                     "top 5 causes by weather", "crashes by month in march", "hello"):
+        assert match_intent(question, VOCABULARIES) is None, question
+
+def test_intent_stats_hit_rate_and_latency_split():
+    stats = IntentStats()
+    for matched in (True, True, False, True):
+        stats.record_match(matched)
+    stats.record_latency("template", 0.2)
+    stats.record_latency("model", 2.0)
+    stats.record_latency("model", 4.0)
+
+    # ✅ Hit rate and per-path percentiles
+    report = stats.stats()
+    assert report["hit_rate"] == 0.75
+    assert report["latency"]["template"]["p50_ms"] == 200.0
+    assert report["latency"]["model"]["count"] == 2
+    assert report["latency"]["model"]["mean_ms"] == 3000.0
+
+def test_count_questions_stay_counts():
+    vocabularies = {**VOCABULARIES, "TRAFFICWAY_TYPE": ["ONE-WAY", "NOT DIVIDED"]}
+
+    # ✅ A group word used as a noun doesn't turn a count into a ranking
+    assert match_intent("how many crashes on one way streets", vocabularies) is None
+    assert match_intent("how many crashes by street", vocabularies)[0] == "top_n"
+    assert match_intent("how many crashes per hour", vocabularies)[0] == "by_period"
+
+    # ✅ Top N needs N >= 1
+    assert match_intent("top 0 causes", vocabularies) is None
+    assert match_intent("top 1 causes", vocabularies)[1].endswith("LIMIT 1")
+
+def test_breakdowns_the_templates_lack_go_to_the_model():
+    # ✅ "per year" / "each year" is not a grand total
+    for question in ("how many crashes per year", "how many crashes each year", "how many crashes by year"):
+        assert match_intent(question, VOCABULARIES) is None, question
+
+    # ✅ Top N periods are ranked and limited, not every period in calendar order
+    name, sql = match_intent("top 3 months", VOCABULARIES)
+    assert name == "by_period"
+    assert "ORDER BY crash_count DESC" in sql and sql.endswith("LIMIT 3")
+    name, sql = match_intent("what are the top 5 hours", VOCABULARIES)
+    assert 'GROUP BY "CRASH_HOUR"' in sql and "ORDER BY crash_count DESC" in sql and sql.endswith("LIMIT 5")
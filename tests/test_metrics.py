@@ -0,0 +1,48 @@
+from chatbot.metrics import Registry, Trace
+import json
+
+def test_counters_and_histograms_render_cumulative_buckets():
+    registry = Registry()
+    retries = registry.counter("retries_total", "Retries.", labels=("stage",))
+    seconds = registry.histogram("stage_seconds", "Stage time.", (0.1, 1), labels=("stage",))
+    retries.inc(stage="generate")
+    retries.inc(2, stage="generate")
+    for value in (0.05, 0.1, 0.5, 3):
+        seconds.observe(value, stage="execute")
+    lines = registry.render().splitlines()
+
+    # ✅ Counters add up per label set
+    assert 'retries_total{stage="generate"} 3' in lines
+
+    # ✅ Buckets are cumulative (le is inclusive); +Inf and _count include everything
+    assert 'stage_seconds_bucket{stage="execute",le="0.1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="execute",le="1"} 3' in lines
+    assert 'stage_seconds_bucket{stage="execute",le="+Inf"} 4' in lines
+    assert 'stage_seconds_count{stage="execute"} 4' in lines
+    assert 'stage_seconds_sum{stage="execute"} 3.65' in lines
+
+def test_collectors_are_read_at_render_time():
+    registry = Registry()
+    state = {"queued": 1}
+    registry.register(lambda: [f"queued {state['queued']}"])
+    state["queued"] = 7
+
+    # ✅ Gauges reflect the value when scraped
+    assert registry.render() == "queued 7\n"
+
+def test_trace_appends_one_json_line_per_request(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    for question in ("top causes", "crashes by hour"):
+        trace = Trace(question, path=str(path))
+        trace.span("execute", 0.0123, rows=5, cached=False, sample_percent=None)
+        trace.finish(status="ok")
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+
+    # ✅ One record per request with its spans; unset attributes are left out
+    assert [r["question"] for r in records] == ["top causes", "crashes by hour"]
+    assert records[0]["status"] == "ok"
+    assert records[0]["spans"] == [{"name": "execute", "ms": 12.3, "rows": 5, "cached": False}]
+
+    # ✅ No path: nothing is written
+    Trace("ignored", path="").finish()
+    assert len(path.read_text().splitlines()) == 2
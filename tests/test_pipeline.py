@@ -0,0 +1,96 @@
+from botocore.exceptions import ClientError
+from chatbot.pipeline import Busy, ChatPipeline, CircuitBreaker, CircuitOpen, backoff_delay
+import asyncio, io, json, pytest, time
+
+THROTTLED = ClientError({"Error": {"Code": "ThrottlingException", "Message": "slow down"}}, "InvokeModel")
+
+class FakeClient:
+    def __init__(self, delay=0.0, failures=0):
+        self.delay = delay
+        self.failures = failures
+        self.calls = 0
+        self.active = self.peak = 0
+
+    def invoke_model(self, **kwargs):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            if self.calls <= self.failures:
+                raise THROTTLED
+            text = json.loads(kwargs["body"])["messages"][0]["content"]
+            return {"body": io.BytesIO(json.dumps({"content": [{"text": f"re: {text}"}]}).encode())}
+        finally:
+            self.active -= 1
+
+    def invoke_model_with_response_stream(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise THROTTLED
+        words = json.loads(kwargs["body"])["messages"][0]["content"].split()
+        events = [{"chunk": {"bytes": json.dumps({"type": "message_start"}).encode()}}]
+        events += [
+            {"chunk": {"bytes": json.dumps({"type": "content_block_delta", "delta": {"text": w}}).encode()}}
+            for w in words
+        ]
+        return {"body": iter(events)}
+
+def make_pipeline(client, concurrency=2, queue_timeout=5, retries=3, breaker=None):
+    return ChatPipeline(client, concurrency, queue_timeout, retries, backoff=0.01, max_backoff=0.02,
+                        breaker=breaker or CircuitBreaker(failures=5, cooldown=60))
+
+def test_concurrency_is_bounded():
+    client = FakeClient(delay=0.1)
+    pipeline = make_pipeline(client, concurrency=2)
+
+    async def ask_all():
+        return await asyncio.gather(*(pipeline.prompt_with_retry(f"q{i}") for i in range(4)))
+
+    # ✅ Every call answered, never more than two at once
+    assert asyncio.run(ask_all()) == ["re: q0", "re: q1", "re: q2", "re: q3"]
+    assert client.peak == 2
+
+def test_busy_when_no_slot_frees_up():
+    pipeline = make_pipeline(FakeClient(delay=0.3), concurrency=1, queue_timeout=0.05)
+
+    async def ask_two():
+        return await asyncio.gather(pipeline.prompt_with_retry("a"), pipeline.prompt_with_retry("b"),
+                                    return_exceptions=True)
+
+    # ✅ The queued call fails fast instead of waiting indefinitely
+    results = asyncio.run(ask_two())
+    assert results[0] == "re: a"
+    assert isinstance(results[1], Busy)
+
+def test_throttling_is_retried_then_breaker_opens():
+    client = FakeClient(failures=1)
+    pipeline = make_pipeline(client)
+    assert asyncio.run(pipeline.prompt_with_retry("x")) == "re: x"
+    assert client.calls == 2
+
+    # ✅ Repeated failures open the breaker and later calls are rejected at once
+    client = FakeClient(failures=100)
+    pipeline = make_pipeline(client, retries=3, breaker=CircuitBreaker(failures=2, cooldown=60))
+    with pytest.raises(CircuitOpen):
+        asyncio.run(pipeline.prompt_with_retry("x"))
+    assert client.calls == 2
+    assert pipeline.stats()["breaker"]["state"] == "open"
+
+def test_stream_yields_chunks_and_retries_before_the_first():
+    client = FakeClient(failures=1)
+    pipeline = make_pipeline(client)
+
+    async def collect():
+        return [text async for text in pipeline.stream_with_retry("one two three")]
+
+    # ✅ Text deltas in order; the throttled first attempt was retried
+    assert asyncio.run(collect()) == ["one", "two", "three"]
+    assert client.calls == 2
+    assert pipeline.stats()["in_flight"] == 0
+
+def test_backoff_delay_is_jittered_and_capped():
+    delays = [backoff_delay(5, base=1, cap=8) for _ in range(200)]
+
+    assert all(0 <= d <= 8 for d in delays)
+    assert len(set(delays)) > 1
@@ -0,0 +1,37 @@
+import numpy as np
+from app.services.point_clusters import ClusterIndex, MAX_ZOOM
+
+def _index(n=5000, seed=2):
+    rng = np.random.default_rng(seed)
+    lat = 41.64 + rng.random(n) * 0.38
+    lng = -87.94 + rng.random(n) * 0.42
+    return ClusterIndex(lat, lng, [{"id": i} for i in range(n)]), lat, lng
+
+def _members(feature):
+    return feature["properties"].get("point_count", 1)
+
+def test_every_point_lands_in_one_cluster_per_zoom():
+    index, lat, lng = _index()
+    world = (-180, -85, 180, 85)
+
+    for zoom in range(8, MAX_ZOOM + 1):
+        result = index.clusters(*world, zoom, limit=len(lat))
+        # ✅ Clusters partition the points at every level
+        assert sum(_members(f) for f in result["features"]) == len(lat) == result["total"]
+    # ✅ Zooming in only ever splits clusters
+    sizes = [len(index.levels[z].count) for z in range(8, MAX_ZOOM + 1)]
+    assert sizes == sorted(sizes)
+
+def test_viewport_and_raw_points():
+    index, lat, lng = _index()
+    bbox = (-87.70, 41.85, -87.65, 41.88)
+    inside = (lat >= bbox[1]) & (lat <= bbox[3]) & (lng >= bbox[0]) & (lng <= bbox[2])
+
+    # ✅ Past MAX_ZOOM the exact points in the bbox come back with their properties
+    result = index.clusters(*bbox, MAX_ZOOM + 2)
+    assert sorted(f["properties"]["id"] for f in result["features"]) == list(np.flatnonzero(inside))
+    # ✅ A clustered viewport covers at least the points inside it
+    assert index.clusters(*bbox, 12)["total"] >= int(inside.sum())
+    # ✅ Oversized requests are capped, biggest clusters first
+    capped = index.clusters(-180, -85, 180, 85, MAX_ZOOM, limit=10)
+    assert capped["truncated"] and len(capped["features"]) == 10
@@ -0,0 +1,48 @@
+from chatbot.lru_cache import LRUCache
+from chatbot.question_cache import normalize_question, question_key
+import time
+
+def test_normalize_question_canonical_forms():
+    # ✅ Case, punctuation, whitespace, number words and month names fold together
+    assert normalize_question("Top TEN causes in Sept.,   2024?") == "top 10 causes in september 2024"
+    assert normalize_question("top 10 causes in september 2024") == "top 10 causes in september 2024"
+    assert normalize_question("Crashes over 1,000 in Jan please!") == "crashes over 1000 in january"
+
+    # ✅ The schema version is part of the key
+    assert question_key("Top ten causes", "v1") == question_key("top 10 causes?", "v1")
+    assert question_key("Top ten causes", "v1") != question_key("top 10 causes?", "v2")
+
+def test_lru_cache_eviction_ttl_and_stats():
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1      # a is now most recent
+    cache.set("c", 3)               # evicts b
+
+    # ✅ Least recently used entry is evicted
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 1, 1)
+    assert stats["hit_rate"] == round(2 / 3, 3)
+
+    # ✅ Expired entries are not served
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+    assert cache.purge() == 1
+    assert len(cache) == 0
+
+def test_lru_cache_byte_budget():
+    cache = LRUCache(max_entries=10, ttl=60, max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "yyyy")
+    cache.set("c", "zzzz")          # 12 bytes > 10: evicts a
+
+    # ✅ Bounded by total size as well as entry count
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 8
+    cache.set("big", "x" * 11)      # never fits
+    assert cache.get("big") is None
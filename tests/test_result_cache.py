@@ -0,0 +1,34 @@
+from chatbot.result_cache import canonical_sql, result_key
+
+def test_canonical_sql_ignores_layout_case_and_aliases():
+    a = '''SELECT c."WEATHER_CONDITION", COUNT(*) AS crash_count
+FROM traffic_crashes AS c -- every crash
+WHERE c."WEATHER_CONDITION" = 'SNOW'
+GROUP BY 1 ORDER BY 2 DESC LIMIT 5;'''
+    b = '''select x."WEATHER_CONDITION", count( * ) as crash_count from traffic_crashes x
+where x."WEATHER_CONDITION"='SNOW' group by 1 order by 2 desc limit 5'''
+
+    # ✅ Same query up to layout, keyword case, comments and table alias
+    assert canonical_sql(a) == canonical_sql(b)
+    assert result_key(a, 7) == result_key(b, 7)
+
+    # ✅ Literals, quoted identifiers and the data version still matter
+    assert canonical_sql(a) != canonical_sql(a.replace("'SNOW'", "'snow'"))
+    assert canonical_sql('SELECT "a" FROM t') != canonical_sql('SELECT "A" FROM t')
+    assert result_key(a, 7) != result_key(a, 8)
+
+def test_canonical_sql_keeps_non_alias_words():
+    sql = 'SELECT * FROM traffic_crashes WHERE "CRASH_HOUR" = 5 ORDER BY 1'
+
+    assert canonical_sql(sql) == 'select * from traffic_crashes where "CRASH_HOUR" = 5 order by 1'
+
+def test_canonical_sql_only_renames_table_aliases():
+    base = 'SELECT COUNT(*) FROM traffic_crashes WHERE "A" IS DISTINCT FROM "B" {} "C" = 1'
+
+    # ✅ The word after IS DISTINCT FROM x is not an alias, so AND and OR stay different queries
+    assert canonical_sql(base.format("AND")) != canonical_sql(base.format("OR"))
+    assert canonical_sql(base.format("AND")).endswith('is distinct from "B" and "C" = 1')
+
+    # ✅ Nor is the word after a function's FROM
+    sql = 'SELECT EXTRACT(YEAR FROM "CRASH_DATE") yr FROM traffic_crashes c'
+    assert canonical_sql(sql) == 'select extract ( year from "CRASH_DATE" ) yr from traffic_crashes t1'
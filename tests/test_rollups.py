@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone
+from app.services.rollups import (
+    OFFENSE_ROLLUP, _offense_upsert_sql, _rollup_select, _trigger_sql, is_fresh, summarize_rollup,
+)
+
+def test_summarize_rollup_picks_most_common_values():
+    rows = [
+        ("total", None, 120),
+        ("month", "7", 40),
+        ("month", "12", 55),
+        ("weather", "UNKNOWN", 90),
+        ("weather", None, 80),
+        ("weather", "RAIN", 20),
+        ("cause", "UNABLE TO DETERMINE", 70),
+        ("cause", "FOLLOWING TOO CLOSELY", 30),
+        ("cause", "SPEEDING", 0),
+    ]
+
+    stats = summarize_rollup(rows)
+
+    # ✅ Excluded values are skipped the same way the live queries filter them
+    assert stats == {
+        "total_crashes": 120,
+        "top_month": 12,
+        "top_weather": "RAIN",
+        "top_crash_type": "FOLLOWING TOO CLOSELY",
+    }
+
+def test_rollup_freshness():
+    now = datetime.now(timezone.utc)
+
+    # ✅ Trigger-maintained rollups never age out, unless marked dirty
+    assert is_fresh(now - timedelta(days=30), False, True, max_age=60)
+    assert not is_fresh(now, True, True, max_age=60)
+
+    # ✅ Without triggers, rollups are trusted for max_age seconds
+    assert is_fresh(now - timedelta(seconds=30), False, False, max_age=60)
+    assert not is_fresh(now - timedelta(seconds=90), False, False, max_age=60)
+
+def test_offense_trigger_sql_targets_its_own_objects():
+    sql = _trigger_sql(OFFENSE_ROLLUP, _offense_upsert_sql)
+
+    # ✅ Separate function/triggers from the landing rollup, all four events covered
+    for event in ("insert", "update", "delete", "truncate"):
+        assert f"CREATE TRIGGER crash_offense_rollup_{event}" in sql
+    assert "crash_rollup_apply" not in sql
+    # ✅ Upserts hit the expression unique index and sign the deltas
+    assert sql.count("ON CONFLICT ((COALESCE(beat, -1))") == 4
+    assert "-1 * COUNT(*)" in sql and "WHERE name = 'offense'" in sql
+
+def test_rollup_selects_group_on_the_unique_index_keys():
+    # ✅ NULL and the blank share one index key, so they must share one group,
+    # or an upsert with both updates the same row twice and aborts the insert
+    assert 'GROUPING SETS ((COALESCE("CRASH_MONTH"::text, \'\'))' in _rollup_select("new_rows")
+    sql = _offense_upsert_sql("new_rows", 1)
+    assert 'GROUP BY COALESCE("BEAT_OF_OCCURRENCE", -1), COALESCE("PRIM_CONTRIBUTORY_CAUSE", \'\')' in sql
+    assert "ON CONFLICT ((COALESCE(beat, -1)), (COALESCE(cause, ''))" in sql
@@ -0,0 +1,61 @@
+from chatbot.schema_cache import Schema, SchemaCache
+import json
+
+def schema_rows():
+    def row(table, column, data_type="text", constraint=None):
+        return {"table_schema": "public", "table_name": table, "column_name": column,
+                "data_type": data_type, "is_nullable": "YES", "constraint_type": constraint,
+                "constraint_name": None, "referenced_table": None, "referenced_column": None}
+
+    return [
+        row("traffic_crashes", "CRASH_RECORD_ID", constraint="PRIMARY KEY"),
+        row("traffic_crashes", "CRASH_DATE"),
+        row("traffic_crashes", "WEATHER_CONDITION"),
+        row("traffic_crashes", "LIGHTING_CONDITION"),
+        row("traffic_crashes", "PRIM_CONTRIBUTORY_CAUSE"),
+        row("traffic_crashes", "STREET_NAME"),
+        row("traffic_crashes", "CRASH_MONTH", "bigint"),
+        row("traffic_crashes", "INJURIES_FATAL", "bigint"),
+        row("users", "id", "integer", "PRIMARY KEY"),
+        row("users", "password_hash"),
+    ]
+
+def test_relevant_columns_prune_the_schema():
+    schema = Schema(schema_rows())
+
+    selection = schema.relevant_columns("Which streets had the most fatal crashes?")
+
+    # ✅ Only the matched columns plus the key/date columns
+    assert selection == {"traffic_crashes": [
+        "CRASH_RECORD_ID", "CRASH_DATE", "STREET_NAME", "INJURIES_FATAL",
+    ]}
+    # ✅ The users table never reaches the prompt
+    assert "users" not in schema.tables
+
+def test_vocabularies_and_fallback():
+    schema = Schema(schema_rows())
+
+    text, columns = schema.prompt_for(
+        "crashes in blowing snow by month",
+        {"WEATHER_CONDITION": ["SNOW", "RAIN"], "LIGHTING_CONDITION": ["DARKNESS"]},
+    )
+    assert columns == {"CRASH_RECORD_ID", "CRASH_DATE", "WEATHER_CONDITION", "CRASH_MONTH"}
+    assert '"WEATHER_CONDITION" text' in text
+    assert '"CRASH_RECORD_ID" text PRIMARY KEY' in text
+
+    # ✅ A question that matches nothing gets every column
+    _, columns = schema.prompt_for("hello there")
+    assert len(columns) == 8
+
+def test_cache_loads_once_until_invalidated(tmp_path):
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps(schema_rows()))
+    cache = SchemaCache(str(path))
+
+    first = cache.get(pool=None)
+    path.write_text(json.dumps(schema_rows()[:3]))
+
+    # ✅ Served from memory until invalidated
+    assert cache.get(pool=None) is first
+    cache.invalidate()
+    assert cache.get(pool=None).version != first.version
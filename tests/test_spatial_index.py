@@ -0,0 +1,39 @@
+import numpy as np
+from app.services.spatial_index import SpatialIndex, haversine_m
+
+def _random_points(n=20000, seed=1):
+    rng = np.random.default_rng(seed)
+    lat = 41.64 + rng.random(n) * 0.38
+    lng = -87.94 + rng.random(n) * 0.42
+    severity = rng.integers(0, 3, n)
+    return lat, lng, severity
+
+def test_radius_query_matches_brute_force():
+    lat, lng, severity = _random_points()
+    index = SpatialIndex(lat, lng, severity, ["FATAL", "NO INDICATION OF INJURY", "Unknown"])
+
+    result = index.within_radius(41.88, -87.63, 750, include_points=True, limit=5)
+    mask = haversine_m(41.88, -87.63, lat, lng) <= 750
+
+    # ✅ Count and severity breakdown agree with a full scan
+    assert result["count"] == int(mask.sum())
+    assert sum(result["severity"].values()) == result["count"]
+    # ✅ Points come back nearest first
+    distances = [p["distance_m"] for p in result["points"]]
+    assert distances == sorted(distances) and len(distances) == 5
+
+def test_bbox_query_and_incremental_adds():
+    lat, lng, severity = _random_points()
+    index = SpatialIndex(lat, lng, severity, ["FATAL", "NO INDICATION OF INJURY", "Unknown"])
+    bbox = (41.80, -87.70, 41.85, -87.60)
+
+    mask = (lat >= bbox[0]) & (lat <= bbox[2]) & (lng >= bbox[1]) & (lng <= bbox[3])
+    assert index.within_bbox(*bbox)["count"] == int(mask.sum())
+
+    # ✅ Added rows are visible right away, including new severity labels
+    index.add(41.82, -87.65, "INCAPACITATING INJURY")
+    index.add(45.00, -80.00, None)  # outside the original grid
+    result = index.within_bbox(*bbox)
+    assert result["count"] == int(mask.sum()) + 1
+    assert result["severity"]["INCAPACITATING INJURY"] == 1
+    assert index.within_radius(45.0, -80.0, 10)["count"] == 1
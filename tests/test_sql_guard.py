@@ -0,0 +1,45 @@
+from chatbot.sql_guard import QueryRejected, check_statement, sampled_sql
+import pytest
+
+def test_only_single_select_statements_pass():
+    check_statement('SELECT "CRASH_TYPE" FROM traffic_crashes;')
+    check_statement("WITH x AS (SELECT 1) SELECT * FROM x")
+    check_statement("SELECT ';' AS semi -- trailing; comment")
+
+    # ✅ Writes and stacked statements are refused before anything reaches the database
+    for sql in ("UPDATE users SET id = id", "SELECT 1; DELETE FROM users", "", "-- SELECT"):
+        with pytest.raises(QueryRejected):
+            check_statement(sql)
+
+def test_sampled_sql_samples_tables_not_ctes_or_subqueries():
+    sql = ('WITH x AS (SELECT * FROM traffic_crashes t WHERE "CRASH_TYPE" LIKE \'%TOW%\') '
+           'SELECT * FROM x JOIN public.users AS u ON true LEFT JOIN (SELECT 1) s ON true')
+
+    # ✅ TABLESAMPLE goes after the alias of each real table
+    assert sampled_sql(sql, 10) == (
+        'WITH x AS (SELECT * FROM traffic_crashes t TABLESAMPLE SYSTEM (10) WHERE "CRASH_TYPE" LIKE \'%TOW%\') '
+        'SELECT * FROM x JOIN public.users AS u TABLESAMPLE SYSTEM (10) ON true LEFT JOIN (SELECT 1) s ON true'
+    )
+    assert sampled_sql("SELECT count(*) FROM traffic_crashes", 2.5) == \
+        "SELECT count(*) FROM traffic_crashes TABLESAMPLE SYSTEM (2.5)"
+
+    # ✅ Nothing to sample
+    assert sampled_sql("SELECT * FROM generate_series(1, 3)", 10) is None
+    assert sampled_sql("SELECT 1", 10) is None
+
+def test_sampled_sql_leaves_function_and_distinct_froms_alone():
+    # ✅ The FROM inside EXTRACT(... FROM col) and its :: cast are not table references
+    sql = 'SELECT COUNT(*) FROM traffic_crashes WHERE EXTRACT(YEAR FROM "CRASH_DATE"::timestamp) = 2024'
+    assert sampled_sql(sql, 10) == (
+        'SELECT COUNT(*) FROM traffic_crashes TABLESAMPLE SYSTEM (10) '
+        'WHERE EXTRACT(YEAR FROM "CRASH_DATE"::timestamp) = 2024'
+    )
+    sql = ("SELECT SUBSTRING(\"STREET_NAME\" FROM 1 FOR 3), TRIM(BOTH FROM \"BEAT\") FROM traffic_crashes c "
+           "WHERE c.a IS DISTINCT FROM c.b AND c.id IN (SELECT id FROM people)")
+    assert sampled_sql(sql, 10) == (
+        "SELECT SUBSTRING(\"STREET_NAME\" FROM 1 FOR 3), TRIM(BOTH FROM \"BEAT\") FROM traffic_crashes c "
+        "TABLESAMPLE SYSTEM (10) WHERE c.a IS DISTINCT FROM c.b AND c.id IN (SELECT id FROM people TABLESAMPLE SYSTEM (10))"
+    )
+
+    # ✅ Only a function's FROM: nothing to sample
+    assert sampled_sql("SELECT EXTRACT(YEAR FROM now()::timestamp)", 10) is None
@@ -0,0 +1,36 @@
+from app.services.street_index import StreetIndex
+
+ROWS = [
+    # name, lat_sum, lng_sum, crashes, injuries, vehicles
+    ("WESTERN AVE", 83.8, -175.2, 2, 3.0, 5),
+    ("WEST END AVE", 41.9, -87.6, 1, None, 2),
+    ("ASHLAND AVE", 125.7, -262.8, 3, 1.0, 6),
+    ("STATE ST", 41.8, -87.6, 1, 0.0, 1),
+]
+
+def test_substring_search_matches_sql_ordering():
+    index = StreetIndex.from_rows(ROWS)
+
+    # ✅ Trigram path: case-insensitive substring, most crashes first
+    assert [s[0] for s in index.search("ave")] == ["ASHLAND AVE", "WESTERN AVE", "WEST END AVE"]
+
+    # ✅ Short queries fall back to scanning every name
+    assert [s[0] for s in index.search("st")] == ["WESTERN AVE", "STATE ST", "WEST END AVE"]
+
+    # ✅ NULL sums sort first, like ORDER BY ... DESC in Postgres
+    assert [s[0] for s in index.search("west", metric="injuries")] == ["WEST END AVE", "WESTERN AVE"]
+
+    name, lat, lng, value = index.search("ashland", metric="vehicles")[0]
+    assert (round(lat, 6), round(lng, 6), value) == (41.9, -87.6, 6)
+
+def test_add_crash_updates_aggregates():
+    index = StreetIndex.from_rows(ROWS)
+
+    index.add_crash("STATE ST", 41.8, -87.6, injuries=2.0, vehicles=2)
+    index.add_crash("NEW ST", 41.7, -87.5)
+    index.add_crash("NOWHERE ST", None, None)
+
+    assert index.search("state")[0][3] == 2
+    assert index.search("new st", metric="injuries")[0][3] is None
+    assert index.search("nowhere") == []
+    assert index.stats()["streets"] == 5